@@ -5,60 +5,1358 @@
 ###take care of the dated job overshooting current time msg thing
 
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import deque, OrderedDict
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_RUNNING
+from apscheduler.executors.base import BaseExecutor
+from apscheduler.events import (EVENT_JOB_SUBMITTED, EVENT_JOB_REMOVED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR,
+								EVENT_JOB_MISSED, JobExecutionEvent)
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.util import localize, astimezone
+from tzlocal import get_localzone
 
 import pickle
+import io
+import mmap
+import struct
+import traceback
+import heapq
+import itertools
+import socket
+import select
+import ctypes
+import ctypes.util
 import os
 import subprocess
-import winsound
-
-import tkinter as tk
-import tkinter.filedialog as filedialog
-from tkinter import ttk
+import shlex
+import shutil
+import hashlib
+import threading
+import importlib
+import importlib.util
+import multiprocessing
+import concurrent.futures
+import asyncio
+import sqlite3
+import json
+import uuid
+import contextlib
+import bisect
+import sys
+import signal
+import argparse
+import http.server
+import socketserver
+import urllib.parse
+import stat
+import cProfile
+import pstats
+import tracemalloc
+import tempfile
+import secrets
+import hmac
+
+#tkinter is only imported once the GUI is started, so the daemon and CLI never load Tk
+tk = filedialog = ttk = None
+
+def load_gui_modules():
+	global tk, filedialog, ttk
+	import tkinter as tk
+	import tkinter.filedialog as filedialog
+	from tkinter import ttk
 
 
 class ScriptError(Exception):
 	pass
 
+#raised inside an in-process run to stop it; not an Exception, so scripts' own handlers let it through
+class JobCancelled(BaseException):
+	pass
+
+#pickles from before the journal only hold plain values, so nothing may be imported while reading them
+class PlainUnpickler(pickle.Unpickler):
+	def find_class(self, module, name):
+		raise ScriptError(f"Refusing to load {module}.{name} from an old cache file")
+
+#settings are kept as a JSON snapshot plus an append-only journal of changes. Changes are
+#batched in memory and appended after a short delay; the journal is folded into a fresh
+#snapshot, written to a temporary file and renamed over the old one, once it grows long
 class CacheFile:
 	instances = []
 
+	FORMAT = "aces-cache"
+	VERSION = 1
+	WRITE_DELAY = 0.5 #seconds changes wait before being appended
+	COMPACT_AFTER = 200 #journal entries before a new snapshot is written
+	DEFAULTS = {'dated_year': 2024, 'dated_month': 3, 'dated_date': 5, 
+				'dated_hour': 16, 'dated_minute': 0, 'dated_second': 0, 
+				'interval_days': 0, 'interval_hours': 0, 
+				'interval_minutes': 0, 'interval_seconds': 1, 
+				'cron_year': '*', 'cron_month': '*', 'cron_day': '*', 
+				'cron_hour': '*', 'cron_minute': '*', 'cron_second': '*/1', 'cron_line': '', 
+				'selected_filepath': None, 'cmd_var': '', 'exec_mode': 'thread'}
+
 	def __init__(self, filepath):
 		self.instances.append(self)
 		self.filepath = filepath
 		self.cache = None
+		self.lock = threading.RLock()
+		self.pending = {} #changes not yet in the journal
+		self.timer = None
+		self.journal_entries = 0
 
 		self.load()
 
-	def load(self):
-		if os.path.isfile(self.filepath):
-			with open(self.filepath, "rb") as file:
-				self.cache = pickle.load(file)
-		else:
-			print("---Cache file non-existent---")
-			self.cache = {'dated_year': 2024, 'dated_month': 3, 'dated_date': 5, 
-						  'dated_hour': 16, 'dated_minute': 0, 'dated_second': 0, 
-						  'interval_days': 0, 'interval_hours': 0, 
-						  'interval_minutes': 0, 'interval_seconds': 1, 
-						  'cron_year': '*', 'cron_month': '*', 'cron_day': '*', 
-						  'cron_hour': '*', 'cron_minute': '*', 'cron_second': '*/1', 
-						  'selected_filepath': None, 'cmd_var': ''}
+	@property
+	def journal_path(self):
+		return self.filepath + ".journal"
+
+	def header(self):
+		return json.dumps({"format": self.FORMAT, "version": self.VERSION}) + "\n"
+
+	def check_header(self, line, filepath):
+		try:
+			header = json.loads(line)
+		except ValueError:
+			header = None
+		if not isinstance(header, dict) or header.get("format") != self.FORMAT:
+			raise ScriptError(f"{filepath} is not an ACES cache file")
+		if header.get("version") != self.VERSION:
+			raise ScriptError(f"{filepath} has cache version {header.get('version')}, expected {self.VERSION}")
 
+	def load(self):
+		with self.lock:
+			self.cancel_write()
+			self.pending = {}
+			self.cache = dict(self.DEFAULTS)
+			if not os.path.isfile(self.filepath) and not os.path.isfile(self.journal_path):
+				print("---Cache file non-existent---")
+				return
+
+			if os.path.isfile(self.filepath):
+				with open(self.filepath, "rb") as file:
+					data = file.read()
+				if data.startswith(b"\x80"): #a whole-file pickle from an older version
+					try:
+						self.cache.update(PlainUnpickler(io.BytesIO(data)).load())
+					except (pickle.UnpicklingError, EOFError) as e:
+						print(f"---Old cache file unreadable, using defaults: {e}---")
+					self.save() #rewritten in the current format
+					return
+				header, _, snapshot = data.decode("utf-8").partition("\n")
+				self.check_header(header, self.filepath)
+				self.cache.update(json.loads(snapshot))
+
+			self.journal_entries, complete = self.replay_journal()
+			if not complete:
+				self.save() #new entries can't be appended after a torn one
+
+	#applies journal entries in order, stopping at a torn last line left by a crash
+	def replay_journal(self):
+		if not os.path.isfile(self.journal_path):
+			return 0, True
+		entries = 0
+		with open(self.journal_path, encoding="utf-8") as file:
+			header = file.readline()
+			if not header.endswith("\n"):
+				return 0, False
+			self.check_header(header, self.journal_path)
+			for line in file:
+				try:
+					changes = json.loads(line)
+				except ValueError:
+					print(f"---Ignoring incomplete cache journal entry {entries + 1}---")
+					return entries, False
+				self.cache.update(changes)
+				entries += 1
+		return entries, True
+
+	#records the values that differ and schedules them to be appended to the journal
+	def update(self, values):
+		with self.lock:
+			for key, value in values.items():
+				if self.cache.get(key, self) != value:
+					self.cache[key] = value
+					self.pending[key] = value
+			if self.pending and self.timer is None:
+				self.timer = threading.Timer(self.WRITE_DELAY, self.flush)
+				self.timer.daemon = True
+				self.timer.start()
+
+	def cancel_write(self):
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+
+	def flush(self):
+		with self.lock:
+			self.cancel_write()
+			if not self.pending:
+				return
+			if self.journal_entries >= self.COMPACT_AFTER:
+				self.save()
+				return
+
+			entry = json.dumps(self.pending) + "\n"
+			new = not os.path.isfile(self.journal_path)
+			with open(self.journal_path, "a", encoding="utf-8") as file:
+				file.write(self.header() + entry if new else entry)
+				file.flush()
+				os.fsync(file.fileno())
+			self.pending = {}
+			self.journal_entries += 1
+
+	#writes a full snapshot atomically and starts a new journal
 	def save(self):
-		file = open(self.filepath, "wb")
-		pickle.dump(self.cache, file)
-		file.close()
+		with self.lock:
+			self.cancel_write()
+			temp_path = self.filepath + ".tmp"
+			with open(temp_path, "w", encoding="utf-8") as file:
+				file.write(self.header() + json.dumps(self.cache) + "\n")
+				file.flush()
+				os.fsync(file.fileno())
+			os.replace(temp_path, self.filepath)
+			sync_directory(self.filepath)
+			if os.path.isfile(self.journal_path):
+				os.remove(self.journal_path) #replaying it over the new snapshot would change nothing
+			self.pending = {}
+			self.journal_entries = 0
+
+	def close(self):
+		self.save()
+
+#makes a rename durable; directories can't be opened on Windows, where this is skipped
+def sync_directory(filepath):
+	if os.name == "nt":
+		return
+	descriptor = os.open(os.path.dirname(os.path.abspath(filepath)), os.O_RDONLY)
+	try:
+		os.fsync(descriptor)
+	finally:
+		os.close(descriptor)
+
+class CompiledScript:
+	def __init__(self, source, code, digest):
+		self.source = source
+		self.code = code
+		self.digest = digest
+
+#code objects are keyed by filepath + mtime and interned by content hash, so scripts
+#are compiled once per change and jobs sharing a file share one source and code object
+class ScriptCache:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.entries = {} #filepath -> (mtime_ns, size, CompiledScript)
+		self.interned = {} #content hash -> CompiledScript
+		self.refcounts = {} #content hash -> number of filepaths pointing at it
+
+	def get(self, filepath):
+		try:
+			stat = os.stat(filepath)
+		except (OSError, TypeError):
+			raise ScriptError("Script file not found!")
+
+		entry = self.entries.get(filepath)
+		if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+			return entry[2]
+		return self.load(filepath, stat)
+
+	def load(self, filepath, stat):
+		try:
+			with open(filepath, "rb") as file:
+				data = file.read()
+		except OSError:
+			raise ScriptError("Script file not found!")
+		digest = hashlib.sha1(data).hexdigest()
+
+		with self.lock:
+			compiled = self.interned.get(digest)
+			if compiled is None:
+				try:
+					code = compile(data, filepath, "exec")
+				except (SyntaxError, ValueError) as e:
+					raise ScriptError(f"Script failed to compile: {e}")
+				compiled = CompiledScript(importlib.util.decode_source(data), code, digest)
+				self.interned[digest] = compiled
+				self.refcounts[digest] = 0
+
+			old_entry = self.entries.get(filepath)
+			if old_entry is None or old_entry[2] is not compiled:
+				self.refcounts[digest] += 1
+				if old_entry is not None:
+					self.release(old_entry[2].digest)
+
+			self.entries[filepath] = (stat.st_mtime_ns, stat.st_size, compiled)
+			return compiled
+
+	#drops a content version once no filepath refers to it anymore
+	def release(self, digest):
+		self.refcounts[digest] -= 1
+		if self.refcounts[digest] <= 0:
+			del self.refcounts[digest]
+			del self.interned[digest]
+
+	#forgets filepaths no job uses anymore, with the content versions only they referred to
+	def discard(self, filepaths):
+		with self.lock:
+			for filepath in filepaths:
+				entry = self.entries.pop(filepath, None)
+				if entry is not None:
+					self.release(entry[2].digest)
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.interned.clear()
+			self.refcounts.clear()
+
+def next_bit(mask, value):
+	mask >>= value
+	if not mask:
+		return None
+	return value + (mask & -mask).bit_length() - 1
+
+#a cron schedule compiled into one bitset per field. Accepts 5-field (minute hour day month
+#weekday) and 6-field (second first) crontab lines, or the per-field form the scheduler uses
+class CronExpression:
+	FIELDS = ("second", "minute", "hour", "day", "month", "day_of_week", "year")
+	SCHEDULER_FIELDS = ("week", "start_date", "end_date", "timezone", "jitter") #left to the scheduler's CronTrigger
+	RANGES = {"second": (0, 59), "minute": (0, 59), "hour": (0, 23), "day": (1, 31), "month": (1, 12),
+			  "day_of_week": (0, 6), "year": (1970, 2199)}
+	MONTHS = {name: i + 1 for i, name in enumerate(("jan", "feb", "mar", "apr", "may", "jun",
+													"jul", "aug", "sep", "oct", "nov", "dec"))}
+	WEEKDAYS = {name: i for i, name in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))}
+	#crontab counts weekdays from sunday = 0 (or 7)
+	CRONTAB_WEEKDAYS = {name: (i + 1) % 7 for name, i in WEEKDAYS.items()}
+
+	compiled = {} #normalised arguments -> CronExpression, shared by jobs on the same schedule
+
+	def __init__(self, masks, last_day=False, day_or_weekday=False, text=""):
+		self.masks = masks
+		self.last_day = last_day #"last" in the day field
+		self.day_or_weekday = day_or_weekday #crontab rule: a restricted day OR weekday matches
+		self.text = text
+
+	@classmethod
+	def compile_args(cls, trigger_args):
+		key = tuple(sorted(trigger_args.items()))
+		expression = cls.compiled.get(key)
+		if expression is None:
+			if "crontab" in trigger_args:
+				if len(trigger_args) > 1:
+					raise ScriptError("A crontab line can't be combined with cron fields")
+				expression = cls.parse(trigger_args["crontab"])
+			else:
+				expression = cls.from_fields(trigger_args)
+			cls.compiled[key] = expression
+		return expression
+
+	@classmethod
+	def parse(cls, line):
+		parts = line.split()
+		if len(parts) == 5:
+			parts.insert(0, "0")
+		if len(parts) != 6:
+			raise ScriptError(f"Expected 5 or 6 crontab fields, got {len(parts)}: {line!r}")
+
+		masks = {field: cls.parse_field(field, text, crontab=True) for field, text in zip(cls.FIELDS, parts)}
+		masks["year"] = cls.full_mask("year")
+		restricted = parts[3] not in ("*", "?") and parts[5] not in ("*", "?")
+		return cls(masks, parts[3].lower() == "last", restricted, line.strip())
+
+	#fields left out behave like the scheduler's: going from year down to second, those up to the
+	#last given field are *, those after it their minimum (* for year and day_of_week)
+	@classmethod
+	def field_texts(cls, fields):
+		unknown = set(fields) - set(cls.FIELDS)
+		if unknown:
+			raise ScriptError(f"Unsupported cron fields: {', '.join(sorted(unknown))}")
+
+		order = ("year", "month", "day", "day_of_week", "hour", "minute", "second")
+		given = [order.index(field) for field, text in fields.items() if text is not None and str(text).strip() != ""]
+		last = max(given) if given else -1
+		texts = {}
+		for i, field in enumerate(order):
+			text = fields.get(field)
+			if text is None or str(text).strip() == "":
+				text = "*" if i < last or field in ("year", "day_of_week") else str(cls.RANGES[field][0])
+			texts[field] = str(text)
+		return texts
+
+	@classmethod
+	def from_fields(cls, fields):
+		masks = {field: cls.parse_field(field, text) for field, text in cls.field_texts(fields).items()}
+		text = " ".join(f"{field}={fields[field]}" for field in cls.FIELDS if field in fields)
+		return cls(masks, str(fields.get("day", "")).strip().lower() == "last", False, text)
+
+	@classmethod
+	def full_mask(cls, field):
+		low, high = cls.RANGES[field]
+		return ((1 << (high + 1)) - 1) ^ ((1 << low) - 1)
+
+	@classmethod
+	def parse_field(cls, field, text, crontab=False):
+		low, high = cls.RANGES[field]
+		names = cls.MONTHS if field == "month" else {}
+		if field == "day_of_week":
+			names = cls.CRONTAB_WEEKDAYS if crontab else cls.WEEKDAYS
+			if crontab:
+				high = 7
+
+		def value(part):
+			part = part.strip().lower()
+			if part in names:
+				return names[part]
+			try:
+				return int(part)
+			except ValueError:
+				raise ScriptError(f"Invalid {field} value {part!r} in {text!r}")
+
+		mask = 0
+		for part in text.lower().split(","):
+			part = part.strip()
+			if field == "day" and part == "last":
+				continue
+			span, slash, step = part.partition("/")
+			step = value(step) if slash else 1
+			if span in ("*", "?"):
+				start, end = low, high
+			elif "-" in span:
+				start, end = (value(bound) for bound in span.split("-", 1))
+			else:
+				start = value(span)
+				end = high if slash else start
+			if not low <= start <= end <= high or step < 1:
+				raise ScriptError(f"{field} {part!r} is out of range {low}-{high}")
+			for i in range(start, end + 1, step):
+				mask |= 1 << i
+
+		if field == "day_of_week" and crontab: #move to monday = 0 like datetime.weekday()
+			weekdays = 0
+			for i in range(8): #0 and 7 are both sunday
+				if mask >> i & 1:
+					weekdays |= 1 << ((i - 1) % 7)
+			mask = weekdays
+		return mask
+
+	def day_matches(self, moment):
+		day = bool(self.masks["day"] >> moment.day & 1)
+		if self.last_day:
+			following = moment + timedelta(days=1)
+			day = day or following.month != moment.month
+		weekday = bool(self.masks["day_of_week"] >> moment.weekday() & 1)
+		if self.day_or_weekday:
+			return day or weekday
+		return day and weekday
+
+	#first matching wall-clock time strictly after the given naive datetime
+	def next_after(self, moment):
+		masks = self.masks
+		moment = moment.replace(microsecond=0) + timedelta(seconds=1)
+		while True:
+			year = next_bit(masks["year"], moment.year)
+			if year is None:
+				return None
+			if year != moment.year:
+				moment = datetime(year, 1, 1)
+				continue
+
+			month = next_bit(masks["month"], moment.month)
+			if month is None:
+				moment = datetime(moment.year + 1, 1, 1)
+				continue
+			if month != moment.month:
+				moment = datetime(moment.year, month, 1)
+				continue
+
+			if not self.day_matches(moment):
+				moment = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+				continue
+
+			hour = next_bit(masks["hour"], moment.hour)
+			if hour is None:
+				moment = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+				continue
+			if hour != moment.hour:
+				moment = moment.replace(hour=hour, minute=0, second=0)
+				continue
+
+			minute = next_bit(masks["minute"], moment.minute)
+			if minute is None:
+				moment = moment.replace(minute=0, second=0) + timedelta(hours=1)
+				continue
+			if minute != moment.minute:
+				moment = moment.replace(minute=minute, second=0)
+				continue
+
+			second = next_bit(masks["second"], moment.second)
+			if second is None:
+				moment = moment.replace(second=0) + timedelta(minutes=1)
+				continue
+			return moment.replace(second=second)
+
+	def next_fire_times(self, count=5, start=None):
+		moment = (start or datetime.now()) - timedelta(microseconds=1)
+		times = []
+		while len(times) < count:
+			moment = self.next_after(moment)
+			if moment is None:
+				break
+			times.append(moment)
+		return times
+
+	def __str__(self):
+		return self.text
+
+#a compiled cron trigger, or the scheduler's own CronTrigger for what CronExpression doesn't cover:
+#the SCHEDULER_FIELDS and expressions such as day="last fri" or day="2nd mon"
+def cron_trigger(trigger_args, timezone=None):
+	try:
+		return CompiledCronTrigger(CronExpression.compile_args(trigger_args), timezone)
+	except ScriptError as e:
+		if "crontab" in trigger_args:
+			raise
+		try:
+			return CronTrigger(**{"timezone": timezone, **trigger_args})
+		except (TypeError, ValueError) as fallback_error:
+			if set(trigger_args) & set(CronExpression.SCHEDULER_FIELDS):
+				raise ScriptError(f"Invalid cron arguments: {fallback_error}")
+			raise e
+
+#next fire times of a trigger after start, as wall-clock times in its timezone like CronExpression's
+def trigger_fire_times(trigger_object, count=5, start=None):
+	timezone = trigger_object.timezone
+	if start is None:
+		now = datetime.now(timezone)
+	else:
+		now = start.astimezone(timezone) if start.tzinfo else localize(start, timezone)
+	times = []
+	fire_time = None
+	while len(times) < count:
+		fire_time = trigger_object.get_next_fire_time(fire_time, now)
+		if fire_time is None:
+			break
+		times.append(fire_time.replace(tzinfo=None))
+		now = fire_time
+	return times
+
+#next fire times for many schedules at once; expressions shared between jobs are worked out once
+def preview_cron(trigger_args_list, count=5, start=None):
+	start = start or datetime.now()
+	previews = {}
+	results = []
+	for trigger_args in trigger_args_list:
+		try:
+			expression = CronExpression.compile_args(trigger_args)
+		except ScriptError:
+			results.append(trigger_fire_times(cron_trigger(trigger_args), count, start))
+			continue
+		if id(expression) not in previews:
+			previews[id(expression)] = expression.next_fire_times(count, start)
+		results.append(previews[id(expression)])
+	return results
+
+#scheduler trigger backed by a compiled CronExpression
+class CompiledCronTrigger(BaseTrigger):
+	def __init__(self, expression, timezone=None):
+		self.expression = expression
+		self.timezone = astimezone(timezone) or get_localzone()
+
+	def get_next_fire_time(self, previous_fire_time, now):
+		start = min(now, previous_fire_time + timedelta(microseconds=1)) if previous_fire_time else now
+		start = start.astimezone(self.timezone).replace(tzinfo=None)
+		next_time = self.expression.next_after(start - timedelta(microseconds=1))
+		if previous_fire_time and next_time:
+			previous = previous_fire_time.astimezone(self.timezone).replace(tzinfo=None)
+			if next_time <= previous:
+				next_time = self.expression.next_after(previous)
+		return localize(next_time, self.timezone) if next_time else None
+
+	def __str__(self):
+		return f"cron[{self.expression}]"
+
+#fixed-size ring of a job's latest output, kept in a memory-mapped file (or anonymous memory
+#without one). The header holds the total bytes ever written, so the ring survives restarts.
+#With rotate_bytes set, everything written is also appended to a log that rotates at that size.
+#on_map is called with the buffer whenever it maps its file, which takes a file descriptor
+class OutputBuffer:
+	HEADER = struct.Struct("<4sIQ") #magic, ring size, bytes written
+	MAGIC = b"ACEO"
+
+	def __init__(self, size, filepath=None, log_path=None, rotate_bytes=None, keep=3, on_map=None):
+		self.size = size
+		self.filepath = filepath
+		self.log_path = log_path
+		self.rotate_bytes = rotate_bytes
+		self.keep = keep
+		self.on_map = on_map
+		self.lock = threading.Lock()
+		self.map = None #mapped on first use, so idle jobs cost nothing
+		self.log_file = None
+		self.written = 0
+		self.received = 0 #bytes written through this buffer, counted without mapping the file
+		self.discarded = False #writes are dropped from then on, so they can't bring the file back
+		self.users = 0 #runs under way, counted by OutputStore
+
+	def open_map(self):
+		length = self.HEADER.size + self.size
+		if self.filepath is None:
+			self.map = mmap.mmap(-1, length)
+			self.HEADER.pack_into(self.map, 0, self.MAGIC, self.size, 0)
+			return
+
+		with open(self.filepath, "a+b") as file:
+			file.seek(0)
+			header = file.read(self.HEADER.size)
+			reuse = len(header) == self.HEADER.size and self.HEADER.unpack(header)[:2] == (self.MAGIC, self.size)
+			if not reuse or os.path.getsize(self.filepath) != length:
+				file.truncate(0)
+				file.truncate(length)
+				reuse = False
+			self.map = mmap.mmap(file.fileno(), length)
+		if reuse:
+			self.written = self.HEADER.unpack_from(self.map, 0)[2]
+		else:
+			self.HEADER.pack_into(self.map, 0, self.MAGIC, self.size, 0)
+
+	def write(self, data):
+		if not data:
+			return
+		with self.lock:
+			if self.discarded:
+				return
+			self.received += len(data)
+			mapped = self.map is None
+			if mapped:
+				self.open_map()
+			self.write_ring(data)
+		if mapped and self.on_map and self.filepath:
+			self.on_map(self)
+
+	def write_ring(self, data):
+		if self.log_path:
+			self.append_log(data)
+
+		total = len(data)
+		data = data[-self.size:]
+		start = (self.written + total - len(data)) % self.size
+		first = min(len(data), self.size - start)
+		base = self.HEADER.size
+		self.map[base + start:base + start + first] = data[:first]
+		if first < len(data):
+			self.map[base:base + len(data) - first] = data[first:]
+		self.written += total
+		self.HEADER.pack_into(self.map, 0, self.MAGIC, self.size, self.written)
+
+	def append_log(self, data):
+		try:
+			if self.log_file is None:
+				self.log_file = open(self.log_path, "ab")
+			if self.rotate_bytes and self.log_file.tell() + len(data) > self.rotate_bytes and self.log_file.tell():
+				self.log_file.close()
+				for i in range(self.keep - 1, 0, -1):
+					if os.path.exists(f"{self.log_path}.{i}"):
+						os.replace(f"{self.log_path}.{i}", f"{self.log_path}.{i + 1}")
+				os.replace(self.log_path, self.log_path + ".1")
+				self.log_file = open(self.log_path, "ab")
+			self.log_file.write(data)
+		except OSError as e:
+			print(f"---Could not write output log {self.log_path}: {e}---")
+
+	#ring contents oldest first, and whether older output has been overwritten
+	def read(self):
+		with self.lock:
+			if self.map is None:
+				if self.discarded or self.filepath is None or not os.path.isfile(self.filepath):
+					return b"", False
+				self.open_map()
+				mapped = True
+			else:
+				mapped = False
+			base = self.HEADER.size
+			if self.written <= self.size:
+				data, wrapped = bytes(self.map[base:base + self.written]), False
+			else:
+				start = self.written % self.size
+				data, wrapped = bytes(self.map[base + start:base + self.size]) + bytes(self.map[base:base + start]), True
+		if mapped and self.on_map:
+			self.on_map(self)
+		return data, wrapped
+
+	def tail(self, lines=100):
+		data, wrapped = self.read()
+		if wrapped: #the oldest line is cut short
+			data = data[data.find(b"\n") + 1:]
+		position = len(data) - 1 if data.endswith(b"\n") else len(data)
+		for i in range(lines):
+			position = data.rfind(b"\n", 0, position)
+			if position < 0:
+				break
+		return data[position + 1:].decode(errors="replace")
+
+	#unmaps the file and closes the log; both are opened again on the next use
+	def close(self):
+		with self.lock:
+			if self.map is not None:
+				self.map.close()
+				self.map = None
+			if self.log_file is not None:
+				self.log_file.close()
+				self.log_file = None
+
+	#closes the buffer for good and deletes its ring file
+	def discard(self):
+		with self.lock:
+			self.discarded = True
+			if self.map is not None:
+				self.map.close()
+				self.map = None
+			if self.log_file is not None:
+				self.log_file.close()
+				self.log_file = None
+			if self.filepath and os.path.isfile(self.filepath):
+				os.remove(self.filepath)
+
+#one OutputBuffer per job, as <job id>.ring files in the given directory. At most MAX_MAPPED rings
+#are mapped at once, each holding a file descriptor; the least recently used are unmapped past that.
+#Runs acquire() their job's buffer and release() it when done, so a buffer discarded meanwhile
+#stays dead until then instead of a late write creating the file anew
+class OutputStore:
+	instances = []
+
+	MAX_MAPPED = 256
+
+	def __init__(self, directory=None, size=65536, rotate_bytes=None, keep=3):
+		self.instances.append(self)
+		self.directory = directory
+		self.size = size
+		self.rotate_bytes = rotate_bytes
+		self.keep = keep
+		self.lock = threading.Lock()
+		self.buffers = {}
+		self.mapped = OrderedDict() #buffers with a mapped file, least recently used first
+
+	def path(self, job_id, extension):
+		return os.path.join(self.directory, f"{job_id}.{extension}") if self.directory else None
+
+	def get(self, job_id):
+		with self.lock:
+			return self.get_locked(job_id)
+
+	def get_locked(self, job_id):
+		buffer = self.buffers.get(job_id)
+		if buffer is None:
+			if self.directory:
+				os.makedirs(self.directory, exist_ok=True)
+			log_path = self.path(job_id, "log") if self.rotate_bytes else None
+			buffer = OutputBuffer(self.size, self.path(job_id, "ring"), log_path, self.rotate_bytes, self.keep,
+								  self.note_mapped)
+			self.buffers[job_id] = buffer
+		elif buffer in self.mapped:
+			self.mapped.move_to_end(buffer)
+		return buffer
+
+	def note_mapped(self, buffer):
+		with self.lock:
+			self.mapped[buffer] = None
+			self.mapped.move_to_end(buffer)
+			evicted = []
+			while len(self.mapped) > self.MAX_MAPPED:
+				evicted.append(self.mapped.popitem(last=False)[0])
+		for old_buffer in evicted: #outside our lock, as the buffer calls in here holding its own
+			old_buffer.close()
+
+	#the job's buffer for a run, counted until release()
+	def acquire(self, job_id):
+		with self.lock:
+			buffer = self.get_locked(job_id)
+			buffer.users += 1
+			return buffer
+
+	def release(self, job_id):
+		with self.lock:
+			buffer = self.buffers.get(job_id)
+			if buffer is None:
+				return
+			buffer.users -= 1
+			if buffer.discarded and buffer.users <= 0:
+				del self.buffers[job_id]
+
+	def write(self, job_id, data):
+		self.get(job_id).write(data)
+
+	def tail(self, job_id, lines=100):
+		return self.get(job_id).tail(lines)
+
+	#bytes written to the job's output by this process
+	def written(self, job_id):
+		return self.get(job_id).received
+
+	#rotated logs are left on disk, only the rings go. Buffers still in use by a run are kept
+	#(dead) until it releases them
+	def discard(self, job_ids):
+		for job_id in job_ids:
+			with self.lock:
+				buffer = self.buffers.get(job_id)
+				if buffer is not None:
+					buffer.discarded = True
+					self.mapped.pop(buffer, None)
+					if buffer.users <= 0:
+						del self.buffers[job_id]
+			if buffer:
+				buffer.discard()
+			else:
+				filepath = self.path(job_id, "ring")
+				if filepath and os.path.isfile(filepath):
+					os.remove(filepath)
+
+	def close(self):
+		with self.lock:
+			buffers, self.buffers = list(self.buffers.values()), {}
+			self.mapped.clear()
+		for buffer in buffers:
+			buffer.close()
+
+#stands in for sys.stdout/sys.stderr: writes from a thread running a captured job go to that
+#job's output, everything else goes to the original stream
+class OutputRouter:
+	local = threading.local()
+
+	def __init__(self, stream):
+		self.stream = stream
+
+	def write(self, text):
+		buffer = getattr(self.local, "buffer", None)
+		if buffer is None:
+			return self.stream.write(text)
+		buffer.write(text.encode(errors="replace"))
+		return len(text)
+
+	def flush(self):
+		if getattr(self.local, "buffer", None) is None:
+			self.stream.flush()
+
+	def __getattr__(self, name):
+		return getattr(self.stream, name)
+
+	@classmethod
+	def install(cls):
+		if not isinstance(sys.stdout, cls):
+			sys.stdout = cls(sys.stdout)
+		if not isinstance(sys.stderr, cls):
+			sys.stderr = cls(sys.stderr)
+
+	@classmethod
+	@contextlib.contextmanager
+	def capture(cls, buffer):
+		cls.install()
+		previous = getattr(cls.local, "buffer", None)
+		cls.local.buffer = buffer
+		try:
+			yield
+		finally:
+			cls.local.buffer = previous
+
+#keeps the last `size` bytes written, for output captured inside pool workers
+class TailWriter:
+	def __init__(self, size):
+		self.size = size
+		self.data = bytearray()
+
+	def write(self, text):
+		self.data += text.encode(errors="replace")
+		if len(self.data) > 2 * self.size:
+			del self.data[:-self.size]
+		return len(text)
+
+	def flush(self):
+		pass
+
+	def getvalue(self):
+		return bytes(self.data[-self.size:])
+
+#trigger for jobs that run when their upstream jobs succeed. It never fires on its own,
+#the handler runs these jobs from Handler.run_downstream
+class DependencyTrigger(BaseTrigger):
+	def __init__(self, upstream):
+		if isinstance(upstream, str) or not upstream or not all(isinstance(job_id, str) for job_id in upstream):
+			raise ScriptError("A dependent job needs a list of upstream job IDs")
+		self.upstream = tuple(dict.fromkeys(upstream))
+
+	def get_next_fire_time(self, previous_fire_time, now):
+		return None
+
+	def __str__(self):
+		return f"after[{', '.join(self.upstream)}]"
+
+#fixed offset of a job's fires within a jitter window of the given seconds. It depends only on
+#the job ID, so a job keeps its slot across restarts and every coordinated instance agrees on it
+def spread_offset(job_id, window):
+	digest = hashlib.blake2b(job_id.encode(), digest_size=8).digest()
+	return int.from_bytes(digest, "big") / 2 ** 64 * window
+
+#shifts every fire time of another trigger by a fixed number of seconds
+class OffsetTrigger(BaseTrigger):
+	def __init__(self, trigger, offset):
+		self.trigger = trigger
+		self.offset = timedelta(seconds=offset)
+
+	def get_next_fire_time(self, previous_fire_time, now):
+		previous = previous_fire_time - self.offset if previous_fire_time else None
+		next_time = self.trigger.get_next_fire_time(previous, now - self.offset)
+		return next_time + self.offset if next_time else None
+
+	def __str__(self):
+		return f"{self.trigger} +{self.offset.total_seconds():.1f}s"
+
+#trigger for jobs that run when watched files or directories change. Like DependencyTrigger it
+#never fires on its own, the handler's FileWatcher runs these jobs
+class WatchTrigger(BaseTrigger):
+	def __init__(self, paths, debounce=0.5, skip_unchanged=False):
+		if isinstance(paths, str) or not paths or not all(isinstance(path, str) for path in paths):
+			raise ScriptError("A watch job needs a list of paths")
+		if not isinstance(debounce, (int, float)) or debounce < 0:
+			raise ScriptError("debounce must be 0 or more seconds")
+		self.paths = tuple(dict.fromkeys(os.path.abspath(path) for path in paths))
+		self.debounce = debounce
+		self.skip_unchanged = bool(skip_unchanged)
+
+	def get_next_fire_time(self, previous_fire_time, now):
+		return None
+
+	def __str__(self):
+		return f"watch[{', '.join(self.paths)}]"
+
+#hash of the watched paths' content: a file's bytes, or the names and bytes of a directory's files
+def input_digest(paths):
+	digest = hashlib.blake2b()
+	for path in sorted(paths):
+		digest.update(path.encode() + b"\0")
+		if os.path.isdir(path):
+			try:
+				names = sorted(entry.name for entry in os.scandir(path) if entry.is_file())
+			except OSError:
+				names = []
+			files = [os.path.join(path, name) for name in names]
+		else:
+			files = [path]
+		for filepath in files:
+			digest.update(os.path.basename(filepath).encode() + b"\0")
+			try:
+				with open(filepath, "rb") as file:
+					for chunk in iter(lambda: file.read(1 << 20), b""):
+						digest.update(chunk)
+			except OSError:
+				digest.update(b"\0missing")
+	return digest.hexdigest()
+
+#time of the latest change to the watched paths as the filesystem records it, so daemons sharing
+#it agree on it: the newest modification time of the paths, the files in watched directories and
+#the directories holding watched files, where renames and deletions show
+def input_changed_time(paths):
+	latest = 0.0
+	for path in paths:
+		if os.path.isdir(path):
+			try:
+				entries = [entry for entry in os.scandir(path) if entry.is_file()]
+			except OSError:
+				entries = []
+			candidates = [path] + [entry.path for entry in entries]
+		else:
+			candidates = [path, os.path.dirname(path)]
+		for candidate in candidates:
+			try:
+				latest = max(latest, os.stat(candidate).st_mtime)
+			except OSError:
+				pass
+	return latest
+
+#watches paths for jobs and calls callback(job_id) once a burst of changes has settled for the
+#job's debounce time. Uses inotify on Linux, elsewhere (or if it fails) it polls every
+#poll_interval. A file is watched through its directory, so it is seen when replaced or created.
+#Directories are watched one level deep
+class FileWatcher:
+	#inotify event flags
+	IN_MODIFY = 0x2
+	IN_ATTRIB = 0x4
+	IN_CLOSE_WRITE = 0x8
+	IN_MOVED_FROM = 0x40
+	IN_MOVED_TO = 0x80
+	IN_CREATE = 0x100
+	IN_DELETE = 0x200
+	IN_DELETE_SELF = 0x400
+	IN_MOVE_SELF = 0x800
+	IN_Q_OVERFLOW = 0x4000
+	IN_IGNORED = 0x8000
+	WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+				  IN_DELETE_SELF | IN_MOVE_SELF)
+	EVENT = struct.Struct("iIII") #wd, mask, cookie, name length
+
+	MAX_HOLD = 10 #a steady stream of changes still fires every MAX_HOLD debounce periods
+
+	def __init__(self, callback, poll_interval=1.0):
+		self.callback = callback
+		self.poll_interval = poll_interval
+		self.lock = threading.Lock()
+		self.jobs = {} #job ID -> ((directory, name) of each path, debounce)
+		self.targets = {} #directory -> {file name, or None for the directory itself: {job ID: None}}
+		self.watches = {} #inotify watch descriptor -> directory
+		self.watched = {} #directory -> watch descriptor
+		self.signatures = {} #(directory, name) -> last seen state, when polling
+		self.first_change = {} #job ID -> when its pending burst of changes started
+		self.deadlines = {} #job ID -> when it fires unless more changes come
+		self.thread = None
+		self.stopped = False
+		self.inotify = None
+		self.fd = None
+		self.wake_reader, self.wake_writer = socket.socketpair()
+		self.wake_reader.setblocking(False)
+
+	def start(self):
+		with self.lock:
+			if self.thread is not None or self.stopped:
+				return
+			self.open_inotify()
+			self.thread = threading.Thread(target=self.run, name="aces-watch", daemon=True)
+			self.thread.start()
+
+	def open_inotify(self):
+		if not sys.platform.startswith("linux"):
+			return
+		try:
+			libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+			fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+		except (OSError, AttributeError):
+			return
+		if fd >= 0:
+			self.inotify, self.fd = libc, fd
+
+	@property
+	def backend(self):
+		return "inotify" if self.fd is not None else "polling"
+
+	def watch(self, job_id, paths, debounce):
+		self.start()
+		keys = [self.split(path) for path in paths]
+		with self.lock:
+			self.jobs[job_id] = (keys, debounce)
+			for key in keys:
+				directory, name = key
+				self.targets.setdefault(directory, {}).setdefault(name, {})[job_id] = None
+				self.signatures.setdefault(key, self.signature(key))
+				self.add_watch(directory)
+		self.wake()
+
+	def unwatch(self, job_ids):
+		with self.lock:
+			for job_id in job_ids:
+				keys, debounce = self.jobs.pop(job_id, ((), 0))
+				self.first_change.pop(job_id, None)
+				self.deadlines.pop(job_id, None)
+				for key in keys:
+					directory, name = key
+					names = self.targets.get(directory, {})
+					names.get(name, {}).pop(job_id, None)
+					if not names.get(name, True):
+						del names[name]
+						self.signatures.pop(key, None)
+					if not names:
+						self.targets.pop(directory, None)
+						self.remove_watch(directory)
+
+	#a directory is watched itself, a file (existing or not) through its parent
+	def split(self, path):
+		if os.path.isdir(path):
+			return path, None
+		return os.path.dirname(path), os.path.basename(path)
+
+	def add_watch(self, directory):
+		if self.fd is None or directory in self.watched:
+			return
+		wd = self.inotify.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+		if wd >= 0: #a missing directory is retried every poll_interval
+			self.watches[wd] = directory
+			self.watched[directory] = wd
+
+	def remove_watch(self, directory):
+		wd = self.watched.pop(directory, None)
+		if wd is not None:
+			self.watches.pop(wd, None)
+			self.inotify.inotify_rm_watch(self.fd, wd)
+
+	#what polling compares between passes
+	def signature(self, key):
+		directory, name = key
+		path = os.path.join(directory, name) if name else directory
+		try:
+			if os.path.isdir(path):
+				return frozenset((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+								 for entry in os.scandir(path))
+			stat = os.stat(path)
+			return stat.st_mtime_ns, stat.st_size, stat.st_ino
+		except OSError:
+			return None
+
+	def wake(self):
+		try:
+			self.wake_writer.send(b"\0")
+		except OSError:
+			pass
+
+	def run(self):
+		next_poll = time.monotonic() + self.poll_interval
+		while not self.stopped:
+			with self.lock:
+				deadline = min(self.deadlines.values(), default=next_poll)
+			timeout = max(0.0, min(deadline, next_poll) - time.monotonic())
+			readers = [self.wake_reader] + ([self.fd] if self.fd is not None else [])
+			ready = select.select(readers, [], [], timeout)[0]
+			if self.stopped:
+				return
+			if self.wake_reader in ready:
+				try:
+					while self.wake_reader.recv(4096):
+						pass
+				except OSError:
+					pass
+			if self.fd is not None and self.fd in ready:
+				self.read_events()
+			if time.monotonic() >= next_poll:
+				self.poll()
+				next_poll = time.monotonic() + self.poll_interval
+			self.fire_due()
+
+	def read_events(self):
+		try:
+			data = os.read(self.fd, 65536)
+		except BlockingIOError:
+			return
+		now = time.monotonic()
+		offset = 0
+		with self.lock:
+			while offset + self.EVENT.size <= len(data):
+				wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+				name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+				offset += self.EVENT.size + length
+				if mask & self.IN_Q_OVERFLOW: #events were lost, so everything may have changed
+					for job_id in self.jobs:
+						self.changed(job_id, now)
+					continue
+				directory = self.watches.get(wd)
+				if directory is None:
+					continue
+				names = self.targets.get(directory, {})
+				for job_id in list(names.get(None, {})) + list(names.get(os.fsdecode(name), {}) if name else []):
+					self.changed(job_id, now)
+				if mask & self.IN_IGNORED: #the directory itself went away
+					del self.watches[wd]
+					self.watched.pop(directory, None)
+					for jobs in names.values():
+						for job_id in jobs:
+							self.changed(job_id, now)
+
+	#compares signatures without inotify, and with it retries directories that could not be watched
+	def poll(self):
+		now = time.monotonic()
+		with self.lock:
+			if self.fd is not None:
+				for directory in [directory for directory in self.targets if directory not in self.watched]:
+					self.add_watch(directory)
+					if directory in self.watched: #it came (back)
+						for jobs in self.targets[directory].values():
+							for job_id in jobs:
+								self.changed(job_id, now)
+				return
+			keys = list(self.signatures)
+		signatures = {key: self.signature(key) for key in keys}
+		with self.lock:
+			for key, signature in signatures.items():
+				if key in self.signatures and self.signatures[key] != signature:
+					self.signatures[key] = signature
+					directory, name = key
+					for job_id in list(self.targets.get(directory, {}).get(name, {})):
+						self.changed(job_id, now)
+
+	def changed(self, job_id, now):
+		if job_id not in self.jobs:
+			return
+		debounce = self.jobs[job_id][1]
+		first = self.first_change.setdefault(job_id, now)
+		self.deadlines[job_id] = min(now + debounce, first + self.MAX_HOLD * debounce)
+
+	def fire_due(self):
+		now = time.monotonic()
+		with self.lock:
+			due = [job_id for job_id, deadline in self.deadlines.items() if deadline <= now]
+			for job_id in due:
+				del self.deadlines[job_id]
+				del self.first_change[job_id]
+		for job_id in due:
+			try:
+				self.callback(job_id)
+			except Exception:
+				traceback.print_exc()
+
+	def stop(self):
+		self.stopped = True
+		self.wake()
+		if self.thread:
+			self.thread.join()
+		self.wake_reader.close()
+		self.wake_writer.close()
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+#PATH lookups of command executables, shared by every command job. A lookup holds until PATH
+#changes or one of the directories searched up to the executable's does, as it does when a
+#program is installed earlier in PATH or the executable is removed
+class ExecutableCache:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.entries = {} #name -> (PATH, resolved path, ((directory, mtime_ns), ...))
+
+	def resolve(self, name):
+		if os.path.dirname(name): #a path of its own, not searched for
+			return name
+		search_path = os.environ.get("PATH", os.defpath)
+		entry = self.entries.get(name)
+		if entry is not None and entry[0] == search_path and all(
+				self.directory_stamp(directory) == stamp for directory, stamp in entry[2]):
+			return entry[1]
+
+		resolved = shutil.which(name, path=search_path)
+		if resolved is None:
+			raise ScriptError(f"Command not found: {name}")
+		found_in = os.path.normcase(os.path.dirname(resolved))
+		stamps = []
+		for directory in search_path.split(os.pathsep):
+			stamps.append((directory, self.directory_stamp(directory)))
+			if os.path.normcase(directory) == found_in:
+				break
+		with self.lock:
+			self.entries[name] = (search_path, resolved, tuple(stamps))
+		return resolved
+
+	def directory_stamp(self, directory):
+		try:
+			return os.stat(directory or os.curdir).st_mtime_ns
+		except OSError:
+			return None
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+#a child started by posix_spawn, with the pid RunControl signals
+class SpawnedProcess:
+	def __init__(self, pid):
+		self.pid = pid
+
+	#control, if given, is marked finished once the child has exited but before it is reaped, so the
+	#watchdog can't signal the pid after it has been freed for reuse
+	def wait(self, control=None):
+		if control is not None and hasattr(os, "waitid"):
+			os.waitid(os.P_PID, self.pid, os.WEXITED | os.WNOWAIT)
+			control.finish()
+		return os.waitstatus_to_exitcode(os.waitpid(self.pid, 0)[1])
 
 class CmdScript:
+	executables = ExecutableCache() #shared by every CmdScript
+	SPAWN = hasattr(os, "posix_spawn") and hasattr(os, "waitstatus_to_exitcode")
+
 	def __init__(self, content, exec_job_handle=None, exec_type=None):
+		self.id = None #assigned by the handler when scheduled
 		self.content = content
 		self.exec_job_handle = exec_job_handle
 		self.exec_type = exec_type
+		self.environment = None #copied from ours on the first run
 
-	def execute(self):
-		subprocess.call(self.content.split(" "))
+	#the command is split once, with shell quoting rules, whenever it is set
+	@property
+	def content(self):
+		return self.command
+
+	@content.setter
+	def content(self, value):
+		self.command = value
+		try:
+			self.args = tuple(shlex.split(value, posix=os.name != "nt")) if value else ()
+		except ValueError as e:
+			raise ScriptError(f"Could not parse command: {e}")
+
+	def argv(self):
+		return list(self.args)
+
+	def executable(self):
+		if not self.args:
+			raise ScriptError("Empty command")
+		return self.executables.resolve(self.args[0])
+
+	#output, if given, is an OutputBuffer that takes the child's stdout and stderr.
+	#control, if given, is the run's RunControl; a watched child gets a process group of its own
+	def execute(self, output=None, control=None):
+		session = control is not None and control.timeout is not None
+		if self.SPAWN:
+			self.last_exit_code = self.spawn(output, control, session)
+			return self.last_exit_code
+
+		if output is None:
+			with subprocess.Popen(self.argv(), executable=self.executable(), start_new_session=session) as process:
+				if control is not None:
+					control.attach(process)
+				self.last_exit_code = process.wait()
+			return self.last_exit_code
+
+		with subprocess.Popen(self.argv(), executable=self.executable(), stdin=subprocess.DEVNULL,
+							  stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=session) as process:
+			if control is not None:
+				control.attach(process)
+			for data in iter(lambda: process.stdout.read1(65536), b""):
+				output.write(data)
+		self.last_exit_code = process.returncode
+		return self.last_exit_code
+
+	#posix_spawn skips the fork and the per-launch work of subprocess. Our own descriptors are
+	#all close-on-exec, so the child only gets the ones set up here
+	def spawn(self, output, control, session):
+		if self.environment is None:
+			self.environment = dict(os.environ)
+		if output is None:
+			process = SpawnedProcess(os.posix_spawn(self.executable(), self.args, self.environment, setsid=session))
+			try:
+				if control is not None:
+					control.attach(process)
+			finally:
+				exit_code = process.wait(control)
+			return exit_code
+
+		reader, writer = os.pipe()
+		try:
+			actions = [(os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0), (os.POSIX_SPAWN_DUP2, writer, 1),
+					   (os.POSIX_SPAWN_DUP2, writer, 2)]
+			process = SpawnedProcess(os.posix_spawn(self.executable(), self.args, self.environment,
+													file_actions=actions, setsid=session))
+		except BaseException:
+			os.close(reader)
+			raise
+		finally:
+			os.close(writer)
+		try: #the child is reaped even if taking its output fails
+			with open(reader, "rb", buffering=0) as stream:
+				if control is not None:
+					control.attach(process)
+				for data in iter(lambda: stream.read(65536), b""):
+					output.write(data)
+		finally:
+			exit_code = process.wait(control)
+		return exit_code
 
 	def get_name(self):
 		if self.content:
@@ -66,17 +1364,26 @@ class CmdScript:
 		return "Cmd{}"
 
 class ActionScript(CmdScript):
+	cache = ScriptCache() #shared by every ActionScript
+
 	def __init__(self, filepath, exec_job_handle=None, exec_type=None):
-		super().__init__("", exec_job_handle, exec_type)
+		super().__init__(None, exec_job_handle, exec_type)
 		self.filepath = filepath
 		self.load_content()
 
+	#source is held once in the shared cache instead of per script object
+	@property
+	def content(self):
+		return self.load_content().source
+
+	@content.setter
+	def content(self, value):
+		if value is not None:
+			raise ScriptError("ActionScript content is read from its file")
+
+	#recompiles only when the file has changed since the last call
 	def load_content(self):
-		try:
-			with open(self.filepath, "r") as file:
-				self.content = file.read()
-		except:
-			raise ScriptError("Script file not found!")
+		return self.cache.get(self.filepath)
 
 	###deprecated
 	#def write_content(self, write_content):
@@ -88,79 +1395,3165 @@ class ActionScript(CmdScript):
 	#def subprocess_execute(self):
 	#	subprocess.call(["python", filepath])
 
-	def execute(self):
-		exec(self.content) ###use cmd-subprocess implementation???
+	#runs in the calling thread; the handler runs scripts with a timeout in a child instead (see run_isolated)
+	def execute(self, output=None, control=None):
+		if output is None:
+			exec(self.load_content().code) ###use cmd-subprocess implementation???
+			return
+
+		with OutputRouter.capture(output): #prints from this thread land in the job's output
+			try:
+				exec(self.load_content().code)
+			except Exception:
+				traceback.print_exc()
+				raise
 
 	def get_name(self):
 		return "File{" + os.path.basename(self.filepath) + "}"
 
-class Handler:
+#modules imported once by every pool worker, so scripts don't pay for them per run
+PRELOAD_MODULES = ("os", "sys", "time", "datetime", "json", "re", "math", "subprocess", "pathlib")
+
+def process_worker_init(modules):
+	ActionScript.cache.lock = threading.Lock() #a forked copy of the lock may be held
+	for name in modules:
+		try:
+			importlib.import_module(name)
+		except ImportError:
+			pass
+
+def process_worker_ping():
+	return os.getpid()
+
+#runs inside a pool worker; the worker's own cache keeps the compiled code between runs.
+#With capture_size set, returns the tail of the script's output and the error it raised, if any.
+#With profile_file set, the run is profiled into that file (see profiled)
+def process_worker_run(filepath, capture_size=None, profile_file=None, profile_memory=False):
+	with profiled(profile_file, profile_memory):
+		if capture_size is None:
+			exec(ActionScript.cache.get(filepath).code)
+			return None
+
+		output = TailWriter(capture_size)
+		error = None
+		with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+			try:
+				exec(ActionScript.cache.get(filepath).code)
+			except Exception as e:
+				traceback.print_exc()
+				error = f"{type(e).__name__}: {e}"
+		return output.getvalue(), error
+
+#runs a file script in a child of its own (see Handler.run_isolated) and sends back what
+#process_worker_run returns, or the error that stopped it
+def isolated_worker_run(filepath, connection, capture_size, profile_file=None, profile_memory=False):
+	if hasattr(os, "setsid"):
+		os.setsid() #a process group of its own, so stopping it stops anything it started
+		#a fork holds copies of whatever the handler's other threads had open, such as the pipes of
+		#children they are starting, which must not stay open for as long as this run takes
+		keep = connection.fileno()
+		os.closerange(3, keep)
+		os.closerange(keep + 1, os.sysconf("SC_OPEN_MAX"))
+	ActionScript.cache.lock = threading.Lock() #a forked copy of the lock may be held
+	try:
+		result = process_worker_run(filepath, capture_size, profile_file, profile_memory)
+	except BaseException as e: #e.g. SystemExit from the script
+		result = b"", f"{type(e).__name__}: {e}"
+	connection.send(result)
+	connection.close()
+	os._exit(0) #skips the exit handlers copied from the handler, which would act on its pools
+
+#profiles the body with cProfile into filepath (pstats format, readable by snakeviz, flameprof
+#and the like). With memory, tracemalloc's peak and top allocating lines go to filepath + ".memory".
+#Does nothing without a filepath
+@contextlib.contextmanager
+def profiled(filepath, memory=False):
+	if filepath is None:
+		yield
+		return
+
+	started_tracing = False
+	if memory:
+		if not tracemalloc.is_tracing():
+			tracemalloc.start()
+			started_tracing = True
+		tracemalloc.reset_peak()
+	profiler = cProfile.Profile()
+	profiler.enable()
+	try:
+		yield
+	finally:
+		profiler.disable()
+		profiler.dump_stats(filepath)
+		if memory:
+			peak = tracemalloc.get_traced_memory()[1]
+			snapshot = tracemalloc.take_snapshot().filter_traces(
+				[tracemalloc.Filter(False, module.__file__) for module in (cProfile, tracemalloc, contextlib)] +
+				[tracemalloc.Filter(False, __file__)])
+			allocations = snapshot.statistics("lineno")[:10]
+			if started_tracing:
+				tracemalloc.stop()
+			with open(filepath + ".memory", "w") as file:
+				file.write(f"peak {peak / 1024:.1f} KiB, largest allocations still held after the run:\n")
+				file.writelines(f"{allocation}\n" for allocation in allocations)
+
+#running totals behind a pool's utilisation: the seconds its workers were busy out of the seconds
+#they existed. Pools set their current size, busy and queued counts whenever these change
+class PoolUsage:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.counts = {"size": 0, "busy": 0, "queued": 0}
+		self.peaks = dict(self.counts)
+		self.busy_seconds = 0.0
+		self.worker_seconds = 0.0
+		self.last = time.monotonic()
+
+	def advance(self):
+		now = time.monotonic()
+		self.busy_seconds += self.counts["busy"] * (now - self.last)
+		self.worker_seconds += self.counts["size"] * (now - self.last)
+		self.last = now
+
+	def set(self, **counts):
+		with self.lock:
+			self.advance()
+			self.counts.update(counts)
+			for key, value in counts.items():
+				self.peaks[key] = max(self.peaks[key], value)
+
+	def stats(self):
+		with self.lock:
+			self.advance()
+			return {**self.counts, **{f"peak_{key}": value for key, value in self.peaks.items()},
+					"busy_seconds": self.busy_seconds, "worker_seconds": self.worker_seconds,
+					"utilisation": self.busy_seconds / self.worker_seconds if self.worker_seconds else None}
+
+#named pool of threads for I/O-bound runs. A worker is added whenever more runs are queued than
+#workers are idle, up to max_workers, and workers idle for IDLE_TIMEOUT leave down to min_workers
+class ThreadWorkerPool:
+	instances = []
+	kind = "thread"
+	IDLE_TIMEOUT = 30
+
+	def __init__(self, name="thread", min_workers=1, max_workers=10):
+		self.instances.append(self)
+		self.name = name
+		self.min_workers = min_workers
+		self.max_workers = max_workers
+		self.queue = deque() #(future, function, args)
+		self.condition = threading.Condition()
+		self.workers = 0
+		self.idle = 0
+		self.busy = 0
+		self.closed = False
+		self.numbers = itertools.count(1)
+		self.grown = 0
+		self.shrunk = 0
+		self.usage = PoolUsage()
+
+	def start(self):
+		with self.condition:
+			while self.workers < self.min_workers and not self.closed:
+				self.add_worker()
+
+	def submit(self, function, *args):
+		future = concurrent.futures.Future()
+		with self.condition:
+			if self.closed:
+				raise RuntimeError(f"pool {self.name} is closed")
+			self.queue.append((future, function, args))
+			if len(self.queue) > self.idle and self.workers < self.max_workers:
+				self.add_worker()
+				self.grown += 1
+			else:
+				self.condition.notify()
+			self.note_usage()
+		return future
+
+	def add_worker(self):
+		self.workers += 1
+		threading.Thread(target=self.work, name=f"aces-{self.name}-{next(self.numbers)}", daemon=True).start()
+
+	def note_usage(self):
+		self.usage.set(size=self.workers, busy=self.busy, queued=len(self.queue))
+
+	def work(self):
+		while True:
+			with self.condition:
+				self.idle += 1
+				deadline = time.monotonic() + self.IDLE_TIMEOUT
+				while not self.queue and not self.closed:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0 and self.workers > self.min_workers:
+						break
+					self.condition.wait(remaining if remaining > 0 else self.IDLE_TIMEOUT)
+				self.idle -= 1
+				if not self.queue: #idle for long enough, or closed
+					self.workers -= 1
+					if not self.closed:
+						self.shrunk += 1
+					self.note_usage()
+					self.condition.notify_all()
+					return
+				future, function, args = self.queue.popleft()
+				self.busy += 1
+				self.note_usage()
+
+			if future.set_running_or_notify_cancel():
+				try:
+					result = function(*args)
+				except BaseException as e: #JobCancelled included, the worker carries on
+					future.set_exception(e)
+				else:
+					future.set_result(result)
+			with self.condition:
+				self.busy -= 1
+				self.note_usage()
+
+	def stats(self):
+		with self.condition:
+			extra = {"kind": self.kind, "min": self.min_workers, "max": self.max_workers,
+					 "grown": self.grown, "shrunk": self.shrunk}
+		return {**self.usage.stats(), **extra}
+
+	#without wait, queued runs are cancelled and workers busy with a run are left to it
+	def close(self, wait=True):
+		with self.condition:
+			self.closed = True
+			if not wait:
+				while self.queue:
+					self.queue.popleft()[0].cancel()
+			self.condition.notify_all()
+			while wait and self.workers:
+				self.condition.wait()
+
+#named pool of worker processes for CPU-heavy ActionScripts, away from the GIL. Workers are started as
+#runs queue up, up to max_workers, and a pool idle for IDLE_TIMEOUT is recycled down to min_workers
+class ProcessPool:
 	instances = []
+	kind = "process"
+	IDLE_TIMEOUT = 60
+
+	def __init__(self, max_workers=None, preload=PRELOAD_MODULES, name="process", min_workers=1):
+		self.instances.append(self)
+		self.name = name
+		self.max_workers = max_workers or os.cpu_count() or 1
+		self.min_workers = min(min_workers, self.max_workers)
+		self.preload = preload
+		self.pool = None
+		self.closed = False
+		self.lock = threading.Lock()
+		self.in_flight = 0
+		self.idle_since = time.monotonic()
+		self.idle_timer = None #one pending check at a time, not one per run
+		self.shrunk = 0
+		self.usage = PoolUsage()
+
+	def start(self):
+		with self.lock:
+			self.executor()
+
+	#the current executor, started if there is none, e.g. after the pool was recycled. Under the lock
+	def executor(self):
+		if self.closed:
+			raise RuntimeError(f"pool {self.name} is closed")
+		if self.pool is None:
+			#workers come from a fork server where there is one: the pool grows while the handler's
+			#threads are busy, and a plain fork would copy the locks and pipes they hold at that moment
+			methods = multiprocessing.get_all_start_methods()
+			context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+			if context.get_start_method() == "forkserver":
+				context.set_forkserver_preload([__name__, *self.preload])
+			self.pool = concurrent.futures.ProcessPoolExecutor(self.max_workers, mp_context=context,
+															   initializer=process_worker_init,
+															   initargs=(self.preload,))
+			#spin the minimum up now instead of on the first job fire, in the background as the
+			#first worker waits for the fork server to import its modules
+			threading.Thread(target=self.warm_up, args=(self.pool,), name=f"aces-{self.name}-warm-up",
+							 daemon=True).start()
+		return self.pool
+
+	def warm_up(self, pool):
+		try:
+			for future in [pool.submit(process_worker_ping) for i in range(self.min_workers)]:
+				future.result()
+		except (RuntimeError, concurrent.futures.CancelledError): #closed meanwhile
+			return
+		with self.lock:
+			self.note_usage()
+
+	def size(self):
+		return len(getattr(self.pool, "_processes", None) or {}) if self.pool is not None else 0
+
+	def note_usage(self):
+		size = self.size()
+		self.usage.set(size=size, busy=min(self.in_flight, size), queued=max(0, self.in_flight - size))
+
+	#hands a run to the executor and counts it against the pool until it is done. Both happen
+	#under the lock, so shrink() can't shut the executor down in between
+	def submit_run(self, *args):
+		with self.lock:
+			future = self.executor().submit(process_worker_run, *args)
+			self.in_flight += 1
+			self.note_usage()
+		future.add_done_callback(self.untrack)
+		return future
+
+	def untrack(self, future):
+		with self.lock:
+			self.in_flight -= 1
+			self.note_usage()
+			if not self.in_flight:
+				self.idle_since = time.monotonic()
+				if self.idle_timer is None and self.size() > self.min_workers:
+					self.check_idle(self.IDLE_TIMEOUT)
+
+	#under the lock
+	def check_idle(self, delay):
+		self.idle_timer = threading.Timer(delay, self.shrink)
+		self.idle_timer.daemon = True
+		self.idle_timer.start()
+
+	def shrink(self):
+		with self.lock:
+			self.idle_timer = None
+			if self.in_flight or self.pool is None:
+				return
+			idle = time.monotonic() - self.idle_since
+			if idle < self.IDLE_TIMEOUT: #busy again since the check was set
+				self.check_idle(self.IDLE_TIMEOUT - idle)
+				return
+			pool, self.pool = self.pool, None
+			self.shrunk += 1
+			self.executor()
+		pool.shutdown(wait=False)
+
+	def submit(self, script_object, output=None, profile_file=None, profile_memory=False):
+		if output is None:
+			return self.submit_run(script_object.filepath, None, profile_file, profile_memory)
+
+		#the returned future completes once the worker's output is in the job's buffer
+		future = concurrent.futures.Future()
+		def relay(worker_future):
+			if worker_future.cancelled():
+				future.cancel()
+				future.set_running_or_notify_cancel()
+			elif worker_future.exception():
+				future.set_exception(worker_future.exception())
+			else:
+				data, error = worker_future.result()
+				output.write(data)
+				if error:
+					future.set_exception(ScriptError(error))
+				else:
+					future.set_result(None)
+		worker_future = self.submit_run(script_object.filepath, output.size, profile_file, profile_memory)
+		worker_future.add_done_callback(relay)
+		return future
+
+	def run(self, script_object):
+		return self.submit(script_object).result()
+
+	def stats(self):
+		with self.lock:
+			extra = {"kind": self.kind, "min": self.min_workers, "max": self.max_workers, "shrunk": self.shrunk}
+		return {**self.usage.stats(), **extra}
+
+	#without wait, workers still busy are terminated, or a hung run would hold up interpreter exit
+	def close(self, wait=True):
+		with self.lock:
+			self.closed = True
+			if self.idle_timer is not None:
+				self.idle_timer.cancel()
+				self.idle_timer = None
+			if self.pool is not None:
+				processes = list((getattr(self.pool, "_processes", None) or {}).values())
+				self.pool.shutdown(wait=wait, cancel_futures=not wait)
+				if not wait:
+					for process in processes:
+						if process.is_alive():
+							process.terminate()
+				self.pool = None
+
+#a run the watchdog can stop: the child process (group) it started, or the thread it runs in
+class RunControl:
+	SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+	def __init__(self, script_object, timeout=None):
+		self.script_object = script_object
+		self.timeout = timeout
+		self.process = None #Popen, multiprocessing or asyncio process, set once started
+		self.thread_id = None #set while running in-process
+		self.lock = threading.Lock()
+		self.finished = False
+		self.timed_out = False
+		self.cancelled = False #stopped on shutdown rather than for its timeout
+
+	#sets the child process once started; one that started past its deadline is killed outright
+	def attach(self, process):
+		with self.lock:
+			self.process = process
+			late = self.timed_out or self.cancelled
+		if late:
+			self.kill()
+
+	#marks an in-process run, so it can be cancelled with JobCancelled
+	@contextlib.contextmanager
+	def in_thread(self):
+		with self.lock:
+			self.thread_id = threading.get_ident()
+		try:
+			yield
+		finally:
+			with self.lock:
+				self.thread_id = None
+
+	def terminate(self):
+		self.send(signal.SIGTERM)
+
+	def kill(self):
+		self.send(self.SIGKILL)
+
+	def send(self, signum):
+		with self.lock:
+			if self.finished:
+				return
+			if self.process is not None:
+				pid = self.process.pid
+				try:
+					if self.timeout is not None and hasattr(os, "killpg"):
+						try:
+							os.killpg(pid, signum)
+							return
+						except ProcessLookupError: #not in its own group yet
+							pass
+					os.kill(pid, signum)
+				except OSError: #already gone
+					pass
+			elif self.thread_id is not None:
+				#lands at the thread's next bytecode; a call blocked in C finishes first
+				ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id),
+														   ctypes.py_object(JobCancelled))
+
+	def finish(self):
+		with self.lock:
+			self.finished = True
+
+#enforces run timeouts: a run past its deadline gets SIGTERM, then SIGKILL grace seconds later.
+#Counts what it stopped, and the slots that came back from runs it had to stop
+class Watchdog:
+	def __init__(self, grace=5):
+		self.grace = grace
+		self.condition = threading.Condition()
+		self.deadlines = [] #heap of (monotonic deadline, sequence, control, "timeout" | "cancel" | "kill")
+		self.pending = {} #control -> its entries in the heap, while the run is under way
+		self.sequence = itertools.count()
+		self.thread = None
+		self.stopped = False
+		self.timed_out = 0
+		self.cancelled = 0
+		self.killed = 0
+		self.reclaimed = 0
+		self.stuck = set() #stopped runs that have not finished yet
+
+	def watch(self, control):
+		if control.timeout is not None:
+			self.schedule(control.timeout, control, "timeout")
+
+	def schedule(self, delay, control, action):
+		with self.condition:
+			if self.stopped or control.finished:
+				return
+			heapq.heappush(self.deadlines, (time.monotonic() + delay, next(self.sequence), control, action))
+			self.pending[control] = self.pending.get(control, 0) + 1
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="aces-watchdog", daemon=True)
+				self.thread.start()
+			self.condition.notify()
+
+	def run(self):
+		while True:
+			with self.condition:
+				while not self.stopped and (not self.deadlines or self.deadlines[0][0] > time.monotonic()):
+					self.condition.wait(self.deadlines[0][0] - time.monotonic() if self.deadlines else None)
+				if self.stopped:
+					return
+				deadline, sequence, control, action = heapq.heappop(self.deadlines)
+				if control in self.pending:
+					self.pending[control] -= 1
+					if not self.pending[control]:
+						del self.pending[control]
+				if control.finished or (action != "kill" and control in self.stuck):
+					continue
+				if action == "timeout":
+					control.timed_out = True
+					self.timed_out += 1
+				elif action == "cancel":
+					control.cancelled = True
+					self.cancelled += 1
+				else:
+					self.killed += 1
+				self.stuck.add(control)
+			if action == "kill":
+				control.kill()
+				continue
+			if action == "timeout":
+				print(f"---{control.script_object.get_name()} timed out after {control.timeout:g}s, stopping it---")
+			control.terminate()
+			self.schedule(self.grace, control, "kill")
+
+	#stops runs straight away, the same way as timed out ones; used on shutdown
+	def cancel(self, controls):
+		for control in controls:
+			self.schedule(0, control, "cancel")
+
+	#entries of finished runs stay in the heap until it is mostly made of them, then it is rebuilt
+	#without them, so finished runs don't keep their control, script and process until the deadline
+	def finished(self, control):
+		control.finish()
+		with self.condition:
+			if control in self.stuck:
+				self.stuck.discard(control)
+				self.reclaimed += 1
+			if self.pending.pop(control, None) and len(self.deadlines) > 2 * len(self.pending) + 64:
+				self.deadlines = [entry for entry in self.deadlines if not entry[2].finished]
+				heapq.heapify(self.deadlines)
+				self.pending = {}
+				for entry in self.deadlines:
+					self.pending[entry[2]] = self.pending.get(entry[2], 0) + 1
+
+	def stats(self):
+		with self.condition:
+			return {"grace": self.grace, "timed_out": self.timed_out, "cancelled": self.cancelled, "killed": self.killed,
+					"reclaimed": self.reclaimed, "stuck": len(self.stuck)}
+
+	def stop(self):
+		with self.condition:
+			self.stopped = True
+			self.condition.notify()
+		if self.thread is not None:
+			self.thread.join()
+
+#(function, calls, own seconds, cumulative seconds) of the functions with the most cumulative time
+def top_functions(stats, count=25):
+	rows = []
+	for (filename, line, name), (primitive_calls, calls, own, cumulative, callers) in stats.stats.items():
+		where = f"{os.path.basename(filename)}:{line}({name})" if line else name
+		rows.append((where, calls, own, cumulative))
+	rows.sort(key=lambda row: row[3], reverse=True)
+	return rows[:count]
+
+#samples every Nth run of jobs with the profile option and profiles it, keeping the last KEEP
+#runs' pstats files in <directory>/<job id>/ next to aggregate.pstats, the sum of every
+#profiled run. Only one run is profiled at a time, others are let through unprofiled
+class JobProfiler:
+	KEEP = 20
+
+	def __init__(self, directory):
+		self.directory = directory
+		self.lock = threading.Lock()
+		self.active = threading.Lock() #held by the run being profiled
+		self.runs = {} #job ID -> runs seen since profiling was turned on
+		self.aggregates = {} #job ID -> pstats.Stats of all its profiled runs
+
+	def job_directory(self, job_id):
+		return os.path.join(self.directory, job_id)
+
+	#the file to profile this run into, or None if it isn't sampled
+	def sample(self, script_object):
+		if not script_object.profile:
+			return None
+		with self.lock:
+			count = self.runs[script_object.id] = self.runs.get(script_object.id, 0) + 1
+		if (count - 1) % script_object.profile or not self.active.acquire(blocking=False):
+			return None
+		try:
+			os.makedirs(self.job_directory(script_object.id), exist_ok=True)
+		except OSError:
+			self.active.release()
+			raise
+		return os.path.join(self.job_directory(script_object.id), f"{time.time_ns() // 1000000}.pstats")
+
+	def reset(self, job_id):
+		with self.lock:
+			self.runs.pop(job_id, None)
+
+	#profiles a run in this thread
+	@contextlib.contextmanager
+	def profile(self, script_object, filepath):
+		if filepath is None:
+			yield
+			return
+		try:
+			with profiled(filepath, script_object.profile_memory):
+				yield
+		finally:
+			self.collect(script_object.id, filepath)
+
+	#adds a finished run's profile to the job's aggregate and frees the profiler for the next run
+	def collect(self, job_id, filepath):
+		try:
+			try:
+				stats = pstats.Stats(filepath)
+			except (OSError, EOFError, TypeError, ValueError):
+				return #the run never got as far as writing it
+			aggregate_path = os.path.join(self.job_directory(job_id), "aggregate.pstats")
+			with self.lock:
+				aggregate = self.aggregates.get(job_id)
+				if aggregate is None and os.path.isfile(aggregate_path): #carried over from before a restart
+					aggregate = pstats.Stats(aggregate_path)
+				if aggregate is None:
+					aggregate = stats
+				else:
+					aggregate.add(stats)
+				self.aggregates[job_id] = aggregate
+				aggregate.dump_stats(aggregate_path)
+			self.prune(job_id)
+		finally:
+			self.active.release()
+
+	def prune(self, job_id):
+		runs = sorted(name for name in os.listdir(self.job_directory(job_id))
+					  if name.endswith(".pstats") and name != "aggregate.pstats")
+		for name in runs[:-self.KEEP]:
+			for filepath in (os.path.join(self.job_directory(job_id), name),
+							 os.path.join(self.job_directory(job_id), name + ".memory")):
+				if os.path.isfile(filepath):
+					os.remove(filepath)
+
+	def top(self, job_id, count=25):
+		with self.lock:
+			aggregate = self.aggregates.get(job_id)
+		if aggregate is None:
+			return profile_report(self.directory, job_id, count)[0]
+		return top_functions(aggregate, count)
+
+	#profiles are left on disk, like rotated output logs
+	def discard(self, job_ids):
+		with self.lock:
+			for job_id in job_ids:
+				self.runs.pop(job_id, None)
+				self.aggregates.pop(job_id, None)
+
+#top functions from a job's aggregate.pstats and its latest memory report, from any process
+def profile_report(directory, job_id, count=25):
+	job_directory = os.path.join(directory, job_id)
+	aggregate_path = os.path.join(job_directory, "aggregate.pstats")
+	if not os.path.isfile(aggregate_path):
+		return [], None
+	top = top_functions(pstats.Stats(aggregate_path), count)
+	memory_reports = sorted(name for name in os.listdir(job_directory) if name.endswith(".memory"))
+	memory = None
+	if memory_reports:
+		with open(os.path.join(job_directory, memory_reports[-1])) as file:
+			memory = file.read()
+	return top, memory
+
+def format_profile(top, memory):
+	lines = [f"{'cumulative':>11} {'own':>10} {'calls':>8}  function"]
+	lines.extend(f"{cumulative:>10.4f}s {own:>9.4f}s {calls:>8}  {where}" for where, calls, own, cumulative in top)
+	if memory:
+		lines.append("")
+		lines.append("Latest memory profile:")
+		lines.append(memory.rstrip())
+	return "\n".join(lines)
+
+#durable job definitions, so schedules survive restarts. Rows are written as jobs are
+#added or removed, and next run times are written behind in batches as jobs fire
+class JobStore:
+	instances = []
+
+	DEFAULT_FILEPATH = "aces_jobs.db"
+
+	SCHEMA = """CREATE TABLE IF NOT EXISTS jobs (
+		id TEXT PRIMARY KEY,
+		kind TEXT NOT NULL,
+		content TEXT NOT NULL,
+		exec_type TEXT,
+		trigger TEXT NOT NULL,
+		trigger_args TEXT NOT NULL,
+		options TEXT NOT NULL,
+		next_run_time REAL)"""
+
+	def __init__(self, filepath, flush_interval=5):
+		self.instances.append(self)
+		self.filepath = filepath
+		self.flush_interval = flush_interval
+		self.lock = threading.Lock()
+		self.pending_runs = {} #job id -> next run timestamp
+		self.pending_removals = set()
+		self.last_flush = time.monotonic()
+
+		self.conn = sqlite3.connect(filepath, check_same_thread=False)
+		self.data_version = None
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		self.conn.execute(self.SCHEMA)
+		self.conn.commit()
+
+	def load(self):
+		with self.lock:
+			return self.conn.execute("SELECT id, kind, content, exec_type, trigger, trigger_args, "
+									 "options, next_run_time FROM jobs ORDER BY rowid").fetchall()
+
+	def add(self, rows):
+		with self.lock, self.conn:
+			self.conn.executemany("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+	def remove(self, job_ids):
+		with self.lock, self.conn:
+			cursor = self.conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+			for job_id in job_ids:
+				self.pending_runs.pop(job_id, None)
+			return cursor.rowcount
+
+	#those of the given IDs that have no row
+	def missing(self, ids):
+		ids = list(ids)
+		with self.lock:
+			found = {row[0] for row in self.conn.execute(
+				f"SELECT id FROM jobs WHERE id IN ({', '.join('?' * len(ids))})", ids)}
+		return [job_id for job_id in ids if job_id not in found]
+
+	#cheap check for commits made by other connections, e.g. the CLI while the daemon runs
+	def changed(self):
+		with self.lock:
+			version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+		changed = self.data_version is not None and version != self.data_version
+		self.data_version = version
+		return changed
+
+	#write-behind for state that changes on every fire
+	def mark_run(self, job_id, next_run_time):
+		with self.lock:
+			self.pending_runs[job_id] = next_run_time
+		self.maybe_flush()
+
+	def mark_removed(self, job_id):
+		with self.lock:
+			self.pending_runs.pop(job_id, None)
+			self.pending_removals.add(job_id)
+		self.maybe_flush()
+
+	def maybe_flush(self):
+		if time.monotonic() - self.last_flush >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		with self.lock, self.conn:
+			runs, self.pending_runs = self.pending_runs, {}
+			removals, self.pending_removals = self.pending_removals, set()
+			self.last_flush = time.monotonic()
+
+			self.conn.executemany("UPDATE jobs SET next_run_time = ? WHERE id = ?",
+								  [(next_run, job_id) for job_id, next_run in runs.items()])
+			self.conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in removals])
+
+	def close(self):
+		self.flush()
+		with self.lock:
+			self.conn.close()
+
+#record of past runs in SQLite. Rows are kept compact: job IDs are stored once in the jobs table
+#and runs refer to them by number, times are whole milliseconds (microseconds for durations),
+#the scheduled time is kept as the delay from it and successful runs have no status text.
+#Indexes per job answer the queries without reading other jobs' runs. Runs are written behind
+#in batches from a writer thread, which also deletes runs older than retention_days and hands
+#the freed pages back to the file system
+class RunHistory:
+	instances = []
+
+	SCHEMA = ("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, job_id TEXT UNIQUE NOT NULL, "
+			  "longest_streak INTEGER NOT NULL DEFAULT 0)",
+			  #status is NULL for successful runs, lag_ms NULL for runs that were not scheduled
+			  "CREATE TABLE IF NOT EXISTS runs (job INTEGER NOT NULL, started_ms INTEGER NOT NULL, "
+			  "duration_us INTEGER NOT NULL, lag_ms INTEGER, status TEXT, output_bytes INTEGER NOT NULL)",
+			  "CREATE INDEX IF NOT EXISTS runs_by_job ON runs (job, started_ms, status)",
+			  "CREATE INDEX IF NOT EXISTS runs_by_duration ON runs (job, duration_us)")
+	FLUSH_INTERVAL = 1.0
+	FLUSH_SIZE = 10000 #pending runs that trigger an early flush
+	COMPACT_INTERVAL = 3600
+
+	#shared: other instances write to the same file, so failure streaks are read back from it
+	def __init__(self, filepath, retention_days=30, shared=False):
+		self.instances.append(self)
+		self.filepath = filepath
+		self.retention_days = retention_days
+		self.shared = shared
+		self.lock = threading.Lock()
+		self.condition = threading.Condition()
+		self.pending = []
+		self.job_numbers = {} #job ID -> row id in the jobs table
+		self.streaks = {} #job number -> current failure streak, for runs written from here unless shared
+		self.thread = None
+		self.stopped = False
+		self.last_compact = time.monotonic()
+
+		self.conn = sqlite3.connect(filepath, timeout=30, check_same_thread=False)
+		self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL") #only takes effect on a new file
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		with self.conn:
+			for statement in self.SCHEMA:
+				self.conn.execute(statement)
+
+	#times are epoch seconds, scheduled is None for runs started by hand or by another job
+	def record(self, job_id, scheduled, started, duration, status, output_bytes):
+		with self.condition:
+			if self.stopped:
+				return
+			self.pending.append((job_id, scheduled, started, duration, status, output_bytes))
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="aces-history", daemon=True)
+				self.thread.start()
+			if len(self.pending) >= self.FLUSH_SIZE:
+				self.condition.notify()
+
+	def run(self):
+		while True:
+			with self.condition:
+				if not self.stopped:
+					self.condition.wait(self.FLUSH_INTERVAL)
+				stopped = self.stopped
+			self.flush()
+			if time.monotonic() - self.last_compact >= self.COMPACT_INTERVAL:
+				self.compact()
+			if stopped:
+				return
+
+	def flush(self):
+		with self.condition:
+			pending, self.pending = self.pending, []
+		if not pending:
+			return
+		with self.lock, self.conn:
+			if self.shared: #runs others wrote since our last flush change the streaks
+				self.streaks.clear()
+			longest = {}
+			rows = []
+			for job_id, scheduled, started, duration, status, output_bytes in pending:
+				number = self.job_number(job_id)
+				streak = self.streaks.get(number)
+				if streak is None:
+					streak = self.failure_streak(number)
+				streak = 0 if status == "ok" else streak + 1
+				self.streaks[number] = streak
+				longest[number] = max(longest.get(number, 0), streak)
+				started_ms = round(started * 1000)
+				lag_ms = started_ms - round(scheduled * 1000) if scheduled is not None else None
+				rows.append((number, started_ms, round(duration * 1e6), lag_ms, None if status == "ok" else status,
+							 output_bytes))
+			rows.sort() #runs of a job go in next to each other
+			self.conn.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)", rows)
+			self.conn.executemany("UPDATE jobs SET longest_streak = max(longest_streak, ?) WHERE id = ?",
+								  [(streak, number) for number, streak in longest.items() if streak])
+
+	def job_number(self, job_id, create=True):
+		number = self.job_numbers.get(job_id)
+		if number is None:
+			row = self.conn.execute("SELECT id FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+			if row is None:
+				if not create:
+					return None
+				row = (self.conn.execute("INSERT INTO jobs (job_id) VALUES (?)", (job_id,)).lastrowid,)
+			number = self.job_numbers[job_id] = row[0]
+		return number
+
+	#failed runs since the job's last successful one, read backwards from its latest run
+	def failure_streak(self, number):
+		return self.conn.execute("SELECT count(*) FROM runs WHERE job = ? AND started_ms > coalesce("
+								 "(SELECT started_ms FROM runs WHERE job = ? AND status IS NULL "
+								 "ORDER BY started_ms DESC LIMIT 1), -1)", (number, number)).fetchone()[0]
+
+	#drops runs past the retention time, and jobs left without runs
+	def compact(self):
+		self.last_compact = time.monotonic()
+		if self.retention_days is None:
+			return 0
+		cutoff = round((time.time() - self.retention_days * 86400) * 1000)
+		deleted = 0
+		with self.lock:
+			with self.conn:
+				numbers = [row[0] for row in self.conn.execute("SELECT id FROM jobs")]
+				for number in numbers: #a range of each job's index, rather than a scan of the table
+					deleted += self.conn.execute("DELETE FROM runs WHERE job = ? AND started_ms < ?",
+												 (number, cutoff)).rowcount
+				if deleted:
+					self.conn.execute("DELETE FROM jobs WHERE NOT EXISTS (SELECT 1 FROM runs WHERE job = jobs.id)")
+					self.job_numbers.clear()
+					self.streaks.clear()
+			if deleted:
+				self.conn.executescript("PRAGMA incremental_vacuum;") #stepped to the end, execute() frees one page
+				self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)") #so the main file shrinks now
+		return deleted
+
+	def quantile(self, number, count, q):
+		return self.conn.execute("SELECT duration_us FROM runs WHERE job = ? ORDER BY duration_us LIMIT 1 OFFSET ?",
+								 (number, min(count - 1, int(count * q)))).fetchone()[0] / 1e6
+
+	#success rate, p50/p99 duration and failure streaks of one job, None if it has no runs
+	def summary(self, job_id):
+		self.flush()
+		with self.lock:
+			number = self.job_number(job_id, create=False)
+			if number is None:
+				return None
+			runs = self.conn.execute("SELECT count(*) FROM runs WHERE job = ?", (number,)).fetchone()[0]
+			if not runs:
+				return None
+			failures = self.conn.execute("SELECT count(*) FROM runs WHERE job = ? AND status IS NOT NULL",
+										 (number,)).fetchone()[0]
+			last = self.conn.execute("SELECT started_ms, status FROM runs WHERE job = ? "
+									 "ORDER BY started_ms DESC LIMIT 1", (number,)).fetchone()
+			longest = self.conn.execute("SELECT longest_streak FROM jobs WHERE id = ?", (number,)).fetchone()[0]
+			return {"runs": runs, "success_rate": 1 - failures / runs, "p50": self.quantile(number, runs, 0.5),
+					"p99": self.quantile(number, runs, 0.99), "failure_streak": self.failure_streak(number),
+					"longest_failure_streak": longest, "last_started": last[0] / 1000, "last_status": last[1] or "ok"}
+
+	#summaries of the given jobs, or of every job with runs
+	def summaries(self, job_ids=None):
+		if job_ids is None:
+			self.flush()
+			with self.lock:
+				job_ids = [row[0] for row in self.conn.execute("SELECT job_id FROM jobs ORDER BY id")]
+		summaries = {}
+		for job_id in job_ids:
+			summary = self.summary(job_id)
+			if summary is not None:
+				summaries[job_id] = summary
+		return summaries
+
+	#latest runs of a job, newest first
+	def recent(self, job_id, limit=20):
+		self.flush()
+		with self.lock:
+			number = self.job_number(job_id, create=False)
+			if number is None:
+				return []
+			rows = self.conn.execute("SELECT started_ms, duration_us, lag_ms, status, output_bytes FROM runs "
+									 "WHERE job = ? ORDER BY started_ms DESC LIMIT ?", (number, limit)).fetchall()
+		return [{"scheduled": (started_ms - lag_ms) / 1000 if lag_ms is not None else None,
+				 "started": started_ms / 1000, "ended": started_ms / 1000 + duration_us / 1e6,
+				 "status": status or "ok", "output_bytes": output_bytes}
+				for started_ms, duration_us, lag_ms, status, output_bytes in rows]
+
+	def close(self):
+		with self.condition:
+			self.stopped = True
+			self.condition.notify()
+		if self.thread:
+			self.thread.join()
+		self.flush()
+		with self.lock:
+			self.conn.close()
+
+#lets several instances share one job store. Every instance schedules every job, and each fire
+#is claimed in a shared SQLite file so that one instance runs it. The fire's preferred instance,
+#picked by rendezvous hashing over the live instances with free capacity, claims it straight away;
+#the others try HANDOFF seconds later in case it is down. Claims are leases renewed while the run
+#lasts, and a claim whose owner stops renewing it is taken over and run again
+class LeaseCoordinator:
+	instances = []
+
+	LEASE = 15 #seconds a claim or heartbeat stays valid without renewal
+	HEARTBEAT = 2
+	HANDOFF = 1.0
+	RETAIN = 3600 #seconds claims are kept for
+
+	SCHEMA = ("""CREATE TABLE IF NOT EXISTS instances (
+		id TEXT PRIMARY KEY,
+		heartbeat REAL NOT NULL,
+		running INTEGER NOT NULL,
+		capacity INTEGER)""",
+		"""CREATE TABLE IF NOT EXISTS claims (
+		job_id TEXT NOT NULL,
+		fire_time REAL NOT NULL,
+		owner TEXT NOT NULL,
+		expires REAL NOT NULL,
+		done INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (job_id, fire_time))""",
+		"CREATE INDEX IF NOT EXISTS claims_open ON claims (done, expires)",
+		"""CREATE TABLE IF NOT EXISTS dependencies (
+		dependent_id TEXT NOT NULL,
+		upstream_id TEXT NOT NULL,
+		PRIMARY KEY (dependent_id, upstream_id))""")
+
+	def __init__(self, handler, filepath, instance_id=None):
+		self.instances.append(self)
+		self.handler = handler
+		self.filepath = filepath
+		self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+		self.lock = threading.Lock() #guards the connection and active claims
+		self.conn = sqlite3.connect(filepath, check_same_thread=False, timeout=30, isolation_level=None)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		for statement in self.SCHEMA:
+			self.conn.execute(statement)
+
+		self.active = set() #(job ID, fire time) of claims held by this instance
+		self.live = [self.instance_id] #instance IDs as of the last heartbeat
+		self.free = [self.instance_id] #those of them below their capacity
+		self.deferred = [] #heap of (due, sequence, script, scheduled) waiting out the handoff
+		self.sequence = itertools.count()
+		self.condition = threading.Condition()
+		self.thread = None
+		self.stopped = False
+		self.closed = False
+		self.counts = {"claimed": 0, "lost": 0, "taken_over": 0}
+
+	def start(self):
+		if self.thread is None:
+			self.heartbeat()
+			self.thread = threading.Thread(target=self.run, name="aces-leases", daemon=True)
+			self.thread.start()
+
+	def preferred(self, job_id, fire_time):
+		candidates = self.free or self.live
+		return max(candidates, key=lambda instance_id: hashlib.blake2b(
+			f"{instance_id}|{job_id}|{fire_time}".encode(), digest_size=8).digest())
+
+	#True if this instance should run the fire now. Runs outside the scheduler aren't claimed,
+	#watch runs claim the time of the change they run for with try_claim
+	def claim(self, script_object, scheduled):
+		if scheduled is None:
+			return True
+		fire_time = scheduled.timestamp()
+		if self.preferred(script_object.id, fire_time) == self.instance_id:
+			return self.try_claim(script_object.id, fire_time)
+		with self.condition:
+			if not self.stopped:
+				heapq.heappush(self.deferred, (time.monotonic() + self.HANDOFF, next(self.sequence),
+											   script_object, scheduled))
+				self.condition.notify()
+		return False
+
+	def try_claim(self, job_id, fire_time, takeover=False):
+		now = time.time()
+		with self.lock:
+			if self.closed:
+				return False
+			if takeover:
+				cursor = self.conn.execute("UPDATE claims SET owner = ?, expires = ? WHERE job_id = ? AND fire_time = ? "
+										   "AND done = 0 AND expires < ?",
+										   (self.instance_id, now + self.LEASE, job_id, fire_time, now))
+			else:
+				cursor = self.conn.execute("INSERT OR IGNORE INTO claims (job_id, fire_time, owner, expires) "
+										   "VALUES (?, ?, ?, ?)", (job_id, fire_time, self.instance_id, now + self.LEASE))
+			won = cursor.rowcount == 1
+			if won:
+				self.active.add((job_id, fire_time))
+			self.counts["claimed" if won else "lost"] += 1
+		return won
+
+	def complete(self, job_id, scheduled):
+		if scheduled is None:
+			return
+		key = (job_id, scheduled.timestamp())
+		with self.lock:
+			if key in self.active and not self.closed:
+				self.active.discard(key)
+				self.conn.execute("UPDATE claims SET done = 1 WHERE job_id = ? AND fire_time = ? AND owner = ?",
+								  key + (self.instance_id,))
+
+	#fan-in state shared by all instances: True once every upstream job has succeeded, which also resets it
+	def upstream_finished(self, dependent_id, upstream_id, upstream_ids, succeeded):
+		with self.lock:
+			self.conn.execute("BEGIN IMMEDIATE")
+			try:
+				ready = False
+				if not succeeded:
+					self.conn.execute("DELETE FROM dependencies WHERE dependent_id = ? AND upstream_id = ?",
+									  (dependent_id, upstream_id))
+				else:
+					self.conn.execute("INSERT OR IGNORE INTO dependencies VALUES (?, ?)", (dependent_id, upstream_id))
+					done = {row[0] for row in self.conn.execute(
+						"SELECT upstream_id FROM dependencies WHERE dependent_id = ?", (dependent_id,))}
+					ready = done.issuperset(upstream_ids)
+					if ready:
+						self.conn.execute("DELETE FROM dependencies WHERE dependent_id = ?", (dependent_id,))
+				self.conn.execute("COMMIT")
+			except Exception:
+				self.conn.execute("ROLLBACK")
+				raise
+		return ready
+
+	def run(self):
+		last_beat = time.monotonic()
+		while True:
+			with self.condition:
+				if self.stopped:
+					return
+				now = time.monotonic()
+				due = []
+				while self.deferred and self.deferred[0][0] <= now:
+					due.append(heapq.heappop(self.deferred))
+				wait = self.HEARTBEAT - (now - last_beat)
+				if self.deferred:
+					wait = min(wait, self.deferred[0][0] - now)
+				if not due and wait > 0:
+					self.condition.wait(wait)
+					continue
+
+			for due_time, sequence, script_object, scheduled in due:
+				if script_object.id in self.handler.registry and self.try_claim(script_object.id, scheduled.timestamp()):
+					self.handler.dispatch_claimed(script_object, scheduled)
+			if time.monotonic() - last_beat >= self.HEARTBEAT:
+				try:
+					self.heartbeat()
+					self.reap()
+				except sqlite3.Error as e:
+					print(f"---Lease heartbeat failed: {e}---")
+				last_beat = time.monotonic()
+
+	#publishes this instance's load, renews its leases and refreshes the live instances
+	def heartbeat(self):
+		now = time.time()
+		stats = self.handler.admission.stats()
+		with self.lock:
+			if self.closed:
+				return
+			self.conn.execute("BEGIN")
+			self.conn.execute("INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?)",
+							  (self.instance_id, now, stats["running"], self.handler.admission.max_concurrent))
+			self.conn.executemany("UPDATE claims SET expires = ? WHERE job_id = ? AND fire_time = ? AND owner = ?",
+								  [(now + self.LEASE, job_id, fire_time, self.instance_id)
+								   for job_id, fire_time in self.active])
+			self.conn.execute("DELETE FROM claims WHERE fire_time < ?", (now - self.RETAIN,))
+			self.conn.execute("DELETE FROM instances WHERE heartbeat < ?", (now - self.RETAIN,))
+			rows = self.conn.execute("SELECT id, running, capacity FROM instances WHERE heartbeat >= ?",
+									 (now - self.LEASE,)).fetchall()
+			self.conn.execute("COMMIT")
+		self.live = sorted(row[0] for row in rows) or [self.instance_id]
+		self.free = sorted(row[0] for row in rows if row[2] is None or row[1] < row[2])
+
+	#takes over runs whose owner stopped renewing the lease
+	def reap(self):
+		now = time.time()
+		with self.lock:
+			rows = self.conn.execute("SELECT job_id, fire_time FROM claims WHERE done = 0 AND expires < ? LIMIT 100",
+									 (now,)).fetchall()
+		for job_id, fire_time in rows:
+			script_object = self.handler.registry.get(job_id)
+			if script_object is None or not self.try_claim(job_id, fire_time, takeover=True):
+				continue
+			self.counts["taken_over"] += 1
+			print(f"---Took over {script_object.get_name()} from an instance that stopped renewing its lease---")
+			self.handler.dispatch_claimed(script_object, datetime.fromtimestamp(fire_time, self.handler.scheduler.timezone))
+
+	def stats(self):
+		return {"instance": self.instance_id, "live_instances": len(self.live), "active_leases": len(self.active),
+				"deferred": len(self.deferred), **self.counts}
+
+	#stops claiming; fires still waiting out the handoff are left to the other instances
+	def stop(self):
+		with self.condition:
+			self.stopped = True
+			self.deferred = []
+			self.condition.notify()
+		if self.thread is not None:
+			self.thread.join()
+
+	def close(self):
+		self.stop()
+		with self.lock:
+			if self.closed:
+				return
+			self.conn.execute("DELETE FROM instances WHERE id = ?", (self.instance_id,))
+			self.closed = True
+			self.conn.close()
+
+#runs command jobs as asyncio subprocesses on one event loop thread, so a slow child
+#doesn't hold a scheduler thread for its whole run. As a named pool, max_concurrent
+#caps the children running at once and the rest wait their turn on the loop
+class AsyncRunner:
+	instances = []
+	kind = "async"
+
+	READ_SIZE = 65536
+	PIPE_GRACE = 5 #seconds output is still read for once the child has exited
+
+	def __init__(self, output_sink=None, name="async", max_concurrent=None):
+		self.instances.append(self)
+		self.output_sink = output_sink or self.write_output
+		self.name = name
+		self.max_concurrent = max_concurrent
+		self.slots = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+		self.loop = None
+		self.thread = None
+		self.lock = threading.Lock()
+		self.futures = set()
+		self.in_flight = 0
+		self.waiting = 0
+		self.usage = PoolUsage()
+
+	def start(self):
+		with self.lock:
+			if self.loop is not None:
+				return
+			self.loop = asyncio.new_event_loop()
+			self.thread = threading.Thread(target=self.run_loop, name="aces-async", daemon=True)
+			self.thread.start()
+
+	def run_loop(self):
+		asyncio.set_event_loop(self.loop)
+		#wait on children through pidfds instead of a thread per child where possible (3.9 - 3.11)
+		if sys.version_info < (3, 12) and hasattr(asyncio, "PidfdChildWatcher"):
+			try:
+				watcher = asyncio.PidfdChildWatcher()
+				watcher.attach_loop(self.loop)
+				asyncio.set_child_watcher(watcher)
+			except (OSError, NotImplementedError):
+				pass
+		self.loop.run_forever()
+
+	#control, if given, is the run's RunControl; the watchdog stops the child through it
+	def submit(self, script_object, control=None):
+		self.start()
+		future = asyncio.run_coroutine_threadsafe(self.run(script_object, control), self.loop)
+		with self.lock:
+			self.futures.add(future)
+		future.add_done_callback(self.futures.discard)
+		return future
+
+	async def run(self, script_object, control=None):
+		if self.slots is None:
+			return await self.run_child(script_object, control)
+		self.waiting += 1
+		self.note_usage()
+		try:
+			await self.slots.acquire()
+		finally:
+			self.waiting -= 1
+		try:
+			return await self.run_child(script_object, control)
+		finally:
+			self.slots.release()
+
+	async def run_child(self, script_object, control=None):
+		session = control is not None and control.timeout is not None
+		process = await asyncio.create_subprocess_exec(*script_object.argv(), executable=script_object.executable(),
+													   stdin=asyncio.subprocess.DEVNULL,
+													   stdout=asyncio.subprocess.PIPE,
+													   stderr=asyncio.subprocess.PIPE, start_new_session=session)
+		if control is not None:
+			control.attach(process)
+		self.in_flight += 1
+		self.note_usage()
+		try:
+			readers = asyncio.gather(self.pump(script_object, "stdout", process.stdout),
+									 self.pump(script_object, "stderr", process.stderr))
+			await process.wait()
+
+			#grandchildren may keep the pipes open after the child has exited
+			try:
+				await asyncio.wait_for(readers, self.PIPE_GRACE)
+			except asyncio.TimeoutError:
+				pass
+		finally:
+			self.in_flight -= 1
+			self.note_usage()
+
+		script_object.last_exit_code = process.returncode
+		return process.returncode
+
+	#without a cap there is no pool size to measure busy time against, only the children running
+	def note_usage(self):
+		self.usage.set(size=self.max_concurrent or 0, busy=self.in_flight, queued=self.waiting)
+
+	def stats(self):
+		return {**self.usage.stats(), "kind": self.kind, "min": 0, "max": self.max_concurrent}
+
+	async def pump(self, script_object, stream_name, stream):
+		while True:
+			data = await stream.read(self.READ_SIZE)
+			if not data:
+				break
+			self.output_sink(script_object, stream_name, data)
+
+	#default sink: passes output through to our own console like an inherited one would
+	def write_output(self, script_object, stream_name, data):
+		stream = sys.stdout if stream_name == "stdout" else sys.stderr
+		stream.write(data.decode(errors="replace"))
+		stream.flush()
+
+	def close(self, wait=True):
+		with self.lock:
+			loop, futures = self.loop, list(self.futures)
+			self.loop = None
+		if loop is None:
+			return
+		if wait:
+			concurrent.futures.wait(futures)
+		loop.call_soon_threadsafe(loop.stop)
+		self.thread.join()
+		loop.close()
+
+#caps concurrent runs per job, per group and overall. Fires over a limit are queued,
+#coalesced into one pending run per job, or dropped, following the job's overflow option
+class AdmissionController:
+	OVERFLOW_POLICIES = ("queue", "coalesce", "drop")
+
+	def __init__(self, max_concurrent=None, group_limits=None, max_queue=10000):
+		self.max_concurrent = max_concurrent
+		self.group_limits = dict(group_limits or {})
+		self.max_queue = max_queue
+		self.lock = threading.Lock()
+
+		self.running = 0
+		self.running_by_job = {}
+		self.running_by_group = {}
+		self.queue = deque() #(script_object, time queued)
+		self.queued_by_job = {}
+
+		self.admitted = 0
+		self.dropped = 0
+		self.coalesced = 0
+		self.dropped_by_job = {}
+		self.total_wait = 0.0
+		self.max_wait = 0.0
+		self.dequeued = 0
+
+	def set_group_limit(self, group, limit):
+		with self.lock:
+			if limit is None:
+				self.group_limits.pop(group, None)
+			else:
+				self.group_limits[group] = limit
+
+	def can_run(self, script_object):
+		if self.max_concurrent is not None and self.running >= self.max_concurrent:
+			return False
+		if self.running_by_job.get(script_object.id, 0) >= script_object.max_instances:
+			return False
+		limit = self.group_limits.get(script_object.group)
+		return limit is None or self.running_by_group.get(script_object.group, 0) < limit
+
+	def take_slot(self, script_object):
+		self.running += 1
+		self.running_by_job[script_object.id] = self.running_by_job.get(script_object.id, 0) + 1
+		if script_object.group is not None:
+			self.running_by_group[script_object.group] = self.running_by_group.get(script_object.group, 0) + 1
+		self.admitted += 1
+
+	#True if the script may start now, otherwise the fire has been queued (with payload) or dropped
+	def acquire(self, script_object, payload=None):
+		with self.lock:
+			if self.can_run(script_object):
+				self.take_slot(script_object)
+				return True
+
+			queued = self.queued_by_job.get(script_object.id, 0)
+			if script_object.overflow == "coalesce" and queued:
+				self.coalesced += 1
+			elif script_object.overflow == "drop" or len(self.queue) >= self.max_queue:
+				self.dropped += 1
+				self.dropped_by_job[script_object.id] = self.dropped_by_job.get(script_object.id, 0) + 1
+			else:
+				self.queue.append((script_object, payload, time.monotonic()))
+				self.queued_by_job[script_object.id] = queued + 1
+			return False
+
+	#frees the script's slot and returns (script, payload) for queued fires that may start now,
+	#their slots already taken
+	def release(self, script_object):
+		with self.lock:
+			self.running -= 1
+			self.decrement(self.running_by_job, script_object.id)
+			if script_object.group is not None:
+				self.decrement(self.running_by_group, script_object.group)
+
+			ready = []
+			now = time.monotonic()
+			for item in list(self.queue):
+				if self.max_concurrent is not None and self.running >= self.max_concurrent:
+					break
+				queued_script, payload, queued_at = item
+				if self.can_run(queued_script):
+					self.queue.remove(item)
+					self.decrement(self.queued_by_job, queued_script.id)
+					self.take_slot(queued_script)
+					self.record_wait(now - queued_at)
+					ready.append((queued_script, payload))
+			return ready
+
+	#drops queued fires of removed jobs
+	def discard(self, job_ids):
+		job_ids = set(job_ids)
+		with self.lock:
+			if any(job_id in self.queued_by_job for job_id in job_ids):
+				self.queue = deque(item for item in self.queue if item[0].id not in job_ids)
+				for job_id in job_ids:
+					self.queued_by_job.pop(job_id, None)
+
+	def decrement(self, counts, key):
+		counts[key] -= 1
+		if counts[key] <= 0:
+			del counts[key]
+
+	def record_wait(self, wait):
+		self.dequeued += 1
+		self.total_wait += wait
+		self.max_wait = max(self.max_wait, wait)
+
+	def stats(self):
+		with self.lock:
+			return {"running": self.running, "queued": len(self.queue), "admitted": self.admitted,
+					"dropped": self.dropped, "coalesced": self.coalesced,
+					"avg_wait": self.total_wait / self.dequeued if self.dequeued else 0.0,
+					"max_wait": self.max_wait, "running_by_group": dict(self.running_by_group),
+					"dropped_by_job": dict(self.dropped_by_job)}
+
+#global launch-rate limit. Launches are spaced 1/rate seconds apart, those over the rate are
+#held on a timer thread until their slot comes. Launches are also counted per second, against the
+#second they were planned for before any jitter or waiting, so the report shows how far the peaks
+#were flattened
+class LaunchSmoother:
+	HISTORY = 300 #seconds of per-second counts kept for the report
+
+	def __init__(self, rate=None):
+		if rate is not None and rate <= 0:
+			raise ScriptError("The launch rate must be above 0")
+		self.rate = rate
+		self.lock = threading.Lock()
+		self.next_slot = 0.0
+		self.planned = {} #second -> launches planned for it
+		self.launched = {} #second -> launches that happened in it
+
+		self.condition = threading.Condition()
+		self.deferred = [] #heap of (due, sequence, callback, args)
+		self.sequence = itertools.count()
+		self.thread = None
+		self.stopped = False
+
+		self.delayed = 0
+		self.total_delay = 0.0
+		self.max_delay = 0.0
+
+	#takes the next launch slot, returning the seconds until it comes
+	def reserve(self):
+		if self.rate is None:
+			return 0.0
+		with self.lock:
+			now = time.monotonic()
+			slot = max(now, self.next_slot)
+			self.next_slot = slot + 1 / self.rate
+			delay = slot - now
+			if delay > 0:
+				self.delayed += 1
+				self.total_delay += delay
+				self.max_delay = max(self.max_delay, delay)
+			return delay
+
+	#calls callback(*args) from the timer thread after delay seconds
+	def defer(self, delay, callback, *args):
+		with self.condition:
+			if self.stopped:
+				return
+			heapq.heappush(self.deferred, (time.monotonic() + delay, next(self.sequence), callback, args))
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="aces-launch", daemon=True)
+				self.thread.start()
+			self.condition.notify()
+
+	def run(self):
+		while True:
+			with self.condition:
+				while not self.stopped and (not self.deferred or self.deferred[0][0] > time.monotonic()):
+					self.condition.wait(self.deferred[0][0] - time.monotonic() if self.deferred else None)
+				if self.stopped:
+					return
+				due, sequence, callback, args = heapq.heappop(self.deferred)
+			try:
+				callback(*args)
+			except Exception:
+				traceback.print_exc()
+
+	def stop(self):
+		with self.condition:
+			self.stopped = True
+			self.deferred.clear()
+			self.condition.notify()
+		if self.thread:
+			self.thread.join()
+
+	#planned: epoch seconds the launch was due at without smoothing
+	def record(self, planned):
+		now = time.time()
+		with self.lock:
+			self.count(self.planned, int(planned), now)
+			self.count(self.launched, int(now), now)
+
+	def count(self, counts, second, now):
+		counts[second] = counts.get(second, 0) + 1
+		if len(counts) > 2 * self.HISTORY:
+			self.prune(counts, now)
+
+	def prune(self, counts, now):
+		for second in [second for second in counts if second < now - self.HISTORY]:
+			del counts[second]
+
+	def stats(self):
+		now = time.time()
+		with self.lock:
+			self.prune(self.planned, now)
+			self.prune(self.launched, now)
+			peak_planned = max(self.planned.values(), default=0)
+			peak_launched = max(self.launched.values(), default=0)
+			return {"rate": self.rate, "peak_planned": peak_planned, "peak_launched": peak_launched,
+					"flattened": 1 - peak_launched / peak_planned if peak_planned else 0.0,
+					"delayed": self.delayed, "avg_delay": self.total_delay / self.delayed if self.delayed else 0.0,
+					"max_delay": self.max_delay}
+
+class Histogram:
+	BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
 
 	def __init__(self):
+		self.counts = [0] * len(self.BUCKETS)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+		self.sum += value
+		self.count += 1
+
+	#upper bound of the bucket holding the given quantile
+	def quantile(self, q):
+		target = q * self.count
+		seen = 0
+		for bound, count in zip(self.BUCKETS, self.counts):
+			seen += count
+			if count and seen >= target:
+				return bound
+		return 0.0
+
+#per-job run statistics kept in memory: schedule lag and duration histograms,
+#exit statuses and how often a run started while the previous one was still going
+class JobMetrics:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.jobs = {}
+
+	def job(self, job_id):
+		metrics = self.jobs.get(job_id)
+		if metrics is None:
+			metrics = self.jobs[job_id] = {"lag": Histogram(), "duration": Histogram(), "statuses": {},
+										   "overlaps": 0, "running": 0, "last_duration": None, "last_status": None}
+		return metrics
+
+	def start(self, job_id, scheduled=None):
+		with self.lock:
+			metrics = self.job(job_id)
+			if metrics["running"]:
+				metrics["overlaps"] += 1
+			metrics["running"] += 1
+			if scheduled is not None:
+				metrics["lag"].observe(max(0.0, (datetime.now(scheduled.tzinfo) - scheduled).total_seconds()))
+		return time.perf_counter()
+
+	def finish(self, job_id, started, status):
+		duration = time.perf_counter() - started
+		with self.lock:
+			metrics = self.job(job_id)
+			metrics["running"] -= 1
+			metrics["duration"].observe(duration)
+			metrics["statuses"][status] = metrics["statuses"].get(status, 0) + 1
+			metrics["last_duration"] = duration
+			metrics["last_status"] = status
+
+	#(running, last duration, last status) for one job, None before its first run
+	def summary(self, job_id):
+		with self.lock:
+			metrics = self.jobs.get(job_id)
+			if metrics is None:
+				return None
+			return metrics["running"], metrics["last_duration"], metrics["last_status"]
+
+	def discard(self, job_ids):
+		with self.lock:
+			for job_id in job_ids:
+				self.jobs.pop(job_id, None)
+
+	#prometheus text exposition format
+	def render(self, names, admission, launches, watchdog, pools):
+		lines = []
+		with self.lock:
+			for metric, key, help_text in (("aces_job_lag_seconds", "lag", "Delay between scheduled and actual start"),
+										   ("aces_job_duration_seconds", "duration", "Run time of finished runs")):
+				lines.append(f"# HELP {metric} {help_text}")
+				lines.append(f"# TYPE {metric} histogram")
+				for job_id, metrics in self.jobs.items():
+					labels = self.labels(job_id, names)
+					histogram = metrics[key]
+					cumulative = 0
+					for bound, count in zip(histogram.BUCKETS, histogram.counts):
+						cumulative += count
+						le = "+Inf" if bound == float("inf") else repr(bound)
+						lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+					lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+					lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+			lines.append("# HELP aces_job_runs_total Finished runs by exit status")
+			lines.append("# TYPE aces_job_runs_total counter")
+			for job_id, metrics in self.jobs.items():
+				labels = self.labels(job_id, names)
+				for status, count in metrics["statuses"].items():
+					lines.append(f'aces_job_runs_total{{{labels},status="{status}"}} {count}')
+
+			lines.append("# HELP aces_job_overlaps_total Runs started while another run of the job was going")
+			lines.append("# TYPE aces_job_overlaps_total counter")
+			for job_id, metrics in self.jobs.items():
+				lines.append(f"aces_job_overlaps_total{{{self.labels(job_id, names)}}} {metrics['overlaps']}")
+
+		for metric, key, kind in (("aces_running", "running", "gauge"), ("aces_queued", "queued", "gauge"),
+								  ("aces_admitted_total", "admitted", "counter"),
+								  ("aces_dropped_total", "dropped", "counter"),
+								  ("aces_coalesced_total", "coalesced", "counter"),
+								  ("aces_queue_wait_max_seconds", "max_wait", "gauge")):
+			lines.append(f"# TYPE {metric} {kind}")
+			lines.append(f"{metric} {admission[key]}")
+		for metric, key, kind in (("aces_launch_peak_planned", "peak_planned", "gauge"),
+								  ("aces_launch_peak_actual", "peak_launched", "gauge"),
+								  ("aces_launches_delayed_total", "delayed", "counter"),
+								  ("aces_launch_delay_max_seconds", "max_delay", "gauge")):
+			lines.append(f"# TYPE {metric} {kind}")
+			lines.append(f"{metric} {launches[key]}")
+		for metric, key, kind in (("aces_runs_timed_out_total", "timed_out", "counter"),
+								  ("aces_runs_cancelled_total", "cancelled", "counter"),
+								  ("aces_runs_killed_total", "killed", "counter"),
+								  ("aces_slots_reclaimed_total", "reclaimed", "counter"),
+								  ("aces_runs_stuck", "stuck", "gauge")):
+			lines.append(f"# TYPE {metric} {kind}")
+			lines.append(f"{metric} {watchdog[key]}")
+		for metric, key, kind in (("aces_pool_workers", "size", "gauge"), ("aces_pool_busy", "busy", "gauge"),
+								  ("aces_pool_queued", "queued", "gauge"),
+								  ("aces_pool_busy_seconds_total", "busy_seconds", "counter"),
+								  ("aces_pool_worker_seconds_total", "worker_seconds", "counter")):
+			lines.append(f"# TYPE {metric} {kind}")
+			for name, stats in pools.items():
+				lines.append(f'{metric}{{pool="{name}",kind="{stats["kind"]}"}} {stats[key]}')
+		return "\n".join(lines) + "\n"
+
+	def labels(self, job_id, names):
+		name = names.get(job_id, "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+		return f'job="{job_id}",name="{name}"'
+
+#the scheduler's thread pool, noting each job's scheduled run time just before it is handed over
+#runs the scheduler's fires on a thread pool like its own ThreadPoolExecutor, but calls each job
+#as func(*args, scheduled_time), so every run knows the time it was scheduled for and fires that
+#are missed or dropped leave nothing behind
+class MeteredExecutor(BaseExecutor):
+	JOBSTORE = "default" #the handler keeps all its jobs in the scheduler's default store
+
+	def __init__(self, handler, max_workers=10):
+		super().__init__()
+		self.handler = handler
+		self.pool = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="aces-fire")
+
+	def _do_submit_job(self, job, run_times):
+		future = self.pool.submit(self.run_fires, job, run_times)
+		future.add_done_callback(lambda f: self.fires_done(job, f))
+
+	#as the scheduler's own run_job, with the scheduled time passed on
+	def run_fires(self, job, run_times):
+		events = []
+		for run_time in run_times:
+			if job.misfire_grace_time is not None:
+				late = datetime.now(run_time.tzinfo) - run_time
+				if late > timedelta(seconds=job.misfire_grace_time):
+					events.append(JobExecutionEvent(EVENT_JOB_MISSED, job.id, self.JOBSTORE, run_time))
+					self._logger.warning('Run time of job "%s" was missed by %s', job, late)
+					continue
+			try:
+				result = job.func(*job.args, run_time, **job.kwargs)
+			except BaseException as e:
+				events.append(JobExecutionEvent(EVENT_JOB_ERROR, job.id, self.JOBSTORE, run_time, exception=e,
+												traceback=traceback.format_exc()))
+				self._logger.exception('Job "%s" raised an exception', job)
+			else:
+				events.append(JobExecutionEvent(EVENT_JOB_EXECUTED, job.id, self.JOBSTORE, run_time, retval=result))
+		return events
+
+	def fires_done(self, job, future):
+		if future.cancelled(): #dropped at shutdown
+			return
+		error = future.exception()
+		if error:
+			self._run_job_error(job.id, error, error.__traceback__)
+		else:
+			self._run_job_success(job.id, future.result())
+
+	#fires not started yet are dropped, so the handler's shutdown grace only covers runs under way
+	def shutdown(self, wait=True):
+		self.pool.shutdown(wait, cancel_futures=True)
+
+#serves Handler metrics at http://host:port/metrics
+class MetricsServer:
+	instances = []
+
+	def __init__(self, handler, port, host="127.0.0.1"):
+		self.instances.append(self)
+		aces_handler = handler
+
+		class RequestHandler(http.server.BaseHTTPRequestHandler):
+			def do_GET(self):
+				if self.path.split("?")[0] not in ("/", "/metrics"):
+					self.send_error(404)
+					return
+				body = aces_handler.render_metrics().encode()
+				self.send_response(200)
+				self.send_header("Content-Type", "text/plain; version=0.0.4")
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, *args):
+				pass
+
+		self.server = http.server.ThreadingHTTPServer((host, port), RequestHandler)
+		self.thread = threading.Thread(target=self.server.serve_forever, name="aces-metrics", daemon=True)
+		self.thread.start()
+
+	def close(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	daemon_threads = True
+
+#local control API for tooling, over HTTP on localhost:port or on a Unix socket at path.
+#  GET /jobs[?offset=&limit=&trigger=&path=&cmd=]  jobs as JSON Lines, a page at a time, next page in the Link header
+#  GET /jobs/<id>, DELETE /jobs/<id>, POST /jobs/<id>/{pause,resume,run}
+#  POST /jobs  adds the jobs in the body: one definition, a JSON list of them or JSON Lines
+#  POST /jobs/{pause,resume,run,remove}  {"ids": [...]} for many jobs in one request
+#Definitions are those of `aces import`. Pages and results are written as they are produced,
+#so memory stays bounded by the page size whatever the number of jobs.
+#Requests from browsers (an Origin header, or a POST that isn't JSON) are refused. On the port,
+#requests must also name localhost in Host and send the token from token_path in X-ACES-Token;
+#the socket is only accessible to its owner
+class ControlServer:
+	instances = []
+
+	PAGE_SIZE = 1000
+	MAX_PAGE_SIZE = 10000
+	CHUNK_SIZE = 256 #jobs per chunk of a streamed response
+	BATCH_SIZE = 1000 #jobs added per scheduler wakeup
+	MAX_BODY = 64 * 1024 * 1024
+	CONTENT_TYPES = ("application/json", "application/x-ndjson")
+	TOKEN_HEADER = "X-ACES-Token"
+
+	def __init__(self, handler, port=None, path=None, host="127.0.0.1", token_path=None):
 		self.instances.append(self)
-		self.scripts = []
+		self.handler = handler
+		self.path = path
+		self.port = port
+		self.token_path = token_path
+		self.token = None
+		if path is None:
+			if token_path is None:
+				raise ScriptError("The control port needs a token file")
+			self.token = secrets.token_urlsafe(32)
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(token_path) #so the new file is created with our mode, whoever owned the old one
+			fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+			with os.fdopen(fd, "w") as token_file:
+				token_file.write(self.token + "\n")
+		self.actions = {"pause": handler.pause_many, "resume": handler.resume_many, "run": handler.run_now,
+						"remove": handler.remove_many}
+		control = self
+
+		class RequestHandler(http.server.BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1" #keep-alive and chunked responses
+
+			def do_GET(self):
+				control.serve(self, "GET")
+
+			def do_POST(self):
+				control.serve(self, "POST")
+
+			def do_DELETE(self):
+				control.serve(self, "DELETE")
+
+			def log_message(self, *args):
+				pass
+
+		if path is not None:
+			if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode): #left by a daemon that died
+				os.remove(path)
+			self.server = UnixHTTPServer(path, RequestHandler)
+			os.chmod(path, 0o600)
+		else:
+			self.server = http.server.ThreadingHTTPServer((host, port), RequestHandler)
+		self.thread = threading.Thread(target=self.server.serve_forever, name="aces-control", daemon=True)
+		self.thread.start()
+
+	#why a request is refused, if it is: (status, reason)
+	def refusal(self, request, method):
+		if request.headers.get("Origin") is not None:
+			return 403, "Cross-origin requests are refused"
+		if self.path is None:
+			host = (request.headers.get("Host") or "").lower()
+			if host not in {f"{name}:{self.port}" for name in ("127.0.0.1", "localhost", "[::1]")}:
+				return 403, "Host must be localhost"
+			if not hmac.compare_digest((request.headers.get(self.TOKEN_HEADER) or "").encode(), self.token.encode()):
+				return 401, f"{self.TOKEN_HEADER} is missing or wrong"
+		content_type = (request.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+		if method == "POST" and content_type not in self.CONTENT_TYPES:
+			return 415, "Content-Type must be application/json"
+		return None
+
+	def serve(self, request, method):
+		url = urllib.parse.urlsplit(request.path)
+		parts = [urllib.parse.unquote(part) for part in url.path.split("/") if part]
+		query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+		refused = self.refusal(request, method)
+		if refused:
+			request.close_connection = True #the body, if any, is left unread
+			self.send_json(request, refused[0], {"error": refused[1]})
+			return
+		try:
+			if not parts or parts[0] != "jobs" or len(parts) > 3:
+				self.send_json(request, 404, {"error": "Not found"})
+			elif len(parts) == 1 and method == "GET":
+				self.list_jobs(request, query)
+			elif len(parts) == 1 and method == "POST":
+				self.add_jobs(request)
+			elif len(parts) == 2 and method == "POST" and parts[1] in self.actions:
+				ids = self.read_json(request).get("ids")
+				if not isinstance(ids, list):
+					raise ScriptError("Expected {\"ids\": [...]}")
+				self.act(request, parts[1], ids)
+			elif len(parts) == 1 or parts[1] in self.actions:
+				self.send_json(request, 405, {"error": f"{method} not supported on {url.path}"})
+			elif parts[1] not in self.handler.registry:
+				self.send_json(request, 404, {"error": f"No job {parts[1]}"})
+			elif len(parts) == 2 and method == "GET":
+				self.send_json(request, 200, self.describe(self.handler.get_script(parts[1])))
+			elif len(parts) == 2 and method == "DELETE":
+				self.act(request, "remove", [parts[1]])
+			elif len(parts) == 3 and method == "POST" and parts[2] in self.actions and parts[2] != "remove":
+				self.act(request, parts[2], [parts[1]])
+			else:
+				self.send_json(request, 405, {"error": f"{method} not supported on {url.path}"})
+		except ScriptError as e:
+			self.send_json(request, 400, {"error": str(e)})
+		except (BrokenPipeError, ConnectionResetError): #client went away mid-stream
+			pass
+
+	def describe(self, script_object):
+		row = self.handler.script_to_row(script_object)
+		return {"id": row[0], **row_to_definition(row), "next_run_time": row[7]}
+
+	#a page of the registry's jobs in insertion order, taken in one go so adds and removes
+	#from other threads can't break the iteration
+	def list_jobs(self, request, query):
+		try:
+			offset = max(0, int(query.get("offset", 0)))
+			limit = min(max(1, int(query.get("limit", self.PAGE_SIZE))), self.MAX_PAGE_SIZE)
+		except ValueError:
+			raise ScriptError("offset and limit must be whole numbers")
+		registry = self.handler.registry
+		if {"trigger", "path", "cmd"} & set(query):
+			jobs = registry.find(query.get("path"), query.get("cmd"), query.get("trigger"))
+		else:
+			jobs = registry.jobs.values()
+		total = len(jobs)
+		page = list(itertools.islice(jobs, offset, offset + limit))
+
+		headers = {"X-Total-Count": str(total)}
+		if offset + limit < total:
+			query = {**query, "offset": offset + limit, "limit": limit}
+			headers["Link"] = f'</jobs?{urllib.parse.urlencode(query)}>; rel="next"'
+		self.start_stream(request, headers)
+		for start in range(0, len(page), self.CHUNK_SIZE):
+			lines = [json.dumps(self.describe(script_object)) for script_object in page[start:start + self.CHUNK_SIZE]]
+			self.write_chunk(request, "\n".join(lines) + "\n")
+		self.end_stream(request)
+
+	#one result line per definition in the body, in order: {"id": ...} or {"error": ..., "at": ...}
+	def add_jobs(self, request):
+		text = self.read_body(request).decode(errors="replace")
+		try:
+			data = json.loads(text)
+		except ValueError:
+			definitions = read_jsonl(io.StringIO(text))
+		else:
+			if isinstance(data, dict):
+				data = [data]
+			if not isinstance(data, list):
+				raise ScriptError("Expected a job definition or a list of them")
+			definitions = ((f"item {number}", definition) for number, definition in enumerate(data, 1))
+
+		self.start_stream(request)
+		batch = []
+		for where, definition in definitions:
+			try:
+				batch.append((where, definition_to_job(definition)))
+			except Exception as e: #the stream has started, so every failure has to become a result line
+				batch.append((where, e))
+			if len(batch) >= self.BATCH_SIZE:
+				self.write_results(request, self.add_batch(batch))
+				batch = []
+		self.write_results(request, self.add_batch(batch))
+		self.end_stream(request)
+
+	def add_batch(self, batch):
+		results = []
+		while batch:
+			jobs = []
+			for where, job in batch:
+				if isinstance(job, Exception):
+					break
+				jobs.append(job)
+			try:
+				self.handler.add_many(jobs)
+			except Exception as e: #the ones before the failing job are in
+				added = 0
+				while added < len(jobs) and jobs[added][0].id in self.handler.registry:
+					added += 1
+				results.extend({"id": job[0].id} for job in jobs[:added])
+				results.append({"error": str(e), "at": batch[added][0]})
+				batch = batch[added + 1:]
+				continue
+			results.extend({"id": job[0].id} for job in jobs)
+			if len(jobs) < len(batch):
+				results.append({"error": str(batch[len(jobs)][1]), "at": batch[len(jobs)][0]})
+			batch = batch[len(jobs) + 1:]
+		return results
+
+	def write_results(self, request, results):
+		if results:
+			self.write_chunk(request, "".join(json.dumps(result) + "\n" for result in results))
+
+	#unknown IDs are reported back and the action applied to the rest
+	def act(self, request, action, ids):
+		registry = self.handler.registry
+		known = list(dict.fromkeys(job_id for job_id in ids if isinstance(job_id, str) and job_id in registry))
+		unknown = [job_id for job_id in ids if not (isinstance(job_id, str) and job_id in registry)]
+		try:
+			count = self.actions[action](known) if known else 0
+		except ScriptError as e: #removed meanwhile
+			raise ScriptError(f"Could not {action} jobs: {e}")
+		self.send_json(request, 200, {action: count, "unknown": unknown})
+
+	def read_body(self, request):
+		try:
+			length = int(request.headers.get("Content-Length", ""))
+		except ValueError:
+			raise ScriptError("Content-Length is required")
+		if length > self.MAX_BODY:
+			raise ScriptError(f"Request body over {self.MAX_BODY} bytes")
+		return request.rfile.read(length)
+
+	def read_json(self, request):
+		try:
+			data = json.loads(self.read_body(request) or b"{}")
+		except ValueError as e:
+			raise ScriptError(f"Invalid JSON: {e}")
+		if not isinstance(data, dict):
+			raise ScriptError("Expected a JSON object")
+		return data
+
+	def send_json(self, request, status, data):
+		body = (json.dumps(data) + "\n").encode()
+		request.send_response(status)
+		request.send_header("Content-Type", "application/json")
+		request.send_header("Content-Length", str(len(body)))
+		request.end_headers()
+		request.wfile.write(body)
+
+	def start_stream(self, request, headers=None):
+		request.send_response(200)
+		request.send_header("Content-Type", "application/x-ndjson")
+		request.send_header("Transfer-Encoding", "chunked")
+		for key, value in (headers or {}).items():
+			request.send_header(key, value)
+		request.end_headers()
+
+	def write_chunk(self, request, text):
+		data = text.encode()
+		request.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+	def end_stream(self, request):
+		request.wfile.write(b"0\r\n\r\n")
+
+	def close(self):
+		self.server.shutdown()
+		self.server.server_close()
+		if self.path is not None and os.path.exists(self.path):
+			os.remove(self.path)
+		if self.token_path is not None:
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(self.token_path)
+
+#jobs keyed by their stable ID, with secondary indexes by script path, command and trigger type.
+#Every index maps a key to an insertion-ordered {id: script} dict, so lookups and removals are O(1)
+class JobRegistry:
+	def __init__(self):
+		self.jobs = {}
+		self.by_path = {}
+		self.by_command = {}
+		self.by_trigger = {}
+
+	def index_keys(self, script_object):
+		if isinstance(script_object, ActionScript):
+			yield self.by_path, script_object.filepath
+		else:
+			yield self.by_command, script_object.content
+		yield self.by_trigger, script_object.trigger
+
+	def add(self, script_object):
+		if script_object.id in self.jobs:
+			raise ScriptError(f"Job ID {script_object.id} already registered")
+		self.jobs[script_object.id] = script_object
+		for index, key in self.index_keys(script_object):
+			index.setdefault(key, {})[script_object.id] = script_object
+
+	def remove(self, job_id):
+		script_object = self.jobs.pop(job_id, None)
+		if script_object is None:
+			raise ScriptError("Given script ID not stored by handler object")
+
+		for index, key in self.index_keys(script_object):
+			bucket = index[key]
+			del bucket[job_id]
+			if not bucket:
+				del index[key]
+		return script_object
 
-		self.scheduler = BackgroundScheduler(daemon = True)
+	def get(self, job_id):
+		return self.jobs.get(job_id)
+
+	def find(self, path=None, command=None, trigger=None):
+		buckets = []
+		if path is not None:
+			buckets.append(self.by_path.get(path, {}))
+		if command is not None:
+			buckets.append(self.by_command.get(command, {}))
+		if trigger is not None:
+			buckets.append(self.by_trigger.get(trigger, {}))
+		if not buckets:
+			return list(self.jobs.values())
+
+		buckets.sort(key=len)
+		return [script for job_id, script in buckets[0].items() if all(job_id in bucket for bucket in buckets[1:])]
+
+	def __contains__(self, job_id):
+		return job_id in self.jobs
+
+	def __iter__(self):
+		return iter(list(self.jobs.values()))
+
+	def __len__(self):
+		return len(self.jobs)
+
+class Handler:
+	instances = []
+
+	EXEC_MODES = ("thread", "process", "async")
+	#options accepted by the add_*_script methods next to the trigger arguments
+	JOB_OPTIONS = {"exec_mode": "thread", "timeout": None, "max_instances": 1, "group": None, "overflow": "drop",
+				   "jitter": None, "profile": None, "profile_memory": False, "pool": None, "paused": False}
+	#pool name -> (kind, min workers, max workers); each execution mode runs in the pool of its name by default.
+	#None is the process count for process pools and no cap for async ones
+	DEFAULT_POOLS = {"thread": ("thread", 1, 10), "process": ("process", 1, None), "async": ("async", 0, None)}
+
+	#what to do with runs missed while ACES was down:
+	#skip = resume from now, once = run once on start-up, all = replay up to catchup_limit runs
+	MISFIRE_POLICIES = ("skip", "once", "all")
+	TRIGGERS = {"date": DateTrigger, "interval": IntervalTrigger}
+	EVENT_TRIGGERS = {"after": DependencyTrigger, "watch": WatchTrigger} #run by the handler, not on a schedule
+
+	@classmethod
+	def make_trigger(cls, trigger, trigger_args, timezone=None, offset=0):
+		if trigger == "cron":
+			trigger_object = cron_trigger(trigger_args, timezone)
+		elif trigger == "after":
+			return DependencyTrigger(trigger_args.get("upstream"))
+		elif trigger == "watch":
+			return WatchTrigger(**trigger_args)
+		else:
+			trigger_object = cls.TRIGGERS[trigger](timezone=timezone, **trigger_args)
+		return OffsetTrigger(trigger_object, offset) if offset else trigger_object
+
+	def __init__(self, process_workers=None, store_path=None, misfire_policy="skip", catchup_limit=100, restore=True,
+				 max_concurrent=None, group_limits=None, max_queue=10000, output_dir=None, output_size=65536,
+				 output_rotate_bytes=None, coordinate=False, instance_id=None, spread_window=None, launch_rate=None,
+				 watch_poll_interval=1.0, history_retention_days=30, profile_dir=None, default_timeout=None,
+				 kill_grace=5, shutdown_grace=30, pools=None):
+		self.instances.append(self)
+		self.registry = JobRegistry()
+		self.registry_listeners = [] #called with ("add" | "remove", job IDs) after changes
+		self.run_listeners = [] #called with a job ID whenever one of its runs starts or finishes
+		self.batch_lock = threading.RLock()
+
+		#overlapping fires are governed by the admission controller rather than the scheduler
+		self.scheduler = BackgroundScheduler(daemon = True, job_defaults={"max_instances": sys.maxsize},
+											 executors={"default": MeteredExecutor(self)})
+		self.metrics = JobMetrics()
+		#job output is kept next to the job store unless a directory is given, in memory without either
+		if output_dir is None and store_path:
+			output_dir = output_path(store_path)
+		self.output = OutputStore(output_dir, output_size, output_rotate_bytes)
+		#jobs pick a pool by name with the pool option, pools given here add to or replace the defaults
+		pool_specs = dict(self.DEFAULT_POOLS)
+		if process_workers:
+			pool_specs["process"] = ("process", 1, process_workers)
+		pool_specs.update(pools or {})
+		self.pools = {name: self.make_pool(name, *spec) for name, spec in pool_specs.items()}
+		self.process_pool = self.pools["process"]
+		self.async_runner = self.pools["async"]
+		if profile_dir is None:
+			profile_dir = profile_path(store_path) if store_path else os.path.join(tempfile.gettempdir(), "aces-profiles")
+		self.profiler = JobProfiler(profile_dir)
+		self.admission = AdmissionController(max_concurrent, group_limits, max_queue)
+		#spreading: jobs without their own jitter option get one of spread_window seconds
+		self.spread_window = spread_window
+		self.smoother = LaunchSmoother(launch_rate)
+		self.dispatch_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="aces-dispatch")
+		#runs are stopped after their timeout option, or default_timeout without one
+		self.default_timeout = default_timeout
+		self.watchdog = Watchdog(kill_grace)
+		self.shutdown_grace = shutdown_grace #seconds close() lets running jobs finish before stopping them
+		self.controls = {} #RunControl of every run under way -> None
+		self.controls_changed = threading.Condition()
+		self.downstream = {} #upstream job ID -> {dependent job ID: None}, in the order they were added
+		self.upstream_done = {} #dependent job ID -> upstream job IDs that succeeded since it last ran
+		self.dependency_lock = threading.Lock()
+		self.watcher = FileWatcher(self.on_watched_change, watch_poll_interval)
+		self.input_hashes = {} #watch job ID -> digest of its input at its last successful run
+		self.pending_hashes = {} #watch job ID -> digest of its input for the run under way
+		self.watch_lock = threading.Lock()
+		self.watch_skipped = 0
+
+		if misfire_policy not in self.MISFIRE_POLICIES:
+			raise ScriptError(f"Unknown misfire policy: {misfire_policy}")
+		self.misfire_policy = misfire_policy
+		self.catchup_limit = catchup_limit
+
+		self.coordinator = None
+		if coordinate:
+			if not store_path:
+				raise ScriptError("Coordinating with other instances needs a shared job store")
+			self.coordinator = LeaseCoordinator(self, lease_path(store_path), instance_id)
+
+		#every finished run is recorded next to the job store. Handlers that only edit the store
+		#(restore=False, as the CLI's) run nothing, so they leave the history alone
+		self.history = None
+		if store_path and restore:
+			self.history = RunHistory(history_path(store_path), history_retention_days, shared=coordinate)
+
+		self.store = None
+		if store_path:
+			self.store = JobStore(store_path)
+			self.scheduler.add_listener(self.on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_REMOVED)
+			if restore:
+				self.restore_jobs()
+			self.store.changed()
 
 	def mainloop(self):
 		self.scheduler.start()
+		for pool in {id(pool): pool for pool in map(self.pool_for, self.registry.jobs.values())}.values():
+			pool.start()
+		if self.coordinator:
+			self.coordinator.start()
+
+	@property
+	def scripts(self):
+		return list(self.registry)
+
+	def add_registry_listener(self, callback):
+		self.registry_listeners.append(callback)
+
+	def notify_registry(self, change, job_ids):
+		if job_ids:
+			for callback in self.registry_listeners:
+				callback(change, job_ids)
+
+	def add_run_listener(self, callback):
+		self.run_listeners.append(callback)
+
+	def notify_run(self, job_id):
+		for callback in self.run_listeners:
+			callback(job_id)
+
+	#holds scheduler wakeups back so a batch of adds/removes is processed in one pass
+	@contextlib.contextmanager
+	def batch(self):
+		with self.batch_lock:
+			paused = self.scheduler.state == STATE_RUNNING
+			if paused:
+				self.scheduler.pause()
+			try:
+				yield
+			finally:
+				if paused:
+					self.scheduler.resume()
+
+	def make_pool(self, name, kind, min_workers, max_workers):
+		if kind not in self.EXEC_MODES:
+			raise ScriptError(f"Unknown pool kind for {name}: {kind}")
+		if self.DEFAULT_POOLS.get(name, (kind,))[0] != kind:
+			raise ScriptError(f"Pool {name} must be a {name} pool")
+		if min_workers < 0 or (max_workers is not None and (max_workers < 1 or min_workers > max_workers)):
+			raise ScriptError(f"Pool {name} needs 0 <= min <= max and max of at least 1")
+		if kind == "thread":
+			return ThreadWorkerPool(name, min_workers, max_workers or self.DEFAULT_POOLS["thread"][2])
+		if kind == "process":
+			return ProcessPool(max_workers, name=name, min_workers=max(min_workers, 1))
+		return AsyncRunner(self.write_output, name, max_concurrent=max_workers)
+
+	#the job's own pool where this handler has one of its kind, otherwise the default for its mode
+	def pool_for(self, script_object):
+		pool = self.pools.get(script_object.pool)
+		if pool is None or pool.kind != script_object.exec_mode:
+			return self.pools[script_object.exec_mode]
+		return pool
+
+	def pop_options(self, kwargs):
+		return {key: kwargs.pop(key) for key in self.JOB_OPTIONS if key in kwargs}
+
+	#the job options for script_object with defaults filled in, checking the type and range of each,
+	#so values read from files fail here rather than deep in the scheduler
+	@classmethod
+	def check_options(cls, script_object, options):
+		for key in options:
+			if key not in cls.JOB_OPTIONS:
+				raise ScriptError(f"Unknown job option: {key}")
+		options = {key: options.get(key, default) for key, default in cls.JOB_OPTIONS.items()}
+
+		def is_number(value):
+			return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+		if not isinstance(options["exec_mode"], str) or options["exec_mode"] not in cls.EXEC_MODES:
+			raise ScriptError(f"Unknown execution mode: {options['exec_mode']}")
+		if not isinstance(options["overflow"], str) or options["overflow"] not in AdmissionController.OVERFLOW_POLICIES:
+			raise ScriptError(f"Unknown overflow policy: {options['overflow']}")
+		if not (isinstance(options["max_instances"], int) and not isinstance(options["max_instances"], bool) and
+				options["max_instances"] >= 1):
+			raise ScriptError("max_instances must be a whole number, 1 or more")
+		for key in ("paused", "profile_memory"):
+			if not isinstance(options[key], bool):
+				raise ScriptError(f"{key} must be true or false")
+		for key in ("group", "pool"):
+			if options[key] is not None and not isinstance(options[key], str):
+				raise ScriptError(f"{key} must be a name")
+		if options["timeout"] is not None and not (is_number(options["timeout"]) and options["timeout"] > 0):
+			raise ScriptError("timeout must be more than 0 seconds")
+		if options["jitter"] is not None and not (is_number(options["jitter"]) and options["jitter"] >= 0):
+			raise ScriptError("jitter must be 0 or more seconds")
+		if options["profile"] is not None:
+			if not isinstance(script_object, ActionScript):
+				raise ScriptError("Only file scripts can be profiled")
+			if not (isinstance(options["profile"], int) and not isinstance(options["profile"], bool) and
+					options["profile"] >= 1):
+				raise ScriptError("profile must be a whole number of runs, 1 or more")
+		if options["exec_mode"] == "process" and not isinstance(script_object, ActionScript):
+			raise ScriptError("Only file scripts can run in the process pool")
+		if options["exec_mode"] == "async" and isinstance(script_object, ActionScript):
+			raise ScriptError("Only command scripts can run on the async runner")
+		return options
+
+	def apply_options(self, script_object, options):
+		for key, value in self.check_options(script_object, options).items():
+			setattr(script_object, key, value)
+
+		#pools are configured per daemon, so a name this handler lacks is left for the one that has it
+		pool = self.pools.get(script_object.pool)
+		if pool is not None and pool.kind != script_object.exec_mode:
+			raise ScriptError(f"Pool {script_object.pool} is a {pool.kind} pool, not {script_object.exec_mode}")
+		if self.scheduler.running: #the CLI only writes jobs to the store, so it has no use for workers
+			self.pool_for(script_object).start()
+
+	#the callable every job is scheduled with; scheduled is None for runs outside the scheduler
+	def run_script(self, script_object, scheduled=None):
+		if script_object.paused: #event-triggered jobs have no schedule to hold back
+			return
+		if self.coordinator and not self.coordinator.claim(script_object, scheduled):
+			return #another instance runs this fire
+		self.run_claimed(script_object, scheduled)
+
+	def run_claimed(self, script_object, scheduled):
+		if self.admission.acquire(script_object, scheduled):
+			self.launch(script_object, scheduled)
+		elif self.coordinator: #queued here, or dropped by the job's overflow policy
+			self.coordinator.complete(script_object.id, scheduled)
+
+	#runs a fire this instance claimed away from the scheduler's own thread
+	def dispatch_claimed(self, script_object, scheduled):
+		try:
+			dispatch_future = self.dispatch_pool.submit(self.run_claimed, script_object, scheduled)
+		except RuntimeError: #shutting down
+			return
+		dispatch_future.add_done_callback(lambda f: self.future_status(script_object, f))
+
+	#seconds the job's fires are shifted by within its jitter window, or the handler's spread window
+	def jitter_offset(self, job_id, jitter=None):
+		window = self.spread_window if jitter is None else jitter
+		return spread_offset(job_id, window) if window else 0.0
+
+	#runs a script that already holds an admission slot
+	def launch(self, script_object, scheduled=None):
+		delay = self.smoother.reserve()
+		if delay:
+			self.smoother.defer(delay, self.dispatch_launch, script_object, scheduled)
+			return
+		self.start_run(script_object, scheduled)
+
+	#launches a run held back by the launch-rate limit, off the timer thread
+	def dispatch_launch(self, script_object, scheduled):
+		try:
+			dispatch_future = self.dispatch_pool.submit(self.start_run, script_object, scheduled)
+		except RuntimeError: #shutting down
+			return
+		dispatch_future.add_done_callback(lambda f: self.future_status(script_object, f))
+
+	def start_run(self, script_object, scheduled=None):
+		if scheduled is not None:
+			offset = timedelta(seconds=getattr(script_object, "fire_offset", 0.0)) #as exact as the trigger's
+			self.smoother.record((scheduled - offset).timestamp())
+		else:
+			self.smoother.record(time.time())
+		started = self.metrics.start(script_object.id, scheduled)
+		self.notify_run(script_object.id)
+		profile_file = self.profiler.sample(script_object) if script_object.exec_mode != "async" else None
+		control = self.start_control(script_object)
+		#file scripts with a timeout can't be stopped in-process, so they get a child of their own
+		isolated = isinstance(script_object, ActionScript) and control.timeout is not None
+		pool = self.pool_for(script_object)
+		output = self.output.acquire(script_object.id) #released in finish()
+		output_mark = output.received if self.history else None
+		#every run is handed to its pool and finishes from a callback
+		try:
+			if script_object.exec_mode == "thread":
+				future = pool.submit(self.run_in_thread, script_object, control, profile_file, isolated)
+			elif isolated:
+				future = self.dispatch_pool.submit(self.run_isolated, script_object, control, profile_file)
+			elif script_object.exec_mode == "process":
+				future = pool.submit(script_object, output, profile_file,
+									 script_object.profile_memory)
+			else:
+				future = pool.submit(script_object, control)
+		except Exception:
+			if profile_file:
+				self.profiler.collect(script_object.id, profile_file)
+			self.end_control(control)
+			self.finish(script_object, started, "error", scheduled, output_mark)
+			raise
+		if profile_file and script_object.exec_mode != "thread":
+			future.add_done_callback(lambda f: self.profiler.collect(script_object.id, profile_file))
+		future.add_done_callback(lambda f: self.finish_control(script_object, control, started, f, scheduled,
+															   output_mark))
+
+	#a thread-mode run, on a worker of the job's thread pool
+	def run_in_thread(self, script_object, control, profile_file, isolated):
+		try:
+			if isolated:
+				try:
+					return self.run_isolated(script_object, control, profile_file)
+				finally:
+					if profile_file:
+						self.profiler.collect(script_object.id, profile_file)
+			with self.profiler.profile(script_object, profile_file), control.in_thread():
+				return script_object.execute(self.output.get(script_object.id), control)
+		except JobCancelled: #recorded as cancelled from the control
+			return None
+
+	def start_control(self, script_object):
+		timeout = script_object.timeout if script_object.timeout is not None else self.default_timeout
+		control = RunControl(script_object, timeout)
+		with self.controls_changed:
+			self.controls[control] = None
+		self.watchdog.watch(control)
+		return control
+
+	def end_control(self, control):
+		self.watchdog.finished(control)
+		with self.controls_changed:
+			self.controls.pop(control, None)
+			self.controls_changed.notify_all()
+
+	def finish_control(self, script_object, control, started, future, scheduled, output_mark):
+		self.end_control(control)
+		status = self.control_status(control, self.future_status(script_object, future))
+		self.finish(script_object, started, status, scheduled, output_mark)
+
+	def control_status(self, control, status):
+		if control.timed_out:
+			return "timeout"
+		return "cancelled" if control.cancelled else status
+
+	#runs a file script in a child process of its own, which the watchdog can stop where a thread can't be
+	def run_isolated(self, script_object, control, profile_file=None):
+		output = self.output.get(script_object.id)
+		methods = multiprocessing.get_all_start_methods()
+		context = multiprocessing.get_context("fork" if "fork" in methods else None)
+		reader, writer = context.Pipe(duplex=False)
+		process = context.Process(target=isolated_worker_run, name=f"aces-run-{script_object.id}", daemon=True,
+								  args=(script_object.filepath, writer, output.size, profile_file,
+										script_object.profile_memory))
+		process.start()
+		writer.close()
+		control.attach(process)
+		try:
+			#a fork elsewhere in the handler can hold the pipe open, so the child's exit is watched as well
+			while not reader.poll(0.5):
+				if not process.is_alive():
+					break
+			data, error = reader.recv() if reader.poll() else (b"", None)
+		except EOFError: #stopped before it could report
+			data, error = b"", None
+		finally:
+			reader.close()
+		process.join()
+		output.write(data)
+		if error:
+			raise ScriptError(error)
+		return process.exitcode
+
+	#waits up to timeout seconds for every run under way to finish
+	def wait_idle(self, timeout):
+		deadline = time.monotonic() + timeout
+		with self.controls_changed:
+			while self.controls:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					return False
+				self.controls_changed.wait(remaining)
+		return True
+
+	#output_mark: bytes written to the job's output when the run started
+	def finish(self, script_object, started, status, scheduled=None, output_mark=None):
+		self.metrics.finish(script_object.id, started, status)
+		if self.history:
+			duration = time.perf_counter() - started
+			output_bytes = self.output.written(script_object.id) - output_mark if output_mark is not None else 0
+			self.history.record(script_object.id, scheduled.timestamp() if scheduled else None,
+								time.time() - duration, duration, status, output_bytes)
+		self.output.release(script_object.id)
+		if self.coordinator:
+			self.coordinator.complete(script_object.id, scheduled)
+		self.notify_run(script_object.id)
+		self.note_input(script_object.id, status)
+		self.run_downstream(script_object.id, status)
+		for queued_script, queued_scheduled in self.admission.release(script_object):
+			try:
+				dispatch_future = self.dispatch_pool.submit(self.launch, queued_script, queued_scheduled)
+			except RuntimeError: #shutting down
+				return
+			dispatch_future.add_done_callback(lambda f, s=queued_script: self.future_status(s, f))
+
+	def write_output(self, script_object, stream_name, data):
+		self.output.write(script_object.id, data)
+
+	def tail_output(self, job_id, lines=100):
+		return self.output.tail(job_id, lines)
+
+	#profiles every Nth run of a file job from now on, or stops with every=None
+	def set_profile(self, job_id, every=None, memory=False):
+		script_object = self.get_script(job_id)
+		previous = script_object.profile, script_object.profile_memory
+		script_object.profile, script_object.profile_memory = every, memory
+		try:
+			self.apply_options(script_object, {key: getattr(script_object, key) for key in self.JOB_OPTIONS})
+		except ScriptError:
+			script_object.profile, script_object.profile_memory = previous
+			raise
+		self.profiler.reset(job_id)
+		if self.store:
+			self.store.add([self.script_to_row(script_object)])
+
+	#paused jobs keep their schedule but don't fire until resumed, on every instance sharing the store
+	def pause_many(self, job_ids):
+		return self.set_paused(job_ids, True)
+
+	def resume_many(self, job_ids):
+		return self.set_paused(job_ids, False)
+
+	def set_paused(self, job_ids, paused, persist=True):
+		scripts = [self.get_script(job_id) for job_id in job_ids]
+		rows = []
+		with self.batch():
+			for script_object in scripts:
+				if script_object.paused == paused:
+					continue
+				script_object.paused = paused
+				if script_object.trigger not in self.EVENT_TRIGGERS:
+					try:
+						if paused:
+							script_object.exec_job_handle.pause()
+						else: #from now on, fires missed while paused are skipped
+							script_object.exec_job_handle.resume()
+					except JobLookupError: #dated jobs leave the scheduler once they have run
+						pass
+				rows.append(self.script_to_row(script_object))
+		if persist and self.store and rows:
+			self.store.add(rows)
+		return len(rows)
+
+	#runs jobs once straight away, paused or not, subject to the same limits as scheduled fires
+	def run_now(self, job_ids):
+		scripts = [self.get_script(job_id) for job_id in job_ids]
+		for script_object in scripts:
+			self.dispatch_claimed(script_object, None)
+		return len(scripts)
+
+	def profile_report(self, job_id, count=25):
+		return self.profiler.top(job_id, count), profile_report(self.profiler.directory, job_id, count)[1]
+
+	#fan-in: a dependent job runs once all of its upstream jobs have succeeded since its last run,
+	#and a failure must be followed by a success. Ready jobs are dispatched together, so
+	#independent branches run in parallel
+	def run_downstream(self, job_id, status):
+		ready = []
+		if self.coordinator: #other instances run upstream jobs too, so the state is kept in the shared file
+			with self.dependency_lock:
+				dependents = [self.registry.get(dependent_id) for dependent_id in self.downstream.get(job_id, ())]
+			ready = [dependent for dependent in dependents if dependent is not None and
+					 self.coordinator.upstream_finished(dependent.id, job_id, dependent.trigger_args["upstream"],
+														status == "ok")]
+		else:
+			self.collect_ready(job_id, status, ready)
+
+		for dependent in ready:
+			try:
+				dispatch_future = self.dispatch_pool.submit(self.run_script, dependent)
+			except RuntimeError: #shutting down
+				return
+			dispatch_future.add_done_callback(lambda f, s=dependent: self.future_status(s, f))
+
+	def collect_ready(self, job_id, status, ready):
+		with self.dependency_lock:
+			for dependent_id in self.downstream.get(job_id, ()):
+				dependent = self.registry.get(dependent_id)
+				if dependent is None:
+					continue
+				done = self.upstream_done.setdefault(dependent_id, set())
+				if status != "ok":
+					done.discard(job_id)
+					continue
+				done.add(job_id)
+				if done.issuperset(dependent.trigger_args["upstream"]):
+					done.clear()
+					ready.append(dependent)
+
+	#called from the watcher thread once a job's watched paths have settled
+	def on_watched_change(self, job_id):
+		script_object = self.registry.get(job_id)
+		if script_object is None:
+			return
+		try:
+			dispatch_future = self.dispatch_pool.submit(self.run_watched, script_object)
+		except RuntimeError: #shutting down
+			return
+		dispatch_future.add_done_callback(lambda f: self.future_status(script_object, f))
+
+	#with skip_unchanged, a run is skipped if the input hashes the same as at the last successful run.
+	#Coordinated daemons all see the change, so the run is claimed like a fire at the time of the change
+	def run_watched(self, script_object):
+		if script_object.paused:
+			return
+		paths = script_object.trigger_args["paths"]
+		if script_object.trigger_args.get("skip_unchanged"):
+			digest = input_digest(paths)
+			with self.watch_lock:
+				if self.input_hashes.get(script_object.id) == digest:
+					self.watch_skipped += 1
+					return
+				self.pending_hashes[script_object.id] = digest
+		changed = None
+		if self.coordinator:
+			changed = datetime.fromtimestamp(input_changed_time(paths), self.scheduler.timezone)
+			if not self.coordinator.try_claim(script_object.id, changed.timestamp()):
+				with self.watch_lock:
+					self.pending_hashes.pop(script_object.id, None)
+				return #another instance runs for this change
+		self.run_claimed(script_object, changed)
+
+	def note_input(self, job_id, status):
+		with self.watch_lock:
+			digest = self.pending_hashes.pop(job_id, None)
+			if digest is not None and status == "ok":
+				self.input_hashes[job_id] = digest
+
+	def link_dependencies(self, script_object):
+		with self.dependency_lock:
+			for upstream_id in script_object.trigger_args["upstream"]:
+				self.downstream.setdefault(upstream_id, {})[script_object.id] = None
+
+	def unlink_dependencies(self, script_object, removed):
+		with self.dependency_lock:
+			self.upstream_done.pop(script_object.id, None)
+			if script_object.trigger == "after":
+				for upstream_id in script_object.trigger_args["upstream"]:
+					self.downstream.get(upstream_id, {}).pop(script_object.id, None)
+			dependents = self.downstream.pop(script_object.id, {})
+		orphaned = [job_id for job_id in dependents if job_id not in removed]
+		if orphaned:
+			print(f"---{len(orphaned)} jobs ran after removed job {script_object.id} and will no longer run---")
+
+	def exit_status(self, exit_code):
+		return "ok" if not exit_code else f"exit_{exit_code}"
+
+	def future_status(self, script_object, future):
+		if future.cancelled():
+			return "cancelled"
+		exception = future.exception()
+		if exception:
+			print(f"---{script_object.get_name()} failed to run: {exception}---")
+			return "error"
+		return self.exit_status(future.result())
+
+	def render_metrics(self):
+		names = {job_id: script.get_name() for job_id, script in list(self.registry.jobs.items())}
+		return self.metrics.render(names, self.admission.stats(), self.smoother.stats(), self.watchdog.stats(),
+								   self.pool_stats())
+
+	def pool_stats(self):
+		return {name: pool.stats() for name, pool in self.pools.items()}
+
+	def write_metrics(self, filepath):
+		temp_path = filepath + ".tmp"
+		with open(temp_path, "w") as file:
+			file.write(self.render_metrics())
+		os.replace(temp_path, filepath)
+
+	def add_job(self, script_object, trigger, options, persist=True, notify=True, job_kwargs=None, **kwargs):
+		self.apply_options(script_object, options)
+		if script_object.id is None:
+			script_object.id = uuid.uuid4().hex
+		if trigger == "interval" and "start_date" not in kwargs:
+			#stored with the job, so every instance sharing the store fires on the same grid
+			kwargs = {**kwargs, "start_date": datetime.now(self.scheduler.timezone).replace(microsecond=0)}
+		scheduler_trigger, scheduler_args = trigger, kwargs
+		script_object.fire_offset = 0.0
+		if trigger not in self.EVENT_TRIGGERS:
+			script_object.fire_offset = self.jitter_offset(script_object.id, script_object.jitter)
+		if trigger == "cron" or script_object.fire_offset: #validated and compiled before anything is registered
+			scheduler_trigger = self.make_trigger(trigger, kwargs, self.scheduler.timezone, script_object.fire_offset)
+			scheduler_args = {}
+		elif trigger == "after":
+			scheduler_trigger, scheduler_args = self.make_trigger(trigger, kwargs), {}
+			kwargs = {"upstream": list(scheduler_trigger.upstream)}
+			missing = [job_id for job_id in scheduler_trigger.upstream if job_id not in self.registry]
+			if missing and self.store: #stored but not loaded here, e.g. when adding from the command line
+				missing = self.store.missing(missing)
+			if missing:
+				raise ScriptError(f"Unknown upstream job: {', '.join(missing)}")
+		elif trigger == "watch":
+			scheduler_trigger, scheduler_args = self.make_trigger(trigger, kwargs), {}
+			kwargs = {"paths": list(scheduler_trigger.paths), "debounce": scheduler_trigger.debounce,
+					  "skip_unchanged": scheduler_trigger.skip_unchanged}
+		script_object.trigger = trigger
+		script_object.trigger_args = kwargs
+		self.registry.add(script_object)
+		if script_object.paused and trigger not in self.EVENT_TRIGGERS:
+			job_kwargs = {**(job_kwargs or {}), "next_run_time": None}
 
-	#run at specified time, once
-	def add_dated_script(self, script_object, exec_datetime):
-		self.scripts.append(script_object)
-
-		job_handle = self.scheduler.add_job(script_object.execute, "date", run_date=exec_datetime)
+		try:
+			job_handle = self.scheduler.add_job(self.run_script, scheduler_trigger, args=[script_object],
+												id=script_object.id, **(job_kwargs or {}), **scheduler_args)
+		except Exception:
+			self.registry.remove(script_object.id)
+			raise
 		script_object.exec_job_handle = job_handle
+		if trigger == "after":
+			self.link_dependencies(script_object)
+		elif trigger == "watch":
+			self.watcher.watch(script_object.id, scheduler_trigger.paths, scheduler_trigger.debounce)
+
+		if persist and self.store:
+			self.store.add([self.script_to_row(script_object)])
+		if notify:
+			self.notify_registry("add", [script_object.id])
 		return job_handle
 
+	def script_to_row(self, script_object):
+		if isinstance(script_object, ActionScript):
+			kind, content = "file", script_object.filepath
+		else:
+			kind, content = "cmd", script_object.content
+
+		options = {key: getattr(script_object, key) for key in self.JOB_OPTIONS}
+		next_run = getattr(script_object.exec_job_handle, "next_run_time", None)
+		return (script_object.id, kind, content, script_object.exec_type, script_object.trigger,
+				json.dumps(script_object.trigger_args, default=str), json.dumps(options),
+				next_run.timestamp() if next_run else None)
+
+	def restore_jobs(self):
+		start = time.perf_counter()
+		restored = self.restore_rows(self.store.load())
+		print(f"---Restored {restored} jobs in {(time.perf_counter() - start) * 1000:.1f} ms---")
+
+	def restore_rows(self, rows):
+		with self.batch():
+			return self.restore_batch(rows)
+
+	def restore_batch(self, rows):
+		now = datetime.now(self.scheduler.timezone)
+		restored = []
+		dropped = []
+
+		for job_id, kind, content, exec_type, trigger, trigger_args, options, next_run in rows:
+			try:
+				if kind == "file":
+					script_object = ActionScript(content, exec_type=exec_type)
+				else:
+					script_object = CmdScript(content, exec_type=exec_type)
+			except ScriptError as e:
+				print(f"---Could not restore job {job_id}: {e}---")
+				continue
+			script_object.id = job_id
+
+			options = json.loads(options)
+			offset = 0.0 if trigger in self.EVENT_TRIGGERS else self.jitter_offset(job_id, options.get("jitter"))
+			job_kwargs = self.misfire_kwargs(trigger, json.loads(trigger_args), next_run, now, offset)
+			if job_kwargs is None:
+				dropped.append(job_id)
+				continue
+
+			try:
+				self.add_job(script_object, trigger, options, persist=False, notify=False,
+							 job_kwargs=job_kwargs, **json.loads(trigger_args))
+			except ScriptError as e: #e.g. an upstream job removed by hand
+				print(f"---Could not restore job {job_id}: {e}---")
+				continue
+			restored.append(job_id)
+
+		if dropped:
+			self.store.remove(dropped)
+		self.notify_registry("add", restored)
+		return len(restored)
+
+	#picks up jobs added or removed in the store by another process
+	def sync_store(self):
+		if not self.store.changed():
+			return
+
+		rows = self.store.load()
+		stored_ids = {row[0] for row in rows}
+
+		self.remove_many([job_id for job_id in self.registry.jobs if job_id not in stored_ids])
+		self.restore_rows([row for row in rows if row[0] not in self.registry])
+
+		#pausing is the one change made to a stored job in place
+		flipped = {True: [], False: []}
+		for row in rows:
+			script_object = self.registry.get(row[0])
+			if script_object is not None and script_object.paused != bool(json.loads(row[6]).get("paused", False)):
+				flipped[not script_object.paused].append(row[0])
+		for paused, job_ids in flipped.items():
+			if job_ids:
+				self.set_paused(job_ids, paused, persist=False)
+
+	#scheduler arguments to resume a stored job with, or None if it should be dropped
+	def misfire_kwargs(self, trigger, trigger_args, next_run, now, offset=0.0):
+		if next_run is None:
+			return {}
+
+		next_run = datetime.fromtimestamp(next_run, self.scheduler.timezone)
+		if next_run >= now:
+			return {"next_run_time": next_run}
+
+		if self.misfire_policy == "skip":
+			return None if trigger == "date" else {}
+		if self.misfire_policy == "once" or trigger == "date":
+			return {"next_run_time": now, "coalesce": True}
+
+		#replay the most recent missed runs, oldest first
+		trigger_object = self.make_trigger(trigger, trigger_args, self.scheduler.timezone, offset)
+		missed = deque(maxlen=self.catchup_limit)
+		fire_time = next_run
+		while fire_time and fire_time <= now:
+			missed.append(fire_time)
+			fire_time = trigger_object.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+			if fire_time and fire_time <= missed[-1]:
+				break
+		return {"next_run_time": missed[0], "coalesce": False, "misfire_grace_time": None}
+
+	def on_job_event(self, event):
+		if event.code == EVENT_JOB_REMOVED:
+			if event.job_id in self.registry: #removed by the scheduler itself, e.g. a finished dated job
+				self.store.mark_removed(event.job_id)
+			return
+
+		job_handle = self.scheduler.get_job(event.job_id)
+		if job_handle and job_handle.next_run_time:
+			self.store.mark_run(event.job_id, job_handle.next_run_time.timestamp())
+
+	#run at specified time, once
+	def add_dated_script(self, script_object, exec_datetime, **options):
+		return self.add_job(script_object, "date", options, run_date=exec_datetime)
+
 	#run multiple times with given time interval in between calls
-	def add_interval_script(self, script_object, **kwargs): #kwargs to pass to scheduler
-		self.scripts.append(script_object)
+	def add_interval_script(self, script_object, **kwargs): #kwargs to pass to scheduler, bar job options
+		options = self.pop_options(kwargs)
 
 		#hours = 1, seconds = 3
-		job_handle = self.scheduler.add_job(script_object.execute, "interval", **kwargs)
-		script_object.exec_job_handle = job_handle
-		return job_handle
+		return self.add_job(script_object, "interval", options, **kwargs)
 
 	#cron:= "a command to an operating system or server for a job that is to be executed at a specified time"
 	#a flexible schedule method, like comination of dated and interval. Relies on string criteria and syntax
-	def add_cron_script(self, script_object, **kwargs): #kwargs to pass to scheduler
-		self.scripts.append(script_object)
-
-		#hour = 1, second = "*/2"
-		job_handle = self.scheduler.add_job(script_object.execute, "cron", **kwargs)
-		script_object.exec_job_handle = job_handle
-		return job_handle
+	def add_cron_script(self, script_object, **kwargs): #cron fields or crontab="<line>", plus job options
+		options = self.pop_options(kwargs)
+
+		#hour = 1, second = "*/2" or crontab = "*/5 9-17 * * mon-fri"
+		return self.add_job(script_object, "cron", options, **kwargs)
+
+	#run whenever all the upstream jobs (IDs or script objects) have succeeded
+	def add_dependent_script(self, script_object, upstream, **options):
+		upstream = [getattr(job, "id", job) for job in upstream]
+		return self.add_job(script_object, "after", options, upstream=upstream)
+
+	#run when any of the paths change, once changes have stopped for debounce seconds
+	def add_watch_script(self, script_object, paths, debounce=0.5, skip_unchanged=False, **options):
+		return self.add_job(script_object, "watch", options, paths=list(paths), debounce=debounce,
+							skip_unchanged=skip_unchanged)
+
+	#jobs: iterable of (script_object, trigger, kwargs), kwargs being trigger arguments plus job options.
+	#If one fails, those added before it are kept
+	def add_many(self, jobs):
+		rows = []
+		try:
+			with self.batch():
+				for script_object, trigger, kwargs in jobs:
+					kwargs = dict(kwargs)
+					options = self.pop_options(kwargs)
+					self.add_job(script_object, trigger, options, persist=False, notify=False, **kwargs)
+					rows.append(self.script_to_row(script_object))
+		finally:
+			if self.store and rows:
+				self.store.add(rows)
+			self.notify_registry("add", [row[0] for row in rows])
+		return len(rows)
+
+	def get_script(self, given_id):
+		script_object = self.registry.get(given_id)
+		if script_object is None:
+			raise ScriptError("Given script ID not stored by handler object")
+		return script_object
 
-	def remove_scipt_by_id(self, given_id):
-		found = False
-		for script in self.scripts:
-			if script.id == given_id:
-				self.scripts.remove(script)
-				found = True
-				break
+	def remove_script_by_id(self, given_id):
+		self.remove_many([given_id])
 
-		if not found:
-			raise ScriptError("Given script ID not stored by handler object")
+	remove_scipt_by_id = remove_script_by_id #old misspelt name
 
 	def remove_script(self, script_object):
-		script_object.exec_job_handle.remove()
-		self.scripts.remove(script_object)
-
-	def close(self):
-		self.scheduler.shutdown(wait=True) #waits for all scripts to finish
+		self.remove_many([script_object.id])
+
+	#every ID is checked before anything is removed, so an unknown one leaves all the jobs in place
+	def remove_many(self, job_ids):
+		job_ids = list(dict.fromkeys(job_ids))
+		removed = set(job_ids)
+		filepaths = set()
+		with self.batch():
+			unknown = [job_id for job_id in job_ids if job_id not in self.registry]
+			if unknown:
+				raise ScriptError(f"Given script ID not stored by handler object: {', '.join(map(str, unknown))}")
+			for job_id in job_ids:
+				script_object = self.registry.remove(job_id)
+				try:
+					script_object.exec_job_handle.remove()
+				except JobLookupError: #dated jobs leave the scheduler once they have run
+					pass
+				self.unlink_dependencies(script_object, removed)
+				if isinstance(script_object, ActionScript):
+					filepaths.add(script_object.filepath)
+		ActionScript.cache.discard(filepath for filepath in filepaths if filepath not in self.registry.by_path)
+
+		self.watcher.unwatch(job_ids)
+		self.profiler.discard(job_ids)
+		with self.watch_lock:
+			for job_id in job_ids:
+				self.input_hashes.pop(job_id, None)
+				self.pending_hashes.pop(job_id, None)
+		self.admission.discard(job_ids)
+		self.metrics.discard(job_ids)
+		self.output.discard(job_ids)
+		if self.store and job_ids:
+			self.store.remove(job_ids)
+		self.notify_registry("remove", job_ids)
+		return len(job_ids)
+
+	#running jobs get grace seconds (shutdown_grace by default) to finish, then are stopped like
+	#timed out ones. Returns how many runs could not be stopped, typically scripts blocked in C code
+	def close(self, grace=None):
+		grace = self.shutdown_grace if grace is None else grace
+		self.watcher.stop()
+		if self.coordinator:
+			self.coordinator.stop()
+		if self.scheduler.running:
+			self.scheduler.shutdown(wait=False)
+		self.admission.discard(self.registry.jobs) #nothing queued starts during shutdown
+		self.smoother.stop() #nor anything held back by the launch-rate limit
+		self.dispatch_pool.shutdown(wait=False, cancel_futures=True) #nor anything about to be dispatched
+		idle = self.wait_idle(grace)
+		if not idle:
+			with self.controls_changed:
+				running = list(self.controls)
+			print(f"---Stopping {len(running)} runs still going after {grace:g}s---")
+			self.watchdog.cancel(running)
+			idle = self.wait_idle(self.watchdog.grace + 1)
+		with self.controls_changed:
+			left = len(self.controls)
+		if left:
+			print(f"---{left} runs did not stop, leaving them behind---")
+		self.watchdog.stop()
+		for pool in self.pools.values():
+			pool.close(wait=idle)
+		self.dispatch_pool.shutdown(wait=idle)
+		self.output.close()
+		if self.history:
+			self.history.close()
+		if self.coordinator:
+			self.coordinator.close()
+		if self.store:
+			self.store.close()
+		return left
+
+#bulk import and export of job definitions. A definition is a mapping such as
+#{"cmd": "echo hi", "trigger": "cron", "args": {"crontab": "*/5 * * * *"}, "exec_mode": "async"}
+#with "file" instead of "cmd" for Python scripts, and any job options alongside
+JOB_FORMATS = {".jsonl": "jsonl", ".json": "jsonl", ".yaml": "yaml", ".yml": "yaml",
+			   ".cron": "crontab", ".crontab": "crontab", ".tab": "crontab"}
+CRONTAB_MACROS = {"@yearly": "0 0 1 1 *", "@annually": "0 0 1 1 *", "@monthly": "0 0 1 * *",
+				  "@weekly": "0 0 * * 0", "@daily": "0 0 * * *", "@midnight": "0 0 * * *", "@hourly": "0 * * * *"}
+
+#the format given, or the one of the file's extension; stdin and stdout ("-") default to JSON Lines
+def job_format(filepath, given=None):
+	if given:
+		return given
+	if filepath == "-":
+		return "jsonl"
+	name = JOB_FORMATS.get(os.path.splitext(filepath)[1].lower())
+	if name is None:
+		raise ScriptError(f"Can't tell the format of {filepath!r}, give one of jsonl, yaml or crontab")
+	return name
+
+def load_yaml():
+	try:
+		import yaml
+	except ImportError:
+		raise ScriptError("YAML job files need PyYAML installed (pip install pyyaml)")
+	return yaml
+
+#readers yield (where, definition) one at a time, so large files are never held in memory
+def read_jsonl(file):
+	for number, line in enumerate(file, 1):
+		line = line.strip()
+		if not line or line.startswith("#"):
+			continue
+		try:
+			definition = json.loads(line)
+		except ValueError as e:
+			definition = ScriptError(f"Invalid JSON: {e}")
+		yield f"line {number}", definition
+
+#each YAML document holds one job or a list of jobs, documents are parsed one at a time
+def read_yaml(file):
+	yaml = load_yaml()
+	documents = yaml.safe_load_all(file)
+	number = 0
+	while True:
+		number += 1
+		try:
+			document = next(documents)
+		except StopIteration:
+			return
+		except yaml.YAMLError as e:
+			raise ScriptError(f"Invalid YAML in document {number}: {e}")
+		for definition in (document if isinstance(document, list) else [document]):
+			if definition is not None:
+				yield f"document {number}", definition
+
+def read_crontab(file):
+	for number, line in enumerate(file, 1):
+		line = line.strip()
+		if not line or line.startswith("#") or "=" in line.split(None, 1)[0]: #environment settings are skipped
+			continue
+		if line.startswith("@"):
+			macro, _, command = line.partition(" ")
+			schedule = CRONTAB_MACROS.get(macro.lower())
+			if schedule is None:
+				yield f"line {number}", ScriptError(f"{macro} is not supported")
+				continue
+		else:
+			parts = line.split(None, 5)
+			if len(parts) < 6:
+				yield f"line {number}", ScriptError("Expected five schedule fields and a command")
+				continue
+			schedule, command = " ".join(parts[:5]), parts[5]
+		yield f"line {number}", {"cmd": command.strip(), "trigger": "cron", "args": {"crontab": schedule}}
+
+JOB_READERS = {"jsonl": read_jsonl, "yaml": read_yaml, "crontab": read_crontab}
+
+#turns a definition into what Handler.add_many takes, checking the trigger up front
+def definition_to_job(definition):
+	if isinstance(definition, ScriptError):
+		raise definition
+	if not isinstance(definition, dict):
+		raise ScriptError("Expected a mapping")
+
+	definition = dict(definition)
+	definition.pop("id", None) #imported jobs always get new ids
+	if "file" in definition:
+		script_object = ActionScript(os.path.abspath(definition.pop("file")))
+	elif "cmd" in definition:
+		script_object = CmdScript(str(definition.pop("cmd")))
+	else:
+		raise ScriptError("A job needs a 'cmd' or a 'file'")
+
+	trigger = definition.pop("trigger", None)
+	trigger_args = definition.pop("args", None) or {}
+	if trigger not in ("date", "interval", "cron", "after", "watch"):
+		raise ScriptError(f"Unknown trigger: {trigger}")
+	if not isinstance(trigger_args, dict):
+		raise ScriptError("'args' must be a mapping")
+	unknown = set(definition) - set(Handler.JOB_OPTIONS)
+	if unknown:
+		raise ScriptError(f"Unknown job option: {', '.join(sorted(unknown))}")
+	Handler.check_options(script_object, definition)
+
+	try:
+		trigger_object = Handler.make_trigger(trigger, trigger_args)
+	except (TypeError, ValueError, AttributeError) as e:
+		raise ScriptError(f"Invalid {trigger} arguments: {e}")
+	script_object.exec_type = f"dated:{trigger_args.get('run_date')}" if trigger == "date" else trigger
+	return script_object, trigger, {**trigger_args, **definition}
+
+#streams definitions into the handler a batch at a time, the scheduler wakes once per batch.
+#Definitions that don't check out are skipped; if adding fails anyway, or the file turns out
+#to be unreadable part way, every job added so far is removed again
+def import_jobs(handler, file, job_format, batch_size=1000):
+	added_ids = []
+	skipped = 0
+	batch = []
+	where = "the start"
+	try:
+		for where, definition in JOB_READERS[job_format](file):
+			try:
+				batch.append(definition_to_job(definition))
+			except ScriptError as e:
+				print(f"---Skipped {where}: {e}---")
+				skipped += 1
+				continue
+			if len(batch) >= batch_size:
+				handler.add_many(batch)
+				added_ids.extend(job[0].id for job in batch)
+				batch = []
+		if batch:
+			handler.add_many(batch)
+			added_ids.extend(job[0].id for job in batch)
+	except Exception as e:
+		added_ids.extend(job[0].id for job in batch if job[0].id in handler.registry)
+		handler.remove_many(added_ids)
+		raise ScriptError(f"Import failed at {where}, no jobs were imported: {e}")
+	return len(added_ids), skipped
+
+def row_to_definition(row):
+	job_id, kind, content, exec_type, trigger, trigger_args, options, next_run = row
+	definition = {"file" if kind == "file" else "cmd": content, "trigger": trigger, "args": json.loads(trigger_args)}
+	for key, value in json.loads(options).items():
+		if value != Handler.JOB_OPTIONS.get(key):
+			definition[key] = value
+	return definition
+
+#only command jobs on a cron schedule with default options fit in a crontab
+def crontab_line(definition):
+	if definition["trigger"] != "cron" or "cmd" not in definition or len(definition) > 3:
+		return None
+	trigger_args = definition["args"]
+	if "crontab" in trigger_args:
+		return f"{trigger_args['crontab']} {definition['cmd']}"
+	if not isinstance(cron_trigger(trigger_args), CompiledCronTrigger):
+		return None #needs fields or expressions a crontab doesn't have
+
+	texts = CronExpression.field_texts(trigger_args)
+	if texts["year"] != "*" or any(char.isdigit() for char in texts["day_of_week"]):
+		return None #weekday numbers count from sunday in a crontab
+	fields = " ".join(texts[field] for field in CronExpression.FIELDS[:-1])
+	return f"{fields} {definition['cmd']}"
+
+def export_jobs(rows, file, job_format):
+	exported = skipped = 0
+	if job_format == "yaml":
+		yaml = load_yaml()
+	for row in rows:
+		definition = row_to_definition(row)
+		if job_format == "jsonl":
+			file.write(json.dumps(definition) + "\n")
+		elif job_format == "yaml":
+			yaml.safe_dump(definition, file, explicit_start=True, sort_keys=False)
+		else:
+			line = crontab_line(definition)
+			if line is None:
+				skipped += 1
+				continue
+			file.write(line + "\n")
+		exported += 1
+	return exported, skipped
+
+#carries events from scheduler threads to the Tk thread, which drains them with after() in
+#slices of at most BUDGET seconds so the window keeps redrawing under heavy job churn.
+#Run events are coalesced into one set of touched job IDs per drain
+class EventBridge:
+	INTERVAL = 16 #milliseconds between drains, about 60 a second
+	BUDGET = 0.008
+
+	def __init__(self, window, handlers, on_touched):
+		self.window = window
+		self.handlers = handlers #event kind -> callable, run on the Tk thread
+		self.on_touched = on_touched
+		self.events = deque()
+		self.touched = set()
+		self.lock = threading.Lock()
+		self.after_id = None
+
+	def post(self, kind, *args):
+		self.events.append((kind, args))
+
+	def touch(self, job_id):
+		with self.lock:
+			self.touched.add(job_id)
+
+	def start(self):
+		self.after_id = self.window.after(self.INTERVAL, self.drain)
+
+	def drain(self):
+		deadline = time.perf_counter() + self.BUDGET
+		while self.events and time.perf_counter() < deadline:
+			kind, args = self.events.popleft()
+			self.handlers[kind](*args)
+
+		with self.lock:
+			touched, self.touched = self.touched, set()
+		if touched:
+			self.on_touched(touched)
+		self.after_id = self.window.after(self.INTERVAL, self.drain)
+
+	def stop(self):
+		if self.after_id is not None:
+			self.window.after_cancel(self.after_id)
+			self.after_id = None
 
 class GUI:
 	ICON_FILEPATH = "ACES_icon.ico"
 
+	JOB_FILETYPES = [("JSON Lines", "*.jsonl"), ("YAML", "*.yaml *.yml"), ("Crontab", "*.cron *.crontab *.tab"),
+					 ("All files", "*.*")]
+	OUTPUT_LINES = 500
+	PROFILE_EVERY = 10 #runs between profiled runs when profiling is turned on from the job view
+	JOBVIEW_HEIGHT = 8 #rows materialised in the job list, whatever the number of jobs
+	JOBVIEW_SORTS = ("Added", "Name", "Next run")
+
 	instances = []
 	child_window_instances = []
 
 	def __init__(self):
+		load_gui_modules()
 		self.instances.append(self)
 		self.cache_file = CacheFile("aces_memory.cache")
-		self.handler = Handler()
+		self.handler = Handler(store_path=JobStore.DEFAULT_FILEPATH)
 		self.selected_filepath = None
 
 		self.window = tk.Tk()
@@ -181,6 +4574,7 @@ class GUI:
 
 		self.__build_main_frame()
 		self.__build_jobview_frame()
+		self.__build_history_frame()
 
 		self.load_cache()
 
@@ -189,6 +4583,8 @@ class GUI:
 
 		self.filemenu = tk.Menu(self.menubar, tearoff=0)
 		self.filemenu.add_command(label="Show cache details", command=self.show_cache_details)
+		self.filemenu.add_command(label="Import jobs...", command=self.import_jobs)
+		self.filemenu.add_command(label="Export jobs...", command=self.export_jobs)
 		self.filemenu.add_command(label="Exit", command=self.destroy)
 		self.menubar.add_cascade(label="File", menu=self.filemenu)
 
@@ -254,10 +4650,26 @@ class GUI:
 		self.schedule_tab.add(self.interval_tab, text='Interval')
 		self.cron_tab = tk.Frame(self.schedule_tab)
 		self.schedule_tab.add(self.cron_tab, text='Cron')
+		self.after_tab = tk.Frame(self.schedule_tab)
+		self.schedule_tab.add(self.after_tab, text='After')
+		self.watch_tab = tk.Frame(self.schedule_tab)
+		self.schedule_tab.add(self.watch_tab, text='Watch')
 
 		self.__populate_dated_tab()
 		self.__populate_interval_tab()
 		self.__populate_cron_tab()
+		self.__populate_after_tab()
+		self.__populate_watch_tab()
+
+		self.exec_mode_frame = tk.Frame(self.main_frame)
+		self.exec_mode_frame.grid(column=0, row=3, pady=10)
+
+		self.exec_mode_label = tk.Label(self.exec_mode_frame, text="Execution mode:")
+		self.exec_mode_label.grid(column=0, row=0)
+
+		self.exec_mode = tk.StringVar()
+		self.exec_mode_menu = tk.OptionMenu(self.exec_mode_frame, self.exec_mode, *Handler.EXEC_MODES)
+		self.exec_mode_menu.grid(column=1, row=0)
 
 	def __populate_dated_tab(self):
 		self.dated_label0 = tk.Label(self.dated_tab, text="Year")
@@ -380,28 +4792,132 @@ class GUI:
 		self.cron_entry5 = tk.Entry(self.cron_tab, textvariable = self.cron_second)
 		self.cron_entry5.grid(column=1,row=5)
 
+		#a crontab line, if given, is used instead of the fields above
+		self.cron_label6 = tk.Label(self.cron_tab, text="Crontab line")
+		self.cron_label6.grid(column=0,row=6)
+
+		self.cron_line = tk.StringVar()
+		self.cron_entry6 = tk.Entry(self.cron_tab, textvariable = self.cron_line)
+		self.cron_entry6.grid(column=1,row=6)
+
+		self.cron_pbutton = tk.Button(self.cron_tab, text="Preview next runs", command=self.preview_cron_script)
+		self.cron_pbutton.grid(column=0,row=7,columnspan=2)
+
+		self.cron_preview_label = tk.Label(self.cron_tab, text="", justify="left")
+		self.cron_preview_label.grid(column=0,row=8,columnspan=2)
+
 		self.cron_sbutton = tk.Button(self.cron_tab, text="Schedule cron script", command=self.schedule_cron_script)
-		self.cron_sbutton.grid(column=0,row=6,columnspan=2)
+		self.cron_sbutton.grid(column=0,row=9,columnspan=2)
+
+	def __populate_after_tab(self):
+		self.after_label0 = tk.Label(self.after_tab, text="Run after jobs (IDs)")
+		self.after_label0.grid(column=0,row=0)
+
+		self.after_upstream = tk.StringVar()
+		self.after_entry0 = tk.Entry(self.after_tab, textvariable = self.after_upstream)
+		self.after_entry0.grid(column=1,row=0)
+
+		self.after_label1 = tk.Label(self.after_tab, text="Runs once all of these jobs have succeeded")
+		self.after_label1.grid(column=0,row=1,columnspan=2)
+
+		self.after_abutton = tk.Button(self.after_tab, text="Add selected job", command=self.add_selected_upstream)
+		self.after_abutton.grid(column=0,row=2,columnspan=2)
+
+		self.after_sbutton = tk.Button(self.after_tab, text="Schedule dependent script", command=self.schedule_after_script)
+		self.after_sbutton.grid(column=0,row=3,columnspan=2)
+
+	def __populate_watch_tab(self):
+		self.watch_label0 = tk.Label(self.watch_tab, text="Watched paths")
+		self.watch_label0.grid(column=0,row=0)
+
+		self.watch_paths = tk.StringVar()
+		self.watch_entry0 = tk.Entry(self.watch_tab, textvariable = self.watch_paths)
+		self.watch_entry0.grid(column=1,row=0)
+
+		self.watch_fbutton = tk.Button(self.watch_tab, text="Add file", command=self.add_watch_file)
+		self.watch_fbutton.grid(column=0,row=1)
+
+		self.watch_dbutton = tk.Button(self.watch_tab, text="Add folder", command=self.add_watch_directory)
+		self.watch_dbutton.grid(column=1,row=1)
+
+		self.watch_label1 = tk.Label(self.watch_tab, text="Debounce (seconds)")
+		self.watch_label1.grid(column=0,row=2)
+
+		self.watch_debounce = tk.DoubleVar(value=0.5)
+		self.watch_entry1 = tk.Entry(self.watch_tab, textvariable = self.watch_debounce)
+		self.watch_entry1.grid(column=1,row=2)
+
+		self.watch_skip_unchanged = tk.BooleanVar()
+		self.watch_check = tk.Checkbutton(self.watch_tab, text="Skip runs when the content is unchanged",
+										  variable=self.watch_skip_unchanged)
+		self.watch_check.grid(column=0,row=3,columnspan=2)
+
+		self.watch_sbutton = tk.Button(self.watch_tab, text="Schedule watch script", command=self.schedule_watch_script)
+		self.watch_sbutton.grid(column=0,row=4,columnspan=2)
 
 	def __build_jobview_frame(self):
 		self.jobview_frame = tk.Frame(self.tab_control)
 		self.tab_control.add(self.jobview_frame, text='View Jobs')
 
+		self.jobview_filter_frame = tk.Frame(self.jobview_frame)
+		self.jobview_filter_frame.pack(anchor="center", pady=5)
+
+		#words match the name and type, next<60 / next>3600 match seconds until the next run
+		self.jobview_filter_label = tk.Label(self.jobview_filter_frame, text="Search:")
+		self.jobview_filter_label.grid(column=0, row=0)
+
+		self.jobview_filter = tk.StringVar()
+		self.jobview_filter_entry = tk.Entry(self.jobview_filter_frame, textvariable = self.jobview_filter)
+		self.jobview_filter_entry.grid(column=1, row=0)
+
+		self.jobview_sort = tk.StringVar(value=self.JOBVIEW_SORTS[0])
+		self.jobview_sort_menu = tk.OptionMenu(self.jobview_filter_frame, self.jobview_sort, *self.JOBVIEW_SORTS)
+		self.jobview_sort_menu.grid(column=2, row=0)
+
 		self.jobview_lister_frame = tk.Frame(self.jobview_frame)
 		self.jobview_lister_frame.pack(anchor="center")
 
-		self.jobview_lister = tk.Listbox(self.jobview_lister_frame, height=8, width=30)
+		self.jobview_lister = tk.Listbox(self.jobview_lister_frame, height=self.JOBVIEW_HEIGHT, width=40,
+										 exportselection=False)
 		self.jobview_lister.pack(side="left")
 
-		self.jobview_lister_array = []
-		self.jobview_lister_count = 0
-
-		self.__populate_jobview_lister()
+		#the listbox only ever holds the visible window of jobview_rows
+		self.jobview_rows = [] #filtered and sorted job IDs
+		self.jobview_keys = [] #sort keys parallel to jobview_rows, unused for "Added"
+		self.jobview_visible = [] #job IDs currently in the listbox
+		self.jobview_labels = {} #job ID -> (label, lowercase label)
+		self.jobview_offset = 0
+		self.jobview_selected_id = None
+		self.jobview_filter_after = None
 
 		self.jobview_vscrollbar = tk.Scrollbar(self.jobview_lister_frame, orient='vertical')
-		self.jobview_vscrollbar.config(command=self.jobview_lister.yview)
+		self.jobview_vscrollbar.config(command=self.on_jobview_scrollbar)
 		self.jobview_vscrollbar.pack(fill="y", side="left")
 
+		self.jobview_count_label = tk.Label(self.jobview_frame, text="")
+		self.jobview_count_label.pack(anchor="center")
+
+		self.jobview_load_label = tk.Label(self.jobview_frame, text="")
+		self.jobview_load_label.pack(anchor="center")
+		self.update_load_label()
+
+		self.jobview_lister.bind("<<ListboxSelect>>", self.on_jobview_select)
+		self.jobview_lister.bind("<MouseWheel>", lambda e: self.scroll_jobview(-e.delta // 120))
+		self.jobview_lister.bind("<Button-4>", lambda e: self.scroll_jobview(-1))
+		self.jobview_lister.bind("<Button-5>", lambda e: self.scroll_jobview(1))
+		self.jobview_lister.bind("<Up>", lambda e: self.move_jobview_selection(-1))
+		self.jobview_lister.bind("<Down>", lambda e: self.move_jobview_selection(1))
+
+		self.jobview_filter.trace_add("write", lambda *args: self.schedule_jobview_refilter())
+		self.jobview_sort.trace_add("write", lambda *args: self.__populate_jobview_lister())
+
+		#registry and run changes arrive from scheduler threads, the bridge applies them on this one
+		self.bridge = EventBridge(self.window, {"jobs": self.on_jobs_changed}, self.refresh_jobview_rows)
+		self.__populate_jobview_lister()
+		self.handler.add_registry_listener(lambda change, job_ids: self.bridge.post("jobs", change, job_ids))
+		self.handler.add_run_listener(self.bridge.touch)
+		self.bridge.start()
+
 		self.jobview_button_frame = tk.Frame(self.jobview_frame)
 		self.jobview_button_frame.pack(anchor="center", pady=30)
 
@@ -412,22 +4928,273 @@ class GUI:
 		self.remove_button = tk.Button(self.jobview_button_frame, text="Remove", command=self.remove_job)
 		self.remove_button.grid(column=1, row=0, padx=10)
 
+		self.output_button = tk.Button(self.jobview_button_frame, text="View output", command=self.view_output)
+		self.output_button.grid(column=2, row=0, padx=10)
+
+		self.profile_button = tk.Button(self.jobview_button_frame, text="Toggle profiling", command=self.toggle_profile)
+		self.profile_button.grid(column=3, row=0, padx=10)
+
+		self.profile_view_button = tk.Button(self.jobview_button_frame, text="View profile", command=self.view_profile)
+		self.profile_view_button.grid(column=4, row=0, padx=10)
+
+	def __build_history_frame(self):
+		self.history_frame = tk.Frame(self.tab_control)
+		self.tab_control.add(self.history_frame, text='History')
+
+		self.history_text = tk.Text(self.history_frame, width=100, height=25, wrap="none")
+		self.history_text.pack(fill="both", expand=True)
+
+		self.history_button = tk.Button(self.history_frame, text="Refresh", command=self.refresh_history)
+		self.history_button.pack(pady=5)
+
+	#summaries of every job, then the latest runs of the job selected in 'View Jobs'
+	def refresh_history(self):
+		lines = []
+		if self.handler.history is None:
+			lines.append("No run history is kept without a job store")
+		else:
+			scripts = list(self.handler.registry)
+			summaries = self.handler.history.summaries([script_object.id for script_object in scripts])
+			for script_object in scripts:
+				if script_object.id in summaries:
+					lines.append(f"{script_object.get_name()}  {format_summary(summaries[script_object.id])}")
+			if not lines:
+				lines.append("No runs recorded yet")
+			if self.jobview_selected_id is not None:
+				lines.append("")
+				lines.append(f"Latest runs of {self.handler.get_script(self.jobview_selected_id).get_name()}:")
+				lines.extend(format_run(run) for run in self.handler.history.recent(self.jobview_selected_id))
+
+		self.history_text.config(state="normal")
+		self.history_text.delete("1.0", "end")
+		self.history_text.insert("end", "\n".join(lines))
+		self.history_text.config(state="disabled")
+
+	#full rebuild of the filtered rows, only needed when the filter or sort order changes
 	def __populate_jobview_lister(self):
-		if self.jobview_lister_count > 0:
-			self.jobview_lister.delete(0, self.jobview_lister_count)
+		self.jobview_filter_after = None
+		self.jobview_filter_terms = self.parse_jobview_filter()
 
-		self.jobview_lister_count = len(self.handler.scripts)
-		self.jobview_lister_array = list(self.handler.scripts)
-		for i in range(self.jobview_lister_count):
-			script_object = self.handler.scripts[i]
-			string = f"ID {i}: {script_object.get_name()} [{script_object.exec_type}]"
-			self.jobview_lister.insert(i, string)
+		job_ids = [job_id for job_id in self.handler.registry.jobs if self.jobview_matches(job_id)]
+		if self.jobview_sort.get() == "Added":
+			self.jobview_rows, self.jobview_keys = job_ids, []
+		else:
+			pairs = sorted((self.jobview_sort_key(job_id), job_id) for job_id in job_ids)
+			self.jobview_keys = [key for key, job_id in pairs]
+			self.jobview_rows = [job_id for key, job_id in pairs]
+
+		self.jobview_offset = 0
+		self.render_jobview()
+
+	def schedule_jobview_refilter(self, delay=150):
+		if self.jobview_filter_after is not None:
+			self.window.after_cancel(self.jobview_filter_after)
+		self.jobview_filter_after = self.window.after(delay, self.__populate_jobview_lister)
+
+	def jobview_label(self, job_id):
+		labels = self.jobview_labels.get(job_id)
+		if labels is None:
+			script_object = self.handler.registry.get(job_id)
+			label = f"ID {job_id[:8]}: {script_object.get_name()} [{script_object.exec_type}]"
+			labels = self.jobview_labels[job_id] = (label, label.lower())
+		return labels
+
+	def jobview_next_run(self, job_id):
+		script_object = self.handler.registry.get(job_id)
+		return getattr(script_object and script_object.exec_job_handle, "next_run_time", None)
+
+	def parse_jobview_filter(self):
+		words, bounds = [], []
+		for term in self.jobview_filter.get().lower().split():
+			try:
+				if term[:5] in ("next<", "next>"):
+					bounds.append((term[4], float(term[5:])))
+					continue
+			except ValueError:
+				pass
+			words.append(term)
+		return words, bounds
+
+	def jobview_matches(self, job_id):
+		words, bounds = self.jobview_filter_terms
+		if words:
+			label = self.jobview_label(job_id)[1]
+			if not all(word in label for word in words):
+				return False
+		if bounds:
+			next_run = self.jobview_next_run(job_id)
+			if next_run is None:
+				return False
+			seconds = (next_run - datetime.now(next_run.tzinfo)).total_seconds()
+			for op, limit in bounds:
+				if (op == "<" and seconds >= limit) or (op == ">" and seconds <= limit):
+					return False
+		return True
+
+	def jobview_sort_key(self, job_id):
+		if self.jobview_sort.get() == "Name":
+			return self.jobview_label(job_id)[1][12:] #skip the ID prefix
+		next_run = self.jobview_next_run(job_id)
+		return next_run.timestamp() if next_run else float("inf")
+
+	#applies handler changes as diffs instead of rebuilding the list
+	def on_jobs_changed(self, change, job_ids):
+		if change == "add": #jobs may have gone again before the event got here
+			job_ids = [job_id for job_id in job_ids if job_id in self.handler.registry and self.jobview_matches(job_id)]
+			if self.jobview_sort.get() == "Added":
+				self.jobview_rows.extend(job_ids)
+			else:
+				for job_id in job_ids:
+					key = self.jobview_sort_key(job_id)
+					index = bisect.bisect_right(self.jobview_keys, key)
+					self.jobview_keys.insert(index, key)
+					self.jobview_rows.insert(index, job_id)
+		else:
+			removed = set(job_ids)
+			for job_id in job_ids:
+				self.jobview_labels.pop(job_id, None)
+			if len(job_ids) == 1 and job_ids[0] in self.jobview_rows:
+				index = self.jobview_rows.index(job_ids[0])
+				del self.jobview_rows[index]
+				if self.jobview_keys:
+					del self.jobview_keys[index]
+			elif self.jobview_keys:
+				pairs = [pair for pair in zip(self.jobview_keys, self.jobview_rows) if pair[1] not in removed]
+				self.jobview_keys = [key for key, job_id in pairs]
+				self.jobview_rows = [job_id for key, job_id in pairs]
+			else:
+				self.jobview_rows = [job_id for job_id in self.jobview_rows if job_id not in removed]
+			if self.jobview_selected_id in removed:
+				self.jobview_selected_id = None
+		self.render_jobview()
+
+	#rewrites only the listbox rows whose job changed
+	def render_jobview(self):
+		total = len(self.jobview_rows)
+		self.jobview_offset = max(0, min(self.jobview_offset, total - self.JOBVIEW_HEIGHT))
+		visible = self.jobview_rows[self.jobview_offset:self.jobview_offset + self.JOBVIEW_HEIGHT]
+
+		for i, job_id in enumerate(visible):
+			if i < len(self.jobview_visible):
+				if self.jobview_visible[i] == job_id:
+					continue
+				self.jobview_lister.delete(i)
+			self.jobview_lister.insert(i, self.jobview_row_text(job_id))
+		if len(self.jobview_visible) > len(visible):
+			self.jobview_lister.delete(len(visible), "end")
+		self.jobview_visible = visible
+
+		self.jobview_lister.selection_clear(0, "end")
+		if self.jobview_selected_id in visible:
+			self.jobview_lister.selection_set(visible.index(self.jobview_selected_id))
+
+		if total:
+			self.jobview_vscrollbar.set(self.jobview_offset / total, (self.jobview_offset + len(visible)) / total)
+		else:
+			self.jobview_vscrollbar.set(0, 1)
+		self.jobview_count_label.config(text=f"Showing {total} of {len(self.handler.registry)} jobs")
+
+	#the job's label followed by its live status
+	def jobview_row_text(self, job_id):
+		label = self.jobview_label(job_id)[0]
+		status = []
+		summary = self.handler.metrics.summary(job_id)
+		if summary:
+			running, last_duration, last_status = summary
+			if running:
+				status.append("running")
+			if last_status is not None:
+				exit_code = {"ok": "0"}.get(last_status, last_status.replace("exit_", ""))
+				status.append(f"last {last_duration:.2f}s exit {exit_code}")
+		next_run = self.jobview_next_run(job_id)
+		status.append(f"next {next_run:%H:%M:%S}" if next_run else "no next run")
+		return f"{label}  |  {', '.join(status)}"
+
+	#rewrites the visible rows of jobs whose runs started or finished
+	def refresh_jobview_rows(self, job_ids):
+		changed = [i for i, job_id in enumerate(self.jobview_visible) if job_id in job_ids]
+		for i in changed:
+			self.jobview_lister.delete(i)
+			self.jobview_lister.insert(i, self.jobview_row_text(self.jobview_visible[i]))
+		if changed and self.jobview_selected_id in self.jobview_visible:
+			self.jobview_lister.selection_set(self.jobview_visible.index(self.jobview_selected_id))
+
+	def update_load_label(self):
+		stats = self.handler.admission.stats()
+		self.jobview_load_label.config(text=f"Running {stats['running']} | Queued {stats['queued']} | "
+											f"Dropped {stats['dropped']} | Coalesced {stats['coalesced']} | "
+											f"Avg wait {stats['avg_wait'] * 1000:.0f} ms")
+		self.window.after(1000, self.update_load_label)
+
+	def scroll_jobview(self, rows):
+		self.jobview_offset += rows
+		self.render_jobview()
+		return "break"
+
+	def on_jobview_scrollbar(self, action, amount, unit=None):
+		if action == "moveto":
+			self.jobview_offset = int(float(amount) * len(self.jobview_rows))
+			self.render_jobview()
+		elif unit == "pages":
+			self.scroll_jobview(int(amount) * self.JOBVIEW_HEIGHT)
+		else:
+			self.scroll_jobview(int(amount))
+
+	def on_jobview_select(self, event):
+		selection = self.jobview_lister.curselection()
+		if selection and selection[0] < len(self.jobview_visible):
+			self.jobview_selected_id = self.jobview_visible[selection[0]]
+
+	def move_jobview_selection(self, step):
+		if not self.jobview_rows:
+			return "break"
+		if self.jobview_selected_id in self.jobview_visible:
+			index = self.jobview_offset + self.jobview_visible.index(self.jobview_selected_id) + step
+		else:
+			index = self.jobview_offset
+		index = max(0, min(index, len(self.jobview_rows) - 1))
+
+		self.jobview_selected_id = self.jobview_rows[index]
+		if index < self.jobview_offset:
+			self.jobview_offset = index
+		elif index >= self.jobview_offset + self.JOBVIEW_HEIGHT:
+			self.jobview_offset = index - self.JOBVIEW_HEIGHT + 1
+		self.render_jobview()
+		return "break"
 
 	def open_file_dialog(self):
 		###what about execution of other language scripts like java from cmd
 		self.selected_filepath = filedialog.askopenfilename(title="Select a script", filetypes=[("Python files", "*.py"), ("All files", "*.*")])
 		self.update_filepath_label()
 
+	def import_jobs(self):
+		filepath = filedialog.askopenfilename(title="Import jobs", filetypes=self.JOB_FILETYPES)
+		if not filepath:
+			return
+		try:
+			with open(filepath) as file:
+				added, skipped = import_jobs(self.handler, file, job_format(filepath))
+		except (OSError, ScriptError) as e:
+			self.show_error(str(e))
+			return
+		print(f"Imported {added} jobs, skipped {skipped}")
+		if skipped:
+			self.show_error(f"Imported {added} jobs, {skipped} could not be read (see the console)")
+
+	def export_jobs(self):
+		filepath = filedialog.asksaveasfilename(title="Export jobs", filetypes=self.JOB_FILETYPES,
+												defaultextension=".jsonl")
+		if not filepath:
+			return
+		try:
+			with open(filepath, "w") as file:
+				exported, skipped = export_jobs([self.handler.script_to_row(script_object)
+												 for script_object in self.handler.registry], file, job_format(filepath))
+		except (OSError, ScriptError) as e:
+			self.show_error(str(e))
+			return
+		print(f"Exported {exported} jobs" + (f", {skipped} don't fit the format" if skipped else ""))
+
 	def schedule_dated_script(self):
 		year = self.dated_year.get()
 		month = self.dated_month.get()
@@ -443,7 +5210,7 @@ class GUI:
 		else:
 			script_object = CmdScript(self.cmd_var.get(), exec_type=f"dated:{str(datetime_obj)}")
 		
-		self.handler.add_dated_script(script_object, exec_datetime=datetime_obj)
+		self.handler.add_dated_script(script_object, exec_datetime=datetime_obj, exec_mode=self.exec_mode.get())
 		print(f"Scheduled dated script at {datetime_obj}!")
 		self.update()		
 
@@ -459,17 +5226,94 @@ class GUI:
 		else:
 			script_object = CmdScript(self.cmd_var.get(), exec_type="interval")
 		
-		self.handler.add_interval_script(script_object, days=days, hours=hours, minutes=minutes, seconds=seconds)
+		self.handler.add_interval_script(script_object, days=days, hours=hours, minutes=minutes, seconds=seconds,
+										 exec_mode=self.exec_mode.get())
 		print("Scheduled interval script!")
 		self.update()
 
-	def schedule_cron_script(self):
+	def add_selected_upstream(self):
+		if self.jobview_selected_id is None:
+			self.show_error("Please select a job in the 'View Jobs' panel first!")
+			return
+		upstream = self.after_upstream.get().split()
+		if self.jobview_selected_id not in upstream:
+			self.after_upstream.set(" ".join(upstream + [self.jobview_selected_id]))
+
+	def schedule_after_script(self):
+		index = self.script_tab.index('current')
+		if index == 0:
+			script_object = ActionScript(self.selected_filepath, exec_type="after")
+		else:
+			script_object = CmdScript(self.cmd_var.get(), exec_type="after")
+
+		try:
+			self.handler.add_dependent_script(script_object, self.after_upstream.get().split(),
+											  exec_mode=self.exec_mode.get())
+		except ScriptError as e:
+			self.show_error(str(e))
+			return
+		print("Scheduled dependent script!")
+		self.update()
+
+	#paths are separated by "|" in the entry, so they may hold spaces
+	def watched_paths(self):
+		return [path.strip() for path in self.watch_paths.get().split("|") if path.strip()]
+
+	def add_watch_file(self):
+		self.add_watch_path(filedialog.askopenfilename(title="Watch a file"))
+
+	def add_watch_directory(self):
+		self.add_watch_path(filedialog.askdirectory(title="Watch a folder"))
+
+	def add_watch_path(self, path):
+		paths = self.watched_paths()
+		if path and path not in paths:
+			self.watch_paths.set(" | ".join(paths + [path]))
+
+	def schedule_watch_script(self):
+		index = self.script_tab.index('current')
+		if index == 0:
+			script_object = ActionScript(self.selected_filepath, exec_type="watch")
+		else:
+			script_object = CmdScript(self.cmd_var.get(), exec_type="watch")
+
+		try:
+			self.handler.add_watch_script(script_object, self.watched_paths(), self.watch_debounce.get(),
+										  self.watch_skip_unchanged.get(), exec_mode=self.exec_mode.get())
+		except (ScriptError, tk.TclError) as e:
+			self.show_error(str(e))
+			return
+		print("Scheduled watch script!")
+		self.update()
+
+	def cron_args(self):
+		if self.cron_line.get().strip():
+			return {"crontab": self.cron_line.get().strip()}
+
 		year = self.cron_year.get()
 		month = self.cron_month.get()
 		day = self.cron_day.get()
 		hour = self.cron_hour.get()
 		minute = self.cron_minute.get()
 		second = self.cron_second.get()
+		return {"year": year, "month": month, "day": day, "hour": hour, "minute": minute, "second": second}
+
+	def preview_cron_script(self):
+		try:
+			fire_times = preview_cron([self.cron_args()])[0]
+		except ScriptError as e:
+			self.cron_preview_label.config(text=f"Invalid: {e}")
+			return
+		lines = [fire_time.strftime("%a %Y-%m-%d %H:%M:%S") for fire_time in fire_times]
+		self.cron_preview_label.config(text="\n".join(lines) or "Never runs")
+
+	def schedule_cron_script(self):
+		try:
+			cron_args = self.cron_args()
+			cron_trigger(cron_args)
+		except ScriptError as e:
+			self.show_error(str(e))
+			return
 
 		index = self.script_tab.index('current')
 		if index == 0:
@@ -477,19 +5321,16 @@ class GUI:
 		else:
 			script_object = CmdScript(self.cmd_var.get(), exec_type="cron")
 		
-		self.handler.add_cron_script(script_object, year=year, month=month, day=day,
-													hour=hour, minute=minute, second=second)
+		self.handler.add_cron_script(script_object, exec_mode=self.exec_mode.get(), **cron_args)
 		print("Scheduled cron script!")
 		self.update()
 
 	###expand code
 	def load_job(self):
-		return_tuple = self.jobview_lister.curselection()
-		if len(return_tuple) > 0:
+		if self.jobview_selected_id is not None:
 			self.tab_control.select(self.main_frame)
 
-			selected_index = return_tuple[0] #listbox only allows 1 selection, so tuple only has 1 index
-			script_object = self.jobview_lister_array[selected_index]
+			script_object = self.handler.get_script(self.jobview_selected_id)
 
 			if type(script_object) is ActionScript:
 				self.script_tab.select(self.script_select_frame)
@@ -506,6 +5347,16 @@ class GUI:
 
 				print(script_object.exec_job_handle.kwargs)
 
+			elif script_object.exec_type == "after":
+				self.schedule_tab.select(self.after_tab)
+				self.after_upstream.set(" ".join(script_object.trigger_args["upstream"]))
+
+			elif script_object.exec_type == "watch":
+				self.schedule_tab.select(self.watch_tab)
+				self.watch_paths.set(" | ".join(script_object.trigger_args["paths"]))
+				self.watch_debounce.set(script_object.trigger_args["debounce"])
+				self.watch_skip_unchanged.set(script_object.trigger_args["skip_unchanged"])
+
 			else: #script_object.exec_type has "cron"
 				self.schedule_tab.select(self.cron_tab)
 
@@ -516,16 +5367,77 @@ class GUI:
 			self.show_error("Please select a job to load!")
 
 	def remove_job(self):
-		return_tuple = self.jobview_lister.curselection()
-		if len(return_tuple) > 0:
-			selected_index = return_tuple[0]
-			selected_job = self.jobview_lister_array[selected_index]
-			self.handler.remove_script(selected_job)
-			self.__populate_jobview_lister()
+		if self.jobview_selected_id is not None:
+			self.handler.remove_script_by_id(self.jobview_selected_id) #the job list follows via on_jobs_changed
 			print("Removed job!")
 		else:
 			self.show_error("Please select a job to remove!")
 
+	#shows the last OUTPUT_LINES lines of the selected job's output ring
+	def view_output(self):
+		if self.jobview_selected_id is None:
+			self.show_error("Please select a job to view!")
+			return
+		job_id = self.jobview_selected_id
+
+		output_window = tk.Toplevel(self.window)
+		output_window.wm_title(f"Output of {self.handler.get_script(job_id).get_name()}")
+		output_window.iconbitmap(self.ICON_FILEPATH)
+		output_window.protocol("WM_DELETE_WINDOW", lambda: self.destroy_child_window(output_window))
+		self.child_window_instances.append(output_window)
+
+		output_text = tk.Text(output_window, width=100, height=30, wrap="none")
+		output_text.pack(fill="both", expand=True)
+
+		def refresh():
+			output_text.config(state="normal")
+			output_text.delete("1.0", "end")
+			output_text.insert("end", self.handler.tail_output(job_id, self.OUTPUT_LINES) or "(no output yet)")
+			output_text.see("end")
+			output_text.config(state="disabled")
+
+		tk.Button(output_window, text="Refresh", command=refresh).pack(pady=5)
+		refresh()
+
+	def toggle_profile(self):
+		if self.jobview_selected_id is None:
+			self.show_error("Please select a job to profile!")
+			return
+		script_object = self.handler.get_script(self.jobview_selected_id)
+		try:
+			self.handler.set_profile(script_object.id, None if script_object.profile else self.PROFILE_EVERY)
+		except ScriptError as e:
+			self.show_error(str(e))
+			return
+		state = f"every {self.PROFILE_EVERY}th run" if script_object.profile else "off"
+		print(f"Profiling of {script_object.get_name()}: {state}")
+
+	#top functions by cumulative time over the selected job's profiled runs
+	def view_profile(self):
+		if self.jobview_selected_id is None:
+			self.show_error("Please select a job to view!")
+			return
+		job_id = self.jobview_selected_id
+
+		profile_window = tk.Toplevel(self.window)
+		profile_window.wm_title(f"Profile of {self.handler.get_script(job_id).get_name()}")
+		profile_window.iconbitmap(self.ICON_FILEPATH)
+		profile_window.protocol("WM_DELETE_WINDOW", lambda: self.destroy_child_window(profile_window))
+		self.child_window_instances.append(profile_window)
+
+		profile_text = tk.Text(profile_window, width=100, height=30, wrap="none")
+		profile_text.pack(fill="both", expand=True)
+
+		def refresh():
+			top, memory = self.handler.profile_report(job_id)
+			profile_text.config(state="normal")
+			profile_text.delete("1.0", "end")
+			profile_text.insert("end", format_profile(top, memory) if top else "(no profiled runs yet)")
+			profile_text.config(state="disabled")
+
+		tk.Button(profile_window, text="Refresh", command=refresh).pack(pady=5)
+		refresh()
+
 	def update_filepath_label(self):
 		if self.selected_filepath:
 			self.filepath_label.config(text=f"Selected File: {self.selected_filepath}")
@@ -534,9 +5446,7 @@ class GUI:
 
 	def update(self):
 		self.update_cache()
-		self.__populate_jobview_lister()
 		#self.update_filepath_label()
-		self.window.update()
 
 	def tk_mainloop(self):
 		self.handler.mainloop()
@@ -544,30 +5454,35 @@ class GUI:
 
 	#duration in milliseconds and frequency in Hz
 	def beep(self, duration=300, frequency=450):
+		import winsound #windows only
 		winsound.Beep(frequency, duration)
 
 	def update_cache(self):
-		self.cache_file.cache["dated_year"] = self.dated_year.get()
-		self.cache_file.cache["dated_month"] = self.dated_month.get()
-		self.cache_file.cache["dated_date"] = self.dated_date.get()
-		self.cache_file.cache["dated_hour"] = self.dated_hour.get()
-		self.cache_file.cache["dated_minute"] = self.dated_minute.get()
-		self.cache_file.cache["dated_second"] = self.dated_second.get()
-
-		self.cache_file.cache["interval_days"] = self.interval_days.get()
-		self.cache_file.cache["interval_hours"] = self.interval_hours.get()
-		self.cache_file.cache["interval_minutes"] = self.interval_minutes.get()
-		self.cache_file.cache["interval_seconds"] = self.interval_seconds.get()
-
-		self.cache_file.cache["cron_year"] = self.cron_year.get()
-		self.cache_file.cache["cron_month"] = self.cron_month.get()
-		self.cache_file.cache["cron_day"] = self.cron_day.get()
-		self.cache_file.cache["cron_hour"] = self.cron_hour.get()
-		self.cache_file.cache["cron_minute"] = self.cron_minute.get()
-		self.cache_file.cache["cron_second"] = self.cron_second.get()
-
-		self.cache_file.cache["selected_filepath"] = self.selected_filepath
-		self.cache_file.cache["cmd_var"] = self.cmd_var.get()
+		self.cache_file.update({
+			"dated_year": self.dated_year.get(),
+			"dated_month": self.dated_month.get(),
+			"dated_date": self.dated_date.get(),
+			"dated_hour": self.dated_hour.get(),
+			"dated_minute": self.dated_minute.get(),
+			"dated_second": self.dated_second.get(),
+
+			"interval_days": self.interval_days.get(),
+			"interval_hours": self.interval_hours.get(),
+			"interval_minutes": self.interval_minutes.get(),
+			"interval_seconds": self.interval_seconds.get(),
+
+			"cron_year": self.cron_year.get(),
+			"cron_month": self.cron_month.get(),
+			"cron_day": self.cron_day.get(),
+			"cron_hour": self.cron_hour.get(),
+			"cron_minute": self.cron_minute.get(),
+			"cron_second": self.cron_second.get(),
+			"cron_line": self.cron_line.get(),
+
+			"selected_filepath": self.selected_filepath,
+			"cmd_var": self.cmd_var.get(),
+			"exec_mode": self.exec_mode.get(),
+		})
 
 	def load_cache(self):
 		self.dated_year.set(self.cache_file.cache["dated_year"])
@@ -588,11 +5503,13 @@ class GUI:
 		self.cron_hour.set(self.cache_file.cache["cron_hour"])
 		self.cron_minute.set(self.cache_file.cache["cron_minute"])
 		self.cron_second.set(self.cache_file.cache["cron_second"])
+		self.cron_line.set(self.cache_file.cache.get("cron_line", ""))
 
 		self.selected_filepath = self.cache_file.cache["selected_filepath"]
 		self.update_filepath_label()
 
 		self.cmd_var.set(self.cache_file.cache["cmd_var"])
+		self.exec_mode.set(self.cache_file.cache.get("exec_mode", "thread")) #older caches predate exec_mode
 
 	def show_cache_details(self):
 		cache_window = tk.Toplevel(self.window)
@@ -607,10 +5524,14 @@ class GUI:
 		tk.Entry(cache_window, textvariable = cache_fp_var).grid(column=0, row=1, pady=20)
 		cache_fp_var.set(self.cache_file.filepath)
 
-		tk.Button(cache_window, text="Update cache filepath", command=lambda: cache_filepath_update(cache_fp_var)).grid(column=0, row=2)
+		tk.Button(cache_window, text="Update cache filepath", command=lambda: self.cache_filepath_update(cache_fp_var)).grid(column=0, row=2)
 		tk.Button(cache_window, text="Load cache", command=self.load_cache).grid(column=0, row=3)
-		tk.Button(cache_window, text="Save cache", command=self.cache_file.save).grid(column=0, row=4)
+		tk.Button(cache_window, text="Save cache", command=self.save_cache).grid(column=0, row=4)
 		
+	def save_cache(self):
+		self.update_cache()
+		self.cache_file.save()
+
 	def cache_filepath_update(self, cache_fp_var):
 		self.cache_file.filepath = cache_fp_var.get()
 
@@ -659,15 +5580,18 @@ class GUI:
 
 		###deiconify to reverse effects of both - expand code
 
-		time.sleep(10)
+		#scheduled on the Tk loop rather than slept through, so the window keeps processing events
+		self.window.after(10000, self.unhide)
+
+	def unhide(self):
 		self.window.deiconify()
-		time.sleep(1)
-		self.window.iconify()
+		self.window.after(1000, self.window.iconify)
 
 	def destroy(self):
 		print("---Closing window---")
 		self.update_cache()
-		self.cache_file.save()
+		self.cache_file.close()
+		self.bridge.stop()
 		self.handler.close()
 
 		for child_window in tuple(self.child_window_instances):
@@ -675,9 +5599,433 @@ class GUI:
 		self.window.destroy()
 
 
-def main():
+def resident_memory_mb():
+	try:
+		import resource #unix only
+	except ImportError:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 #KiB on linux
+
+def run_gui(args):
 	window_handle = GUI()
 	window_handle.tk_mainloop()
 
+def run_daemon(args):
+	start = time.perf_counter()
+	handler = Handler(process_workers=args.workers, store_path=args.store,
+					  misfire_policy=args.misfire, catchup_limit=args.catchup_limit,
+					  max_concurrent=args.max_concurrent, group_limits=parse_limits(args.group_limit),
+					  max_queue=args.max_queue, output_size=args.output_size,
+					  output_rotate_bytes=args.output_rotate_bytes, coordinate=args.coordinate,
+					  instance_id=args.instance_id, spread_window=args.spread_window, launch_rate=args.launch_rate,
+					  history_retention_days=args.history_days, default_timeout=args.default_timeout,
+					  kill_grace=args.kill_grace, shutdown_grace=args.shutdown_grace, pools=parse_pools(args.pool))
+	handler.mainloop()
+	metrics_server = MetricsServer(handler, args.metrics_port) if args.metrics_port else None
+	control_servers = []
+	if args.control_port:
+		control_servers.append(ControlServer(handler, port=args.control_port, token_path=control_token_path(args.store)))
+	if args.control_socket:
+		control_servers.append(ControlServer(handler, path=args.control_socket))
+
+	memory = resident_memory_mb()
+	memory = f"{memory:.1f} MB peak RSS" if memory else "RSS unavailable"
+	print(f"---ACES daemon started in {(time.perf_counter() - start) * 1000:.1f} ms, {memory}, "
+		  f"{len(handler.scripts)} jobs---")
+
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+	last_metrics = 0
+	try:
+		while True:
+			time.sleep(args.sync_interval)
+			handler.sync_store()
+			write_status(handler, status_path(args.store))
+			if args.metrics_file and time.monotonic() - last_metrics >= args.metrics_interval:
+				handler.write_metrics(args.metrics_file)
+				last_metrics = time.monotonic()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		print("---Stopping daemon---")
+		if metrics_server:
+			metrics_server.close()
+		for control_server in control_servers:
+			control_server.close()
+		if handler.close():
+			os._exit(1) #threads of runs that could not be stopped would hold up exit
+
+def status_path(store_path):
+	return store_path + ".status.json"
+
+def output_path(store_path):
+	return store_path + ".output"
+
+def lease_path(store_path):
+	return store_path + ".leases"
+
+def history_path(store_path):
+	return store_path + ".history"
+
+def control_token_path(store_path):
+	return store_path + ".control-token"
+
+def profile_path(store_path):
+	return store_path + ".profiles"
+
+#written by the daemon every sync so `aces status` can read it from another process
+def write_status(handler, filepath):
+	status = {"time": time.time(), "pid": os.getpid(), "jobs": len(handler.registry),
+			  "admission": handler.admission.stats(), "launches": handler.smoother.stats(),
+			  "watchdog": handler.watchdog.stats(), "pools": handler.pool_stats(),
+			  "watch": {"backend": handler.watcher.backend, "jobs": len(handler.watcher.jobs),
+						"skipped": handler.watch_skipped}}
+	if handler.coordinator:
+		status["leases"] = handler.coordinator.stats()
+	temp_path = filepath + ".tmp"
+	with open(temp_path, "w") as file:
+		json.dump(status, file)
+	os.replace(temp_path, filepath)
+
+def run_status(args):
+	try:
+		with open(status_path(args.store)) as file:
+			status = json.load(file)
+	except (OSError, ValueError):
+		raise ScriptError("No daemon status found, is the daemon running?")
+
+	admission = status["admission"]
+	print(f"Daemon pid {status['pid']}, {status['jobs']} jobs, "
+		  f"updated {time.time() - status['time']:.1f}s ago")
+	print(f"Running {admission['running']}, queued {admission['queued']}, admitted {admission['admitted']}, "
+		  f"dropped {admission['dropped']}, coalesced {admission['coalesced']}")
+	print(f"Queue wait avg {admission['avg_wait'] * 1000:.1f} ms, max {admission['max_wait'] * 1000:.1f} ms")
+	for group, running in admission["running_by_group"].items():
+		print(f"  group {group}: {running} running")
+	for job_id, dropped in admission["dropped_by_job"].items():
+		print(f"  job {job_id}: {dropped} dropped")
+	if "launches" in status:
+		launches = status["launches"]
+		rate = f"limit {launches['rate']:g}/s" if launches["rate"] else "no rate limit"
+		print(f"Launch peak {launches['peak_planned']}/s planned, {launches['peak_launched']}/s actual "
+			  f"({launches['flattened'] * 100:.0f}% flatter), {rate}, {launches['delayed']} delayed "
+			  f"avg {launches['avg_delay'] * 1000:.1f} ms, max {launches['max_delay'] * 1000:.1f} ms")
+	if "watchdog" in status:
+		watchdog = status["watchdog"]
+		print(f"Timed out {watchdog['timed_out']}, cancelled {watchdog['cancelled']}, killed after "
+			  f"{watchdog['grace']:g}s grace {watchdog['killed']}, slots reclaimed {watchdog['reclaimed']}, "
+			  f"still stuck {watchdog['stuck']}")
+	for name, pool in status.get("pools", {}).items():
+		bounds = f"{pool['min']}-{pool['max']}" if pool["max"] else "no cap"
+		used = "n/a" if pool["utilisation"] is None else f"{pool['utilisation'] * 100:.0f}%"
+		print(f"  pool {name} ({pool['kind']}, {bounds}): {pool['size']} workers, {pool['busy']} busy, "
+			  f"{pool['queued']} queued, peak {pool['peak_busy']} busy / {pool['peak_queued']} queued, "
+			  f"utilisation {used}")
+	if status.get("watch", {}).get("jobs"):
+		watch = status["watch"]
+		print(f"Watching for {watch['jobs']} jobs ({watch['backend']}), {watch['skipped']} runs skipped as unchanged")
+	if "leases" in status:
+		leases = status["leases"]
+		print(f"Instance {leases['instance']} of {leases['live_instances']} live: claimed {leases['claimed']}, "
+			  f"lost {leases['lost']}, taken over {leases['taken_over']}, holding {leases['active_leases']} leases")
+
+#FIELD=VALUE pairs, or the words of a crontab line
+def parse_cron(words):
+	if any("=" in word for word in words):
+		return parse_fields(words)
+	return {"crontab": " ".join(words)}
+
+def run_cron(args):
+	try:
+		start = datetime.fromisoformat(args.start) if args.start else None
+	except ValueError:
+		raise ScriptError(f"Invalid start time {args.start!r}")
+	for fire_time in preview_cron([parse_cron(args.expression)], args.count, start)[0]:
+		print(fire_time.strftime("%a %Y-%m-%d %H:%M:%S"))
+
+def parse_limits(pairs):
+	return {group: int(limit) for group, limit in parse_fields(pairs or []).items()}
+
+#NAME=KIND:MIN-MAX pairs, e.g. io=thread:2-32
+def parse_pools(pairs):
+	pools = {}
+	for name, spec in parse_fields(pairs or []).items():
+		kind, sep, bounds = spec.partition(":")
+		low, dash, high = bounds.partition("-")
+		try:
+			pools[name] = (kind, int(low), int(high) if dash else int(low))
+		except ValueError:
+			raise ScriptError(f"Expected NAME=KIND:MIN-MAX for pool {name}, got {spec!r}")
+	return pools
+
+def parse_fields(pairs):
+	fields = {}
+	for pair in pairs:
+		key, sep, value = pair.partition("=")
+		if not sep:
+			raise ScriptError(f"Expected FIELD=VALUE, got {pair!r}")
+		fields[key] = value
+	return fields
+
+def run_add(args):
+	handler = Handler(store_path=args.store, restore=False)
+	try:
+		if args.file:
+			script_object = ActionScript(os.path.abspath(args.file))
+		else:
+			script_object = CmdScript(args.cmd)
+
+		options = {"exec_mode": args.exec_mode, "timeout": args.timeout, "max_instances": args.max_instances,
+				   "group": args.group, "overflow": args.overflow, "jitter": args.jitter, "profile": args.profile,
+				   "profile_memory": args.profile_memory, "pool": args.pool, "paused": args.paused}
+		if args.at:
+			exec_datetime = datetime.fromisoformat(args.at)
+			script_object.exec_type = f"dated:{str(exec_datetime)}"
+			handler.add_dated_script(script_object, exec_datetime, **options)
+		elif args.interval:
+			script_object.exec_type = "interval"
+			handler.add_interval_script(script_object, seconds=args.interval, **options)
+		elif args.watch:
+			script_object.exec_type = "watch"
+			handler.add_watch_script(script_object, args.watch, args.debounce, args.skip_unchanged, **options)
+		elif args.after:
+			script_object.exec_type = "after"
+			handler.add_dependent_script(script_object, args.after, **options)
+		else:
+			script_object.exec_type = "cron"
+			handler.add_cron_script(script_object, **options, **parse_cron(args.cron))
+		print(script_object.id)
+	finally:
+		handler.close()
+
+def row_name(row):
+	kind, content = row[1], row[2]
+	return "File{" + os.path.basename(content) + "}" if kind == "file" else "Cmd{" + content + "}"
+
+def describe_row(row):
+	job_id, kind, content, exec_type, trigger, trigger_args, options, next_run = row
+	name = row_name(row)
+	if next_run:
+		next_run = datetime.fromtimestamp(next_run)
+	else: #added while no scheduler was running
+		jitter = json.loads(options).get("jitter")
+		offset = spread_offset(job_id, jitter) if jitter and trigger not in Handler.EVENT_TRIGGERS else 0
+		trigger_object = Handler.make_trigger(trigger, json.loads(trigger_args), offset=offset)
+		next_run = trigger_object.get_next_fire_time(None, datetime.now().astimezone())
+	next_run = next_run.strftime("%Y-%m-%d %H:%M:%S") if next_run else "-"
+	if json.loads(options).get("paused"):
+		next_run = "paused"
+	return f"{job_id}  {name} [{exec_type}]  next: {next_run}"
+
+def run_import(args):
+	job_format_name = job_format(args.path, args.format)
+	handler = Handler(store_path=args.store, restore=False)
+	try:
+		start = time.perf_counter()
+		if args.path == "-":
+			added, skipped = import_jobs(handler, sys.stdin, job_format_name, args.batch_size)
+		else:
+			with open(args.path) as file:
+				added, skipped = import_jobs(handler, file, job_format_name, args.batch_size)
+		print(f"Imported {added} jobs in {time.perf_counter() - start:.1f} s" +
+			  (f", skipped {skipped}" if skipped else ""))
+	finally:
+		handler.close()
+
+def run_export(args):
+	job_format_name = job_format(args.path, args.format)
+	store = JobStore(args.store)
+	try:
+		if args.path == "-":
+			exported, skipped = export_jobs(store.load(), sys.stdout, job_format_name)
+		else:
+			with open(args.path, "w") as file:
+				exported, skipped = export_jobs(store.load(), file, job_format_name)
+	finally:
+		store.close()
+	print(f"Exported {exported} jobs" + (f", {skipped} don't fit the format" if skipped else ""), file=sys.stderr)
+
+#reads the ring a daemon or the interface writes, without starting a scheduler
+def run_output(args):
+	output = OutputStore(output_path(args.store))
+	try:
+		with open(output.path(args.id, "ring"), "rb") as file:
+			header = file.read(OutputBuffer.HEADER.size)
+	except FileNotFoundError:
+		raise ScriptError(f"No output recorded for job {args.id}")
+	output.size = OutputBuffer.HEADER.unpack(header)[1] #whatever size the writer used
+	try:
+		sys.stdout.write(output.tail(args.id, args.lines))
+	finally:
+		output.close()
+
+def run_list(args):
+	store = JobStore(args.store)
+	for row in store.load():
+		print(describe_row(row))
+	store.close()
+
+def format_summary(summary):
+	return (f"runs {summary['runs']}  ok {summary['success_rate'] * 100:.1f}%  "
+			f"p50 {summary['p50']:.3f}s  p99 {summary['p99']:.3f}s  "
+			f"failing {summary['failure_streak']} (worst {summary['longest_failure_streak']})  "
+			f"last {datetime.fromtimestamp(summary['last_started']).strftime('%Y-%m-%d %H:%M:%S')} "
+			f"{summary['last_status']}")
+
+def format_run(run):
+	late = f"  {(run['started'] - run['scheduled']) * 1000:.0f} ms late" if run["scheduled"] else ""
+	return (f"{datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M:%S')}  "
+			f"{run['ended'] - run['started']:.3f}s  {run['status']}  {run['output_bytes']} B output{late}")
+
+def run_history(args):
+	filepath = history_path(args.store)
+	if not os.path.isfile(filepath):
+		raise ScriptError("No run history found, has the daemon run any jobs?")
+	history = RunHistory(filepath)
+	store = JobStore(args.store)
+	try:
+		names = {row[0]: row_name(row) for row in store.load()}
+		if args.id:
+			summary = history.summary(args.id)
+			if summary is None:
+				raise ScriptError(f"No runs recorded for job {args.id}")
+			print(f"{args.id}  {names.get(args.id, '(removed)')}  {format_summary(summary)}")
+			for run in history.recent(args.id, args.count):
+				print(format_run(run))
+		else:
+			for job_id, summary in history.summaries().items():
+				print(f"{job_id}  {names.get(job_id, '(removed)')}  {format_summary(summary)}")
+	finally:
+		store.close()
+		history.close()
+
+def run_profile(args):
+	top, memory = profile_report(profile_path(args.store), args.id, args.count)
+	if not top:
+		raise ScriptError(f"No profiled runs of job {args.id}, add it with --profile N")
+	print(format_profile(top, memory))
+
+def run_remove(args):
+	store = JobStore(args.store)
+	removed = store.remove(args.ids)
+	store.close()
+	print(f"Removed {removed} of {len(args.ids)} jobs")
+	if removed < len(args.ids):
+		sys.exit(1)
+
+def build_parser():
+	parser = argparse.ArgumentParser(prog="aces", description="Amendable Controller for Execution of Scripts")
+	parser.add_argument("--store", default=JobStore.DEFAULT_FILEPATH, help="job store database")
+	commands = parser.add_subparsers(dest="command")
+
+	commands.add_parser("gui", help="start the Tk interface (default)").set_defaults(func=run_gui)
+
+	daemon = commands.add_parser("daemon", help="run the scheduler headless")
+	daemon.add_argument("--workers", type=int, default=None, help="process pool size")
+	daemon.add_argument("--misfire", choices=Handler.MISFIRE_POLICIES, default="skip")
+	daemon.add_argument("--catchup-limit", type=int, default=100)
+	daemon.add_argument("--sync-interval", type=float, default=1, help="seconds between job store checks")
+	daemon.add_argument("--max-concurrent", type=int, default=None, help="runs allowed at once across all jobs")
+	daemon.add_argument("--group-limit", nargs="+", metavar="GROUP=N", help="runs allowed at once per group")
+	daemon.add_argument("--max-queue", type=int, default=10000, help="queued fires kept before dropping")
+	daemon.add_argument("--metrics-port", type=int, default=None, help="serve metrics on localhost:PORT/metrics")
+	daemon.add_argument("--control-port", type=int, default=None, help="serve the control API on localhost:PORT, to requests carrying the token in STORE.control-token")
+	daemon.add_argument("--control-socket", default=None, help="serve the control API on this Unix socket")
+	daemon.add_argument("--metrics-file", default=None, help="periodically write metrics to this file")
+	daemon.add_argument("--metrics-interval", type=float, default=15, help="seconds between metrics file writes")
+	daemon.add_argument("--output-size", type=int, default=65536, help="bytes of output kept per job")
+	daemon.add_argument("--output-rotate-bytes", type=int, default=None,
+						help="also log all output to disk, rotating the log at this size")
+	daemon.add_argument("--coordinate", action="store_true",
+						help="share the store with other daemons, each fire running on one of them")
+	daemon.add_argument("--instance-id", default=None, help="name of this daemon among coordinated ones")
+	daemon.add_argument("--spread-window", type=float, default=None,
+						help="shift each job's fires by a fixed offset within this many seconds")
+	daemon.add_argument("--history-days", type=float, default=30, help="days of run history kept")
+	daemon.add_argument("--launch-rate", type=float, default=None, help="launches allowed per second across all jobs")
+	daemon.add_argument("--default-timeout", type=float, default=None,
+						help="seconds before a run of a job without its own --timeout is stopped")
+	daemon.add_argument("--kill-grace", type=float, default=5, help="seconds between SIGTERM and SIGKILL")
+	daemon.add_argument("--shutdown-grace", type=float, default=30,
+						help="seconds running jobs get to finish on shutdown before they are stopped")
+	daemon.add_argument("--pool", nargs="+", metavar="NAME=KIND:MIN-MAX",
+						help="named worker pool, e.g. io=thread:2-32, cpu=process:1-4 or cmd=async:0-100")
+	daemon.set_defaults(func=run_daemon)
+
+	add = commands.add_parser("add", help="add a job to the store")
+	script = add.add_mutually_exclusive_group(required=True)
+	script.add_argument("--file", help="python script to run")
+	script.add_argument("--cmd", help="command to run")
+	schedule = add.add_mutually_exclusive_group(required=True)
+	schedule.add_argument("--at", help="run once at an ISO date and time")
+	schedule.add_argument("--interval", type=float, help="run every given number of seconds")
+	schedule.add_argument("--cron", nargs="+", metavar="FIELD=VALUE",
+						  help="e.g. minute=*/5 hour=9-17, or a crontab line such as '*/5 9-17 * * mon-fri'")
+	schedule.add_argument("--after", nargs="+", metavar="JOB_ID", help="run once all these jobs have succeeded")
+	schedule.add_argument("--watch", nargs="+", metavar="PATH", help="run when any of these files or directories change")
+	add.add_argument("--debounce", type=float, default=0.5, help="seconds a watched path must be quiet before a run")
+	add.add_argument("--skip-unchanged", action="store_true",
+					 help="skip watch runs whose input is the same as at the last successful run")
+	add.add_argument("--exec-mode", choices=Handler.EXEC_MODES, default="thread")
+	add.add_argument("--timeout", type=float, default=None, help="seconds before a run is stopped")
+	add.add_argument("--max-instances", type=int, default=1, help="runs of this job allowed at once")
+	add.add_argument("--pool", default=None, help="daemon pool to run in, of the same kind as --exec-mode")
+	add.add_argument("--paused", action="store_true", help="add the job paused")
+	add.add_argument("--group", default=None, help="group sharing a concurrency limit")
+	add.add_argument("--overflow", choices=AdmissionController.OVERFLOW_POLICIES, default="drop",
+					 help="what happens to fires over a limit")
+	add.add_argument("--profile", type=int, default=None, metavar="N", help="profile every Nth run of a --file job")
+	add.add_argument("--profile-memory", action="store_true", help="also trace memory of profiled runs")
+	add.add_argument("--jitter", type=float, default=None,
+					 help="spread this job's fires by a fixed offset within this many seconds")
+	add.set_defaults(func=run_add)
+
+	commands.add_parser("list", help="list stored jobs").set_defaults(func=run_list)
+	commands.add_parser("status", help="show the running daemon's load").set_defaults(func=run_status)
+
+	output = commands.add_parser("output", help="show the latest output of a job")
+	output.add_argument("id")
+	output.add_argument("-n", "--lines", type=int, default=100)
+	output.set_defaults(func=run_output)
+
+	profile = commands.add_parser("profile", help="show the functions a profiled job spends its time in")
+	profile.add_argument("id")
+	profile.add_argument("-n", "--count", type=int, default=25, help="functions to list")
+	profile.set_defaults(func=run_profile)
+
+	history = commands.add_parser("history", help="show success rates, durations and failure streaks of past runs")
+	history.add_argument("id", nargs="?", help="also list this job's latest runs")
+	history.add_argument("-n", "--count", type=int, default=20, help="runs to list")
+	history.set_defaults(func=run_history)
+
+	import_ = commands.add_parser("import", help="add jobs from a JSON Lines, YAML or crontab file")
+	import_.add_argument("path", help="file to read, - for standard input (JSON Lines unless --format says otherwise)")
+	import_.add_argument("--format", choices=JOB_READERS, help="defaults to the file extension")
+	import_.add_argument("--batch-size", type=int, default=1000)
+	import_.set_defaults(func=run_import)
+
+	export = commands.add_parser("export", help="write the stored jobs to a JSON Lines, YAML or crontab file")
+	export.add_argument("path", help="file to write, - for standard output (JSON Lines unless --format says otherwise)")
+	export.add_argument("--format", choices=JOB_READERS, help="defaults to the file extension")
+	export.set_defaults(func=run_export)
+
+	cron = commands.add_parser("cron", help="validate a cron schedule and preview its next runs")
+	cron.add_argument("expression", nargs="+", help="crontab line or FIELD=VALUE pairs")
+	cron.add_argument("-n", "--count", type=int, default=5)
+	cron.add_argument("--start", help="preview from this ISO date and time instead of now")
+	cron.set_defaults(func=run_cron)
+
+	remove = commands.add_parser("remove", help="remove stored jobs by ID")
+	remove.add_argument("ids", nargs="+")
+	remove.set_defaults(func=run_remove)
+	return parser
+
+def main(argv=None):
+	args = build_parser().parse_args(argv)
+	try:
+		getattr(args, "func", run_gui)(args)
+	except (ScriptError, OSError) as e:
+		print(f"aces: {e}", file=sys.stderr)
+		sys.exit(2)
+
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,204 @@
+#Benchmarks for ACES scheduling at scale, runs headless
+#Usage: python aces_bench.py [--sizes 1000 10000 100000] [--output results.json]
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import contextlib
+import tracemalloc
+from datetime import datetime, timedelta
+
+import apscheduler
+
+import aces
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+	if not samples:
+		return {}
+	samples = sorted(samples)
+	return {f"p{point}": samples[min(len(samples) - 1, int(len(samples) * point / 100))] for point in points}
+
+#records raw schedule lag for every launch, on top of the handler's own histograms
+class BenchHandler(aces.Handler):
+	def __init__(self, **kwargs):
+		super().__init__(**kwargs)
+		self.lags = []
+
+	def launch(self, script_object, scheduled=None):
+		if scheduled is not None:
+			self.lags.append((datetime.now(scheduled.tzinfo) - scheduled).total_seconds())
+		super().launch(script_object, scheduled)
+
+def make_script(directory, source="pass\n"):
+	filepath = os.path.join(directory, "bench_job.py")
+	with open(filepath, "w") as file:
+		file.write(source)
+	return filepath
+
+def add_jobs(handler, kind, count, filepath):
+	start = datetime.now() + timedelta(days=1) #nothing fires while adding
+	for i in range(count):
+		script_object = aces.ActionScript(filepath, exec_type=kind)
+		if kind == "dated":
+			handler.add_dated_script(script_object, start + timedelta(seconds=i))
+		elif kind == "interval":
+			handler.add_interval_script(script_object, hours=1)
+		else:
+			handler.add_cron_script(script_object, hour="*/2", minute=i % 60)
+
+def bench_add(sizes, filepath):
+	results = []
+	for count in sizes:
+		for kind in ("dated", "interval", "cron"):
+			handler = BenchHandler()
+			handler.mainloop()
+			start = time.perf_counter()
+			add_jobs(handler, kind, count, filepath)
+			add_time = time.perf_counter() - start
+
+			start = time.perf_counter()
+			handler.remove_many(list(handler.registry.jobs))
+			remove_time = time.perf_counter() - start
+			handler.close()
+
+			#memory is measured on a separate pass, tracemalloc slows the adds down
+			sample = min(count, 10000)
+			handler = BenchHandler()
+			tracemalloc.start()
+			before = tracemalloc.get_traced_memory()[0]
+			add_jobs(handler, kind, sample, filepath)
+			after = tracemalloc.get_traced_memory()[0]
+			tracemalloc.stop()
+			handler.close()
+
+			results.append({"jobs": count, "trigger": kind, "add_seconds": add_time,
+							"adds_per_second": count / add_time, "remove_seconds": remove_time,
+							"bytes_per_job": (after - before) / sample})
+			print(f"add {kind:8} {count:>7} jobs: {count / add_time:,.0f}/s, "
+				  f"{(after - before) / sample:,.0f} B/job", file=sys.stderr)
+	return results
+
+def bench_fire(sizes, duration, filepath):
+	results = []
+	for count in sizes:
+		handler = BenchHandler()
+		handler.add_many((aces.ActionScript(filepath, exec_type="interval"), "interval", {"seconds": 1})
+						 for i in range(count))
+		handler.mainloop()
+		time.sleep(1) #let the first wave settle
+		handler.lags.clear()
+		start = time.perf_counter()
+		time.sleep(duration)
+		elapsed = time.perf_counter() - start
+		lags = list(handler.lags)
+		dropped = handler.admission.stats()["dropped"]
+		handler.scheduler.remove_all_jobs()
+		handler.close()
+
+		result = {"jobs": count, "seconds": elapsed, "fires": len(lags), "fires_per_second": len(lags) / elapsed,
+				  "expected_per_second": count, "dropped": dropped, "lag_seconds": percentiles(lags)}
+		results.append(result)
+		print(f"fire {count:>7} jobs: {result['fires_per_second']:,.0f} fires/s, "
+			  f"lag p99 {result['lag_seconds'].get('p99', 0) * 1000:.1f} ms", file=sys.stderr)
+	return results
+
+def time_runs(run, count):
+	start = time.perf_counter()
+	for i in range(count):
+		run()
+	return (time.perf_counter() - start) / count
+
+def bench_execute(count, filepath):
+	handler = aces.Handler(process_workers=2)
+	action_script = aces.ActionScript(filepath)
+	handler.apply_options(action_script, {"exec_mode": "process"})
+	cmd_script = aces.CmdScript("true" if os.name != "nt" else "cmd /c exit 0")
+	handler.process_pool.run(action_script) #pool workers start in the background, wait for them
+
+	results = {"cmd_thread": time_runs(cmd_script.execute, count),
+			   "action_thread": time_runs(action_script.execute, count),
+			   "action_process": time_runs(lambda: handler.process_pool.run(action_script), count)}
+	handler.close()
+	results = {name: {"seconds_per_run": seconds, "runs_per_second": 1 / seconds} for name, seconds in results.items()}
+	for name, result in results.items():
+		print(f"execute {name:15}: {result['seconds_per_run'] * 1e6:,.0f} us/run", file=sys.stderr)
+	return results
+
+#times the job view's full rebuild and incremental updates, needs a display
+def bench_jobview(sizes, filepath, directory):
+	results = []
+	cwd = os.getcwd()
+	os.chdir(directory) #the GUI keeps its cache and job store in the working directory
+	try:
+		for count in sizes:
+			for name in ("aces_memory.cache", "aces_memory.cache.journal", aces.JobStore.DEFAULT_FILEPATH):
+				if os.path.exists(name):
+					os.remove(name)
+			try:
+				with contextlib.redirect_stdout(sys.stderr): #keep stdout for the JSON results
+					gui = aces.GUI()
+			except Exception as e: #typically no display
+				return {"skipped": str(e)}
+
+			gui.handler.add_many((aces.ActionScript(filepath, exec_type="interval"), "interval", {"hours": 1})
+								 for i in range(count))
+			start = time.perf_counter()
+			gui._GUI__populate_jobview_lister()
+			rebuild = time.perf_counter() - start
+
+			script_object = aces.ActionScript(filepath, exec_type="interval")
+			start = time.perf_counter()
+			gui.handler.add_interval_script(script_object, hours=1)
+			gui.handler.remove_script(script_object)
+			gui.bridge.drain() #view changes are applied on the next drain of the event bridge
+			incremental = time.perf_counter() - start
+
+			gui.bridge.stop()
+			gui.handler.close()
+			gui.window.destroy()
+			results.append({"jobs": count, "rebuild_seconds": rebuild, "add_remove_one_seconds": incremental})
+			print(f"jobview {count:>7} jobs: rebuild {rebuild * 1000:.1f} ms, "
+				  f"add+remove one {incremental * 1000:.1f} ms", file=sys.stderr)
+	finally:
+		os.chdir(cwd)
+	return results
+
+def main():
+	parser = argparse.ArgumentParser(description="ACES scheduler benchmarks")
+	parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+	parser.add_argument("--fire-sizes", type=int, nargs="+", default=[1000, 10000],
+						help="interval jobs firing every second during the dispatch test")
+	parser.add_argument("--duration", type=float, default=5, help="seconds to measure dispatch for")
+	parser.add_argument("--exec-runs", type=int, default=200)
+	parser.add_argument("--skip", nargs="+", default=[], choices=("add", "fire", "execute", "jobview"))
+	parser.add_argument("--output", help="write the JSON results here instead of stdout")
+	args = parser.parse_args()
+
+	results = {"time": datetime.now().isoformat(), "python": platform.python_version(),
+			   "platform": platform.platform(), "apscheduler": apscheduler.__version__,
+			   "cpus": os.cpu_count()}
+	with tempfile.TemporaryDirectory() as directory:
+		filepath = make_script(directory)
+		if "add" not in args.skip:
+			results["add"] = bench_add(args.sizes, filepath)
+		if "fire" not in args.skip:
+			results["fire"] = bench_fire(args.fire_sizes, args.duration, filepath)
+		if "execute" not in args.skip:
+			results["execute"] = bench_execute(args.exec_runs, filepath)
+		if "jobview" not in args.skip:
+			results["jobview"] = bench_jobview(args.sizes, filepath, directory)
+
+	output = json.dumps(results, indent=2)
+	if args.output:
+		with open(args.output, "w") as file:
+			file.write(output)
+	else:
+		print(output)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+
+from aces import CompiledCronTrigger, CronExpression, ScriptError, cron_trigger
+
+#cron fields as the scheduler takes them, compiled and through CronTrigger alike
+EXPRESSIONS = [
+	{"minute": "*/5"},
+	{"second": "*/20", "minute": "1-3"},
+	{"hour": "9-17", "minute": "0,30", "day_of_week": "mon-fri"},
+	{"hour": "2", "day_of_week": "sat,sun"},
+	{"day": "1,15", "hour": "12"},
+	{"day": "31"},
+	{"day": "last", "hour": "23", "minute": "59"},
+	{"month": "feb", "day": "29"},
+	{"month": "1-7/3", "day": "*/10", "hour": "6"},
+	{"month": "feb-apr", "day": "28-31", "hour": "6"},
+	{"day": "13", "day_of_week": "fri"},
+	{"year": "2027", "month": "6"},
+	{"year": "2026-2027", "hour": "*/7", "minute": "15"},
+	{"second": "59", "minute": "59", "hour": "23", "day": "31", "month": "12"},
+	{"day_of_week": "sun", "hour": "0"},
+	{"day_of_week": "mon"},
+	{"day_of_week": "wed", "minute": "30"},
+	{"year": "2027"},
+	{"year": "2027", "day_of_week": "fri"},
+	{"month": "3"},
+	{"day": "10"},
+	{"second": "15"},
+	{"hour": "5", "second": "30"},
+]
+STARTS = [datetime(2026, 1, 1), datetime(2026, 2, 28, 23, 59, 59), datetime(2026, 12, 31, 12, 0, 0, 500000)]
+
+def fire_times(trigger, start, count=25):
+	times = []
+	fire_time = None
+	now = start.replace(tzinfo=timezone.utc)
+	while len(times) < count:
+		fire_time = trigger.get_next_fire_time(fire_time, now)
+		if fire_time is None:
+			break
+		times.append(fire_time)
+		now = fire_time
+	return times
+
+@pytest.mark.parametrize("fields", EXPRESSIONS, ids=lambda fields: " ".join(f"{k}={v}" for k, v in fields.items()))
+@pytest.mark.parametrize("start", STARTS, ids=str)
+def test_compiled_matches_cron_trigger(fields, start):
+	compiled = CompiledCronTrigger(CronExpression.compile_args(fields), timezone.utc)
+	reference = CronTrigger(timezone=timezone.utc, **fields)
+	assert fire_times(compiled, start) == fire_times(reference, start)
+
+def test_crontab_line_matches_fields():
+	compiled = CompiledCronTrigger(CronExpression.compile_args({"crontab": "*/15 9-17 * * 1-5"}), timezone.utc)
+	reference = CronTrigger(timezone=timezone.utc, minute="*/15", hour="9-17", day_of_week="mon-fri")
+	assert fire_times(compiled, STARTS[0], 100) == fire_times(reference, STARTS[0], 100)
+
+@pytest.mark.parametrize("fields", [
+	{"day": "last fri", "hour": "18"},
+	{"day": "2nd mon"},
+	{"week": "*/2", "day_of_week": "mon"},
+	{"minute": "0", "start_date": "2026-03-01", "end_date": "2026-03-05"},
+	{"hour": "9", "timezone": "Europe/Berlin"},
+])
+def test_falls_back_to_cron_trigger(fields):
+	trigger = cron_trigger(fields, timezone.utc)
+	assert isinstance(trigger, CronTrigger)
+	reference = CronTrigger(**{"timezone": timezone.utc, **fields})
+	assert fire_times(trigger, STARTS[0]) == fire_times(reference, STARTS[0])
+
+def test_invalid_fields_raise_script_error():
+	with pytest.raises(ScriptError):
+		cron_trigger({"minutes": "5"})
+	with pytest.raises(ScriptError):
+		cron_trigger({"week": "x"})
+	with pytest.raises(ScriptError):
+		cron_trigger({"crontab": "* * * *"})
+
+def test_compiled_is_used_where_it_can_be():
+	assert isinstance(cron_trigger({"minute": "*/5"}), CompiledCronTrigger)
+	assert isinstance(cron_trigger({"day": "last"}), CompiledCronTrigger)
+	assert fire_times(cron_trigger({"minute": "*/5"}, timezone.utc), STARTS[0], 2)[1] - \
+		fire_times(cron_trigger({"minute": "*/5"}, timezone.utc), STARTS[0], 1)[0] == timedelta(minutes=5)